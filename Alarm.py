@@ -1,14 +1,236 @@
 from gpiozero import LED, Buzzer
+import time
 import threading
+from Sim_Clock import get_clock
+
+# GPIOs wired to the BCM PWM peripheral (40-pin header)
+_HW_PWM_PINS = (12, 13, 18, 19)
+_HW_PWM_MIN_HZ = 1.0
+# hardware_PWM takes whole Hz; anything further off than this goes to the waveform/thread path
+_HW_PWM_HZ_TOL = 1e-3
+
+# pigpio can only transmit ONE waveform at a time, so LED and buzzer share it.
+_wave_lock = threading.Lock()
+_wave_owner = None
+
+
+def _pigpio_connection(device):
+    """Return the pigpio.pi behind a gpiozero device, or None if not on PiGPIOFactory."""
+    factory = getattr(device, "pin_factory", None)
+    conn = getattr(factory, "connection", None)
+    if conn is None or not getattr(conn, "connected", False):
+        return None
+    return conn
+
+
+class _PWMPattern:
+    """
+    Whole on/off pattern as hardware PWM (freq = 1/period, duty = on/period).
+    Only for PWM-capable pins and periods the peripheral can do exactly: a
+    whole number of Hz, >= 1 Hz (0.3 s + 0.4 s would come out as 1 Hz).
+    A finite repeat just schedules ONE clock callback, timed from the PWM
+    start, to switch it off in the middle of the last OFF; on_done(self) tells
+    the owner it ended on its own.
+    """
+    def __init__(self, pi, pin, clock=None, on_done=None):
+        self.pi = pi
+        self.pin = int(pin)
+        self.clock = clock or get_clock()
+        self.on_done = on_done
+        self._lock = threading.Lock()
+        self._token = None          # identifies the play the pending end callback belongs to
+        self._timer = None
+        self._playing = None
+
+    def supports(self, on_time, off_time, repeat_count):
+        if self.pin not in _HW_PWM_PINS or on_time <= 0 or off_time <= 0:
+            return False
+        hz = 1.0 / (on_time + off_time)
+        return hz >= _HW_PWM_MIN_HZ and abs(hz - round(hz)) <= _HW_PWM_HZ_TOL
+
+    def busy(self):
+        return self._playing is not None
+
+    def play(self, on_time, off_time, repeat_count):
+        pattern = (on_time, off_time, repeat_count)
+        if self._playing == pattern and self.busy():
+            return True
+        self.cancel()
+        period = on_time + off_time
+        freq = int(round(1.0 / period))
+        duty = int(round(1_000_000 * on_time / period))  # pigpio duty is 0..1M
+        self.pi.hardware_PWM(self.pin, freq, duty)
+        t_start = self.clock.monotonic()    # the first ON starts here
+        with self._lock:
+            self._playing = pattern
+            if repeat_count is not None:
+                # stop half an OFF after the last ON, measured from the PWM start (not from
+                # whenever a timer thread gets going)
+                token = self._token = object()
+                self._timer = self.clock.call_at(t_start + period * repeat_count - off_time / 2.0,
+                                                 lambda: self._end(token))
+        return True
+
+    def _end(self, token):
+        with self._lock:
+            if self._token is not token:
+                return                      # cancelled or replaced meanwhile
+            self._token = self._timer = None
+            self._off()
+        if self.on_done is not None:
+            self.on_done(self)
+
+    def cancel(self):
+        with self._lock:
+            timer, self._token, self._timer = self._timer, None, None
+            self._off()
+        if timer is not None and hasattr(timer, "cancel"):
+            timer.cancel()                  # RealClock: a threading.Timer
+
+    def _off(self):
+        self._playing = None
+        try:
+            self.pi.hardware_PWM(self.pin, 0, 0)
+            self.pi.write(self.pin, 0)
+        except Exception:
+            pass
+
+
+class _WavePattern:
+    """
+    Whole on/off/repeat pattern as a pigpio DMA waveform.
+    Forever -> wave_send_repeat, N times -> wave_chain loop. No Python timing at all.
+    pigpio transmits one waveform at a time: the device that sent the last one
+    owns it until it's cancelled or the transmission has finished on its own.
+    """
+    _MAX_CHAIN_REPEAT = 65535
+
+    def __init__(self, pi, pin):
+        import pigpio
+        self._pigpio = pigpio
+        self.pi = pi
+        self.pin = int(pin)
+        self._wid = None
+        self._playing = None
+
+    def _free_locked(self):
+        # a finished wave_chain leaves its owner set; nothing is on the air then
+        return _wave_owner is None or _wave_owner is self or not self.pi.wave_tx_busy()
+
+    def supports(self, on_time, off_time, repeat_count):
+        if on_time <= 0 or off_time <= 0:
+            return False
+        if repeat_count is not None and not (0 < repeat_count <= self._MAX_CHAIN_REPEAT):
+            return False
+        with _wave_lock:
+            return self._free_locked()
+
+    def busy(self):
+        with _wave_lock:
+            mine = _wave_owner is self
+        return mine and self._playing is not None and bool(self.pi.wave_tx_busy())
+
+    def play(self, on_time, off_time, repeat_count):
+        """False if another device's wave is still on the air."""
+        global _wave_owner
+        pattern = (on_time, off_time, repeat_count)
+        if self._playing == pattern and self.busy():
+            return True
+        self.cancel()
+        with _wave_lock:
+            if not self._free_locked():
+                return False
+            prev, _wave_owner = _wave_owner, self
+        if prev is not None and prev is not self:
+            prev._release()                 # its chain has ended; free its wave id
+
+        mask = 1 << self.pin
+        pulse = self._pigpio.pulse
+        self.pi.set_mode(self.pin, self._pigpio.OUTPUT)
+        self.pi.wave_add_new()
+        self.pi.wave_add_generic([
+            pulse(mask, 0, max(1, int(round(on_time * 1e6)))),
+            pulse(0, mask, max(1, int(round(off_time * 1e6)))),
+        ])
+        self._wid = self.pi.wave_create()
+        if repeat_count is None:
+            self.pi.wave_send_repeat(self._wid)
+        else:
+            n = int(repeat_count)
+            self.pi.wave_chain([255, 0, self._wid, 255, 1, n & 0xFF, n >> 8])
+        self._playing = pattern
+        return True
+
+    def cancel(self):
+        global _wave_owner
+        with _wave_lock:
+            if _wave_owner is not self:
+                return
+            _wave_owner = None
+        try:
+            self.pi.wave_tx_stop()
+        except Exception:
+            pass
+        self._release()
+
+    def _release(self):
+        try:
+            if self._wid is not None:
+                self.pi.wave_delete(self._wid)
+            self.pi.write(self.pin, 0)
+        except Exception:
+            pass
+        self._wid = None
+        self._playing = None
+
 
 class _BlinkBase:
-    def __init__(self):
+    """
+    backend:
+      'auto'   -> hardware PWM if the pattern fits, else pigpio waveform, else thread loop
+      'pwm' / 'wave' -> only that hardware path (thread loop if it can't play the pattern)
+      'thread' -> always the Python thread loop (what MockFactory tests use)
+    Hardware paths need gpiozero running on PiGPIOFactory (pigpiod).
+    """
+    def __init__(self, clock=None):
+        self.clock = clock or get_clock()
         self._lock = threading.Lock()
         self._stop = threading.Event()
         self._thread = None
         self._on_time = 0.0
         self._off_time = 0.0
         self._repeat = None  # None = forever
+        self._hw_backends = []
+        self._hw_active = None
+
+    def _init_backends(self, device, pin, backend="auto"):
+        backend = (backend or "auto").strip().lower()
+        if backend == "thread":
+            return
+        pi = _pigpio_connection(device)
+        if pi is None:
+            return
+        if backend in ("auto", "pwm"):
+            self._hw_backends.append(_PWMPattern(pi, pin, clock=self.clock, on_done=self._hw_done))
+        if backend in ("auto", "wave"):
+            try:
+                self._hw_backends.append(_WavePattern(pi, pin))
+            except ImportError:
+                pass
+
+    def _hw_done(self, hw):
+        """A finite hardware pattern ended by itself."""
+        with self._lock:
+            if self._hw_active is hw and not hw.busy():
+                self._hw_active = None
+
+    @property
+    def backend(self):
+        """Name of the backend that played the current/last pattern."""
+        hw = self._hw_active
+        if hw is None:
+            return "thread"
+        return "pwm" if isinstance(hw, _PWMPattern) else "wave"
 
     def _loop(self, turn_on, turn_off):
         count = 0
@@ -16,7 +238,7 @@ class _BlinkBase:
             while not self._stop.is_set():
                 # ON
                 turn_on()
-                if self._stop.wait(self._on_time):
+                if self.clock.wait(self._stop, self._on_time):
                     break
 
                 # OFF
@@ -26,7 +248,7 @@ class _BlinkBase:
                     if count >= self._repeat:
                         break
 
-                if self._stop.wait(self._off_time):
+                if self.clock.wait(self._stop, self._off_time):
                     break
         finally:
             # Ensure device is OFF when exiting
@@ -35,6 +257,13 @@ class _BlinkBase:
             except Exception:
                 pass
 
+    def _stop_thread_locked(self, timeout=1.0):
+        self._stop.set()
+        t = self._thread
+        if t and t.is_alive() and t is not threading.current_thread():
+            t.join(timeout=timeout)
+        self._thread = None
+
     def start_toggle(self, on_time, off_time, repeat_count=None):
         """
         Start blinking. Safe to call repeatedly; if already running,
@@ -45,19 +274,37 @@ class _BlinkBase:
             self._off_time = float(off_time)
             self._repeat = repeat_count if (repeat_count is None) else int(repeat_count)
 
+            # Hardware-timed path: the whole pattern runs off the GIL
+            for hw in self._hw_backends:
+                if not hw.supports(self._on_time, self._off_time, self._repeat):
+                    continue
+                self._stop_thread_locked()
+                if self._hw_active is not None and self._hw_active is not hw:
+                    self._hw_active.cancel()
+                    self._hw_active = None
+                if hw.play(self._on_time, self._off_time, self._repeat):
+                    self._hw_active = hw
+                    return
+
+            if self._hw_active is not None:
+                self._hw_active.cancel()
+                self._hw_active = None
+
             # Already running? Just update timings and bail.
             if self._thread and self._thread.is_alive():
                 return
 
             self._stop.clear()
-            self._thread = threading.Thread(target=self._run, daemon=True)
-            self._thread.start()
+            self._thread = self.clock.start_thread(self._run)
 
     def stop(self, timeout=1.0):
         """Stop blinking and wait for the thread to exit."""
         with self._lock:
             self._stop.set()
             t = self._thread
+            hw, self._hw_active = self._hw_active, None
+        if hw is not None:
+            hw.cancel()
         if t:
             t.join(timeout=timeout)
         # Thread ensures device is off on exit.
@@ -68,18 +315,20 @@ class _BlinkBase:
 
 
 class LEDControl(_BlinkBase):
-    def __init__(self, pin):
-        super().__init__()
+    def __init__(self, pin, backend="auto", clock=None):
+        super().__init__(clock)
         self.led = LED(pin)
+        self._init_backends(self.led, pin, backend)
 
     def _run(self):
         self._loop(self.led.on, self.led.off)
 
 
 class BuzzerControl(_BlinkBase):
-    def __init__(self, pin):
-        super().__init__()
+    def __init__(self, pin, backend="auto", clock=None):
+        super().__init__(clock)
         self.buzzer = Buzzer(pin)
+        self._init_backends(self.buzzer, pin, backend)
 
     def _run(self):
         self._loop(self.buzzer.on, self.buzzer.off)
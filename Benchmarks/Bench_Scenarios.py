@@ -0,0 +1,167 @@
+# Bench_Scenarios.py
+"""
+Pinned microbenchmark scenarios for the hot paths.
+Each scenario is a setup function that returns the callable to time; setup cost
+is never measured. Runs on the simulation backends (BORESIGHT_SIM=1).
+"""
+import os
+import sys
+
+os.environ.setdefault("BORESIGHT_SIM", "1")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RENDERER_DIR = os.path.join(REPO_DIR, "Renderer (not on RPI)")
+for _p in (REPO_DIR, RENDERER_DIR):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+FONT_PATH = os.path.join(REPO_DIR, "Fonts", "Tw_Cen_Condensed.ttf")
+OVERLAY_COLOR = (180, 0, 0, 255)
+
+SCENARIOS = {}   # name -> (setup_fn, number of calls per round)
+
+
+def scenario(name, number=10):
+    def deco(setup):
+        SCENARIOS[name] = (setup, int(number))
+        return setup
+    return deco
+
+
+# ---------- overlay ----------
+def _overlay(**style):
+    from Overlay_Display import OverlayDisplay
+    od = OverlayDisplay(radius=20, tick_length=300, ring_thickness=1, tick_thickness=1,
+                        gap=-10, color=OVERLAY_COLOR)
+    od.set_style(scale_major_every=5, scale_major_length=15, scale_minor_length=5,
+                 scale_tick_thickness=1, **style)
+    od.center_on_screen(refresh=False)
+    return od
+
+
+def _refresh_scenario(spacing, labels):
+    def setup():
+        return _overlay(scale_spacing=spacing, scale_label_show=labels).refresh
+    return setup
+
+
+for _spacing, _labels in ((5, False), (10, False), (10, True), (20, True), (40, False)):
+    scenario(f"overlay_refresh[spacing={_spacing},labels={'on' if _labels else 'off'}]",
+             number=10)(_refresh_scenario(_spacing, _labels))
+
+
+@scenario("overlay_nudge_vertical_x20", number=1)
+def _nudge_vertical():
+    od = _overlay(scale_spacing=10, scale_label_show=False)
+
+    def run():
+        for i in range(20):
+            od.nudge_vertical(1 if (i // 10) % 2 == 0 else -1)
+    return run
+
+
+# ---------- text / container ----------
+def _text_overlay():
+    from Overlay_Display import TextOverlay
+    return TextOverlay(layer=2002, font_path=FONT_PATH, font_size=36,
+                       pos=('left', 'bottom'), color=OVERLAY_COLOR, offset=(10, 20))
+
+
+@scenario("text_render_clock", number=10)
+def _text_clock():
+    to = _text_overlay()
+    return lambda: to._render("12:34:56", dot_on=False)
+
+
+@scenario("text_render_rec", number=10)
+def _text_rec():
+    to = _text_overlay()
+    return lambda: to._render("REC.", dot_on=True)
+
+
+@scenario("container_show", number=10)
+def _container_show():
+    from Overlay_Display import ContainerOverlay
+    return ContainerOverlay(bar_width=150, layer=2001, alpha=150).show
+
+
+# ---------- camera math ----------
+def _camera():
+    from Camera_Setup import CameraSetup
+    cam = CameraSetup()
+    cam.set_display_aspect(1280, 720)
+    return cam
+
+
+_GRID = [(x / 10.0, y / 10.0) for x in range(11) for y in range(11)]
+
+
+@scenario("camera_roi_quantized_grid121", number=5)
+def _roi_grid():
+    cam = _camera()
+
+    def run():
+        for z in (2, 4, 8):
+            for sx, sy in _GRID:
+                cam._roi_exact_center_video_aspect_quantized(sx, sy, z)
+    return run
+
+
+@scenario("camera_center_zoom_step_at_sensor_1to8", number=20)
+def _zoom_steps():
+    cam = _camera()
+    # sensor mode switches are a pipeline restart, not a zoom step: keep them out of the number
+    cam.mode_planner = None
+
+    def run():
+        for z in range(1, 9):
+            cam.center_zoom_step_at_sensor(z, (0.4, 0.6))
+            cam.wait_zoom()       # the camera.zoom write happens on the control worker
+    return run
+
+
+# ---------- offline renderer ----------
+@scenario("renderer_frame_reticle_text", number=10)
+def _renderer_frame():
+    import numpy as np
+    import VideoRenderer as vr
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    color = (0, 0, 180)
+
+    def run():
+        vr._draw_reticle(frame, 640, 360, radius=20, ring=1, tick_len=300,
+                         tick_w=1, gap=2, color=color)
+        vr._put_text(frame, vr.FONT_PATH, vr.FONT_SIZE, "REC.", color, at="top-right")
+        vr._put_text(frame, vr.FONT_PATH, vr.FONT_SIZE, "12:34:56", color, at="bottom-left")
+    return run
+
+
+@scenario("camera_display_to_sensor_scalar_x1000", number=5)
+def _map_scalar():
+    cam = _camera()
+
+    def run():
+        f = cam._display_to_sensor_forward
+        for i in range(1000):
+            f(i / 1000.0, 0.5)
+    return run
+
+
+@scenario("camera_display_to_sensor_batch_10k", number=20)
+def _map_batch():
+    import numpy as np
+    cam = _camera()
+    pts = np.random.default_rng(0).random((10000, 2))
+    return lambda: cam.display_to_sensor_forward_np(pts)
+
+
+@scenario("camera_zoom_trajectory_1to8_uncached", number=5)
+def _zoom_trajectory():
+    cam = _camera()
+    anim = cam.zoom_animator
+
+    def run():
+        anim._cache.clear()
+        for z in range(1, 8):
+            anim.trajectory(z, (0.4, 0.6), z + 1, (0.4, 0.6))
+    return run
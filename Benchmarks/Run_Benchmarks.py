@@ -0,0 +1,122 @@
+# Run_Benchmarks.py
+"""
+Run the pinned scenarios, store results as JSON and compare against a baseline.
+
+  python Benchmarks/Run_Benchmarks.py                      # run all, write results/<stamp>.json
+  python Benchmarks/Run_Benchmarks.py -k overlay           # only names containing 'overlay'
+  python Benchmarks/Run_Benchmarks.py --save-baseline      # also overwrite baseline.json
+  python Benchmarks/Run_Benchmarks.py --compare results/X.json   # compare a stored run only
+
+Exit code 1 when any scenario's median is slower than baseline * threshold.
+"""
+import os, sys, json, time, argparse, platform, statistics
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def run_one(setup, number, rounds, warmup=1):
+    fn = setup()
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return {
+        "rounds": rounds,
+        "number": number,
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def run_all(pattern=None, rounds=15):
+    from Bench_Scenarios import SCENARIOS
+    results = {}
+    for name, (setup, number) in SCENARIOS.items():
+        if pattern and pattern not in name:
+            continue
+        r = run_one(setup, number, rounds)
+        results[name] = r
+        print(f"{name:<50} median {r['median_s']*1e3:9.3f} ms  (min {r['min_s']*1e3:.3f})", flush=True)
+    return {
+        "created_utc": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "machine": platform.machine(),
+        "node": platform.node(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=1.10):
+    """Print a table vs baseline; return list of regressed scenario names."""
+    regressed = []
+    base = baseline.get("results", {})
+    print(f"\n{'scenario':<50} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    for name, r in current.get("results", {}).items():
+        b = base.get(name)
+        if not b:
+            print(f"{name:<50} {'-':>10} {r['median_s']*1e3:10.3f}     new")
+            continue
+        ratio = r["median_s"] / b["median_s"] if b["median_s"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  SLOWER"
+            regressed.append(name)
+        elif ratio < 1.0 / threshold:
+            flag = "  faster"
+        print(f"{name:<50} {b['median_s']*1e3:10.3f} {r['median_s']*1e3:10.3f} {ratio:7.2f}{flag}")
+    return regressed
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _dump(obj, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(obj, f, indent=2)
+    print("Wrote:", path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Boresight hot-path microbenchmarks.")
+    ap.add_argument("-k", dest="pattern", help="Only run scenarios whose name contains this.")
+    ap.add_argument("--rounds", type=int, default=15, help="Timed rounds per scenario (default 15).")
+    ap.add_argument("-o", "--output", help="Result JSON path (default results/<stamp>.json).")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against.")
+    ap.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline.")
+    ap.add_argument("--compare", help="Skip running; compare this stored result JSON to the baseline.")
+    ap.add_argument("--threshold", type=float, default=1.10,
+                    help="Median ratio above which a scenario counts as regressed (default 1.10).")
+    args = ap.parse_args()
+
+    if args.compare:
+        current = _load(args.compare)
+    else:
+        current = run_all(args.pattern, args.rounds)
+        out = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+        _dump(current, out)
+        if args.save_baseline:
+            _dump(current, args.baseline)
+
+    if os.path.isfile(args.baseline) and not args.save_baseline:
+        regressed = compare(current, _load(args.baseline), args.threshold)
+        if regressed:
+            print(f"\n{len(regressed)} regression(s) over x{args.threshold:.2f}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,20 @@ from Alarm import BuzzerControl, LEDControl
 import time, datetime
 import jdatetime
 from Record_Manager import MetadataRecorder,RecordingManager
+from Post_Jobs import JobQueue, job_stem
+from Storage_Manager import StorageManager, StorageFull
+from Export_Server import start_export_server
 import os
 import sys
 
 from CPU_Temp import get_cpu_temp
+from Sim_Backends import sim_enabled, install_gpio_mock, ButtonScript
+from Metrics import REGISTRY as METRICS, MetricsExporter
+from Trace import TRACER
+from Sim_Clock import get_clock
+
+# wall clock on the device; BORESIGHT_SIM_CLOCK=virtual swaps in discrete-event time
+clock = get_clock()
 
 OVERLAY_COLOR = (180, 0, 0, 255)
 
@@ -38,6 +48,11 @@ exit_buttons_press_duration = 0
 exit_buttons_hold_time = 0
 exit_buttons_hold_handled = False
 
+# RIGHT/DOWN + OK held -> dump the latency trace
+trace_buttons_start_time = None
+trace_buttons_hold_time = 0
+trace_buttons_hold_handled = False
+
 zoom_Step = 1
 
 def buttons_state_update_callback(flag):
@@ -48,12 +63,13 @@ def buttons_state_update_callback(flag):
     global exit_buttons_hold_time, exit_buttons_hold_handled
     global ok_button_hold_time, ok_button_hold_handled, ok_last_release_time
     global ok_double_tap_pending
+    global trace_buttons_start_time, trace_buttons_hold_time, trace_buttons_hold_handled
     """Callback to receive flags from ButtonControl."""
 
     if flag == ButtonControl.OK_PRESSED:
         button_ok_pressed = True;
         # Start a timer when the button is pressed
-        ok_button_press_start_time = time.time()
+        ok_button_press_start_time = clock.time()
         ok_button_hold_time = 0
         ok_button_hold_handled = False
         print("OK button pressed")
@@ -63,7 +79,7 @@ def buttons_state_update_callback(flag):
         print("OK button released")
         ok_button_hold_time = 0
         if ok_button_press_start_time:
-            now = time.time()
+            now = clock.time()
             ok_button_press_duration = now - ok_button_press_start_time
             ok_button_press_start_time = None  # Reset the timer after release
 
@@ -89,13 +105,13 @@ def buttons_state_update_callback(flag):
 
     if button_left_up_pressed and button_right_down_pressed:
         if arrow_buttons_press_start_time is None:
-            arrow_buttons_press_start_time = time.time()
+            arrow_buttons_press_start_time = clock.time()
             arrow_buttons_press_duration = 0
             arrow_buttons_hold_time = 0
             arrow_buttons_hold_handled = False
     else:
         if arrow_buttons_press_start_time is not None:
-            arrow_buttons_press_duration = time.time() - arrow_buttons_press_start_time
+            arrow_buttons_press_duration = clock.time() - arrow_buttons_press_start_time
         arrow_buttons_press_start_time = None
         arrow_buttons_hold_time = 0
         arrow_buttons_hold_handled = False
@@ -103,23 +119,37 @@ def buttons_state_update_callback(flag):
 
     if button_left_up_pressed and button_ok_pressed:
         if exit_buttons_start_time is None:
-            exit_buttons_start_time = time.time()
+            exit_buttons_start_time = clock.time()
             exit_buttons_press_duration = 0
             exit_buttons_hold_time = 0
             exit_buttons_hold_handled = False
     else:
         if exit_buttons_start_time is not None:
-            exit_buttons_press_duration = time.time() - exit_buttons_start_time
+            exit_buttons_press_duration = clock.time() - exit_buttons_start_time
         exit_buttons_start_time = None
         exit_buttons_hold_time = 0
         exit_buttons_hold_handled = False
 
+    if button_right_down_pressed and button_ok_pressed:
+        if trace_buttons_start_time is None:
+            trace_buttons_start_time = clock.time()
+            trace_buttons_hold_time = 0
+            trace_buttons_hold_handled = False
+    else:
+        trace_buttons_start_time = None
+        trace_buttons_hold_time = 0
+        trace_buttons_hold_handled = False
 
 
 def main():
+    # Headless run (BORESIGHT_SIM=1): gpiozero pins must be mocked before any device exists
+    if sim_enabled():
+        install_gpio_mock()
+        print("[boot] SIMULATION backends", flush=True)
+
     led_control = LEDControl(23)
     buzzer_control = BuzzerControl(12)
-    global prezoom_reticle_px, current_zoom, zoom_anchor_dirty, zoom_anchor_sensor
+    global prezoom_reticle_px, current_zoom, zoom_anchor_dirty, zoom_anchor_sensor, zoom_reset_pending
 
     print("[boot] starting...", flush=True)
 
@@ -127,6 +157,11 @@ def main():
     button_control = ButtonControl(lambda flag: buttons_state_update_callback(flag))
     print("[boot] buttons ok", flush=True)
 
+    button_script = None
+    if sim_enabled() and os.environ.get("BORESIGHT_SIM_BUTTONS"):
+        button_script = ButtonScript.from_file(os.environ["BORESIGHT_SIM_BUTTONS"], clock=clock).start()
+        print("[boot] replaying", os.environ["BORESIGHT_SIM_BUTTONS"], flush=True)
+
     # Initialize state machine
     state_machine = StateMachine()
     # 🔧 ensure it actually runs
@@ -139,8 +174,11 @@ def main():
             print("[boot] state_machine.running=True", flush=True)
 
     # --- Initialize Camera Setup ---
-    camera = CameraSetup()
-    camera.camera.zoom = (0.0, 0.0, 1.0, 1.0)  # reset zoom
+    # low-res proxy recorded next to the full-res file ("640x360"; empty = off)
+    proxy_env = os.environ.get("BORESIGHT_PROXY", "").lower()
+    proxy_resolution = tuple(int(v) for v in proxy_env.split("x")) if proxy_env else None
+    camera = CameraSetup(proxy_resolution=proxy_resolution)
+    camera.apply_zoom((0.0, 0.0, 1.0, 1.0))  # reset zoom
 
     # --- Initialize Overlay Display ---
     overlay_display = OverlayDisplay(radius=20, tick_length=300, ring_thickness=1, tick_thickness=1, gap=-10, color=OVERLAY_COLOR)
@@ -158,7 +196,7 @@ def main():
     except Exception as e:
         print(f"[boot] windowed preview failed: {e}", flush=True)
         camera.stop_preview()  # in case of half-initialized
-        camera = CameraSetup() # re-init camera cleanly
+        camera = CameraSetup(proxy_resolution=proxy_resolution) # re-init camera cleanly
         camera.set_display_aspect(overlay_display.disp_width, overlay_display.disp_height)
         camera.start_preview(fullscreen=True)
         print("[boot] preview started (fullscreen fallback)", flush=True)
@@ -201,6 +239,20 @@ def main():
                         color= OVERLAY_COLOR,
                         offset=(20, 80))
 
+    jobs_overlay = TextOverlay(layer=2005,
+                        font_path="Fonts/Tw_Cen_Condensed.ttf",
+                        font_size=24,
+                        pos=('right', 'top'),
+                        color= OVERLAY_COLOR,
+                        offset=(20, 120))
+
+    disk_overlay = TextOverlay(layer=2007,
+                        font_path="Fonts/Tw_Cen_Condensed.ttf",
+                        font_size=24,
+                        pos=('right', 'top'),
+                        color= OVERLAY_COLOR,
+                        offset=(20, 160))
+
 
     static_png = StaticPNGOverlay("Pictures/Farand_Logo.png", layer=2006,
                               pos=('left','top'),
@@ -208,7 +260,43 @@ def main():
                               offset=20)
     static_png.show()
 
-    record_manager = RecordingManager(base_dir="/home/boresight/Saved_Videos")
+    video_dir = os.environ.get("BORESIGHT_VIDEO_DIR", "/home/boresight/Saved_Videos")
+    # remux/footer/hash run in a nice'd worker process; whatever a crash left behind is picked up again
+    post_jobs = JobQueue(video_dir)
+    post_jobs.scan_orphans()
+    post_jobs.ensure_worker()
+    # free-space preflight + retention (quota 0 = whole card minus the reserve)
+    storage = StorageManager(video_dir,
+                             quota_mb=float(os.environ.get("BORESIGHT_QUOTA_MB", "0")),
+                             reserve_mb=float(os.environ.get("BORESIGHT_RESERVE_MB", "256")))
+    post_jobs.on_done.append(lambda job: job_stem(job) and storage.note_stem(job_stem(job)))
+    # HTTP export of Saved_Videos (Export_Server.py, own idle-priority process); 0 = off.
+    # No auth, so loopback only unless BORESIGHT_EXPORT_HOST opts in (e.g. 0.0.0.0)
+    export_port = int(os.environ.get("BORESIGHT_EXPORT_PORT", "0"))
+    if export_port:
+        start_export_server(video_dir, port=export_port,
+                            host=os.environ.get("BORESIGHT_EXPORT_HOST", "127.0.0.1"))
+    record_manager = RecordingManager(base_dir=video_dir,
+                                      prerecord_seconds=float(os.environ.get("BORESIGHT_PRERECORD_S", "5")),
+                                      jobs=post_jobs,
+                                      # rotate long recordings at a keyframe (0 = off)
+                                      segment_seconds=float(os.environ.get("BORESIGHT_SEGMENT_S", "300")),
+                                      segment_mb=float(os.environ.get("BORESIGHT_SEGMENT_MB", "0")),
+                                      storage=storage,
+                                      # RAM stage between encoder and SD card (0 = write directly)
+                                      stage_mb=float(os.environ.get("BORESIGHT_STAGE_MB", "16")),
+                                      fsync_s=float(os.environ.get("BORESIGHT_FSYNC_S", "1")),
+                                      # "bsc" = binary columnar sidecar (Sidecar_Binary.py export -> .jsonl)
+                                      sidecar_format=os.environ.get("BORESIGHT_SIDECAR", "jsonl"),
+                                      # reticle/zoom/state also inside the H.264 stream (H264_Sei.py)
+                                      sei=os.environ.get("BORESIGHT_SEI", "0") == "1",
+                                      # <stem>_proxy.mp4 from splitter port 2, own bitrate cap
+                                      proxy_resolution=proxy_resolution,
+                                      proxy_bitrate=int(float(os.environ.get("BORESIGHT_PROXY_KBPS", "1500")) * 1000),
+                                      # SHA-256 while writing -> signed <stem>.manifest.json
+                                      # (key: BORESIGHT_SIGN_KEY, default ~/.boresight/manifest.key)
+                                      hash_inline=os.environ.get("BORESIGHT_HASH", "1") == "1")
+    record_manager.arm(camera)   # always-on encoder -> RAM ring, so saved clips include the seconds before REC
 
     # ---- Zoom/reticle behavior state ----
     # ---- Zoom/reticle behavior state ----
@@ -216,9 +304,10 @@ def main():
     zoom_anchor_sensor = None         # (sx, sy) SENSOR-normalized world anchor
     zoom_anchor_dirty = False         # True if user moved reticle while zoomed
     current_zoom = 1
+    zoom_reset_pending = False        # 1x glide under way; force the full frame once it lands
 
 
-    print(f"[boot] cam={camera.camera.resolution}", flush=True)
+    print(f"[boot] cam={camera.resolution}", flush=True)
 
     def center_overlay_reticle():
         overlay_display.center_on_screen(refresh=True)
@@ -237,16 +326,22 @@ def main():
         global exit_buttons_hold_time, exit_buttons_hold_handled
         global zoom_Step, button_ok_pressed
         global prezoom_reticle_px
-        global current_zoom, zoom_anchor_sensor, zoom_anchor_dirty
+        global current_zoom, zoom_anchor_sensor, zoom_anchor_dirty, zoom_reset_pending
         global ok_button_hold_time, ok_button_hold_handled, ok_button_press_start_time
         global ok_double_tap_pending, ok_last_release_time
+        global trace_buttons_start_time, trace_buttons_hold_time, trace_buttons_hold_handled
 
         reticle_STEP = 1  # pixels per tick
         print("[thread] state machine loop entered", flush=True)
 
+        m_tick = METRICS.histogram("state_tick_seconds", "state loop work per tick (excl. sleep)")
+        m_overrun = METRICS.counter("state_tick_overruns_total", "ticks whose work exceeded the tick period")
+        m_state = METRICS.gauge("state_code", "current StateMachineEnum value")
+
         while getattr(state_machine, "running", True):
+            tick_t0 = time.perf_counter()
             if button_ok_pressed and ok_button_press_start_time is not None:
-                ok_button_hold_time = time.time() - ok_button_press_start_time
+                ok_button_hold_time = clock.time() - ok_button_press_start_time
             else:
                 ok_button_hold_time = 0
 
@@ -255,7 +350,7 @@ def main():
                 and button_right_down_pressed
                 and arrow_buttons_press_start_time is not None
             ):
-                arrow_buttons_hold_time = time.time() - arrow_buttons_press_start_time
+                arrow_buttons_hold_time = clock.time() - arrow_buttons_press_start_time
             else:
                 arrow_buttons_hold_time = 0
 
@@ -264,10 +359,24 @@ def main():
                 and button_ok_pressed
                 and exit_buttons_start_time is not None
             ):
-                exit_buttons_hold_time = time.time() - exit_buttons_start_time
+                exit_buttons_hold_time = clock.time() - exit_buttons_start_time
             else:
                 exit_buttons_hold_time = 0
 
+            if (
+                button_right_down_pressed
+                and button_ok_pressed
+                and trace_buttons_start_time is not None
+            ):
+                trace_buttons_hold_time = clock.time() - trace_buttons_start_time
+            else:
+                trace_buttons_hold_time = 0
+
+            if trace_buttons_hold_time >= 3 and not trace_buttons_hold_handled:
+                trace_buttons_hold_handled = True
+                buzzer_control.start_toggle(0.1, 0.1, 3)
+                threading.Thread(target=TRACER.dump, daemon=True).start()
+
             current_state = state_machine.get_state()
             tick = 0.125  # default tick
 
@@ -279,13 +388,20 @@ def main():
                 print("[thread] -> NORMAL_STATE", flush=True)
 
             elif current_state == StateMachineEnum.NORMAL_STATE:
+                # 1x is always the full frame: once the zoom-out glide has landed, fix up
+                # anything the trajectory left behind
+                if zoom_reset_pending and not camera.zoom_animator.busy():
+                    zoom_reset_pending = False
+                    if current_zoom == 1 and tuple(round(v, 6) for v in camera.zoom) != (0.0, 0.0, 1.0, 1.0):
+                        camera.set_zoom((0.0, 0.0, 1.0, 1.0))
+
                 if ok_double_tap_pending:
                     ok_double_tap_pending = False
                     overlay_display.center_on_screen(refresh=True)
                     overlay_display.save_offset()
                     if current_zoom > 1:
                         nx, ny = overlay_display.reticle_norm_on_display()
-                        rx, ry, rw, rh = camera.camera.zoom
+                        rx, ry, rw, rh = camera.zoom
                         u, v = camera._display_to_sensor_forward(nx, ny)
                         sx = rx + u * rw
                         sy = ry + v * rh
@@ -297,11 +413,12 @@ def main():
                     ok_button_hold_time >= 3
                     and not ok_button_hold_handled
                     and exit_buttons_hold_time == 0
+                    and trace_buttons_hold_time == 0
                 ):
                     ok_button_press_duration = 0
                     ok_button_hold_handled = True
                     ok_button_hold_time = 0
-                    ok_button_press_start_time = time.time()
+                    ok_button_press_start_time = clock.time()
                     ok_button_press_duration = 0
                     buzzer_control.start_toggle(0.5, 1, 1)
                     state_machine.change_state(StateMachineEnum.HORIZONTAL_ADJUSTMENT)
@@ -311,6 +428,7 @@ def main():
 
                 # ---- Zoom In ----
                 if button_left_up_pressed and not button_right_down_pressed and not button_ok_pressed:
+                    t_trace = TRACER.begin()
                     if current_zoom == 1:
                         # save overlay pixel position for potential restore later
                         prezoom_reticle_px = overlay_display.get_center()
@@ -326,20 +444,22 @@ def main():
                     state_overlay.set_text(f"Zoom {current_zoom}x" if current_zoom > 1 else "LIVE")
                     buzzer_control.start_toggle(0.5, 1, 1)
 
-                    # center ROI on the same world anchor each step
-                    camera.center_zoom_step_at_sensor(current_zoom, zoom_anchor_sensor)
+                    # glide the ROI onto the same world anchor each step (animator thread applies it)
+                    camera.animate_zoom_at_sensor(current_zoom, zoom_anchor_sensor)
                     # if you prefer keeping the reticle visually centered while zoomed:
                     overlay_display.center_on_screen(refresh=True)
+                    TRACER.end("state.zoom_in", t_trace, {"zoom": current_zoom})
 
 
                 # ---- Zoom Out ----
                 if button_right_down_pressed and not button_left_up_pressed and not button_ok_pressed:
+                    t_trace = TRACER.begin()
                     current_zoom = max(1, current_zoom - 1)
                     state_overlay.set_text(f"Zoom {current_zoom}x" if current_zoom > 1 else "LIVE")
                     buzzer_control.start_toggle(0.5, 1, 1)
 
                     if current_zoom > 1:
-                        camera.center_zoom_step_at_sensor(current_zoom, zoom_anchor_sensor)
+                        camera.animate_zoom_at_sensor(current_zoom, zoom_anchor_sensor)
                         overlay_display.center_on_screen(refresh=True)
                     else:
                         # back to 1× full frame
@@ -348,9 +468,8 @@ def main():
                             nx_reset, ny_reset = overlay_display.reticle_norm_on_display()
                             anchor_sensor = camera._display_to_sensor_forward(nx_reset, ny_reset)
 
-                        _, _, roi_reset = camera.center_zoom_step_at_sensor(1.0, anchor_sensor)
-                        if tuple(round(v, 6) for v in roi_reset) != (0.0, 0.0, 1.0, 1.0):
-                            camera.camera.zoom = (0.0, 0.0, 1.0, 1.0)
+                        camera.animate_zoom_at_sensor(1.0, anchor_sensor)
+                        zoom_reset_pending = True
 
                         if zoom_anchor_sensor and zoom_anchor_dirty:
                             # place reticle at the correct 1× screen position of the world anchor
@@ -383,6 +502,7 @@ def main():
                         zoom_anchor_sensor = None
                         zoom_anchor_dirty = False
                         prezoom_reticle_px = None
+                    TRACER.end("state.zoom_out", t_trace, {"zoom": current_zoom})
 
                 # GOTO RECORDING STATE
                 if arrow_buttons_hold_time >= 3 and not arrow_buttons_hold_handled:
@@ -401,21 +521,34 @@ def main():
                     exit_buttons_hold_time = 0
                     exit_buttons_press_duration = 0
                     buzzer_control.start_toggle(1, 1, 2)
-                    time.sleep(3)
+                    clock.sleep(3)
                     print("[thread] exit requested", flush=True)
+                    try:
+                        metrics_exporter.write_json()  # final snapshot; os._exit skips finally
+                    except Exception:
+                        pass
                     os._exit(0)
 
             elif current_state == StateMachineEnum.RECORD_STATE:
                 if not record_manager.active:
-                    record_manager.start(
-                        camera=camera.camera,
-                        overlay_display=overlay_display,
-                        state_text_fn=lambda: (state_overlay.last_text or "")
-                    )
-                    print("Recording to:", record_manager.video_path, flush=True)
-                    print("Metadata to  :", record_manager.meta_path, flush=True)
-
-                if ok_button_press_duration > 0:
+                    try:
+                        record_manager.start(
+                            camera=camera.camera,
+                            overlay_display=overlay_display,
+                            state_text_fn=lambda: (state_overlay.last_text or ""),
+                            zoom_fn=lambda: camera.zoom,
+                        )
+                        print("Recording to:", record_manager.video_path, flush=True)
+                        print("Metadata to  :", record_manager.meta_path, flush=True)
+                    except StorageFull as e:
+                        # nothing left to evict: refuse and stay LIVE
+                        print(f"[rec] {e}", flush=True)
+                        led_control.stop()
+                        buzzer_control.start_toggle(0.1, 0.1, 3)
+                        state_overlay.set_text("LIVE")
+                        state_machine.change_state(StateMachineEnum.NORMAL_STATE)
+
+                if record_manager.active and ok_button_press_duration > 0:
                     ok_button_press_duration = 0
                     buzzer_control.start_toggle(0.25, 1, 1)
                     led_control.stop()
@@ -441,7 +574,7 @@ def main():
                     overlay_display.save_offset()
                     if current_zoom > 1:
                         nx, ny = overlay_display.reticle_norm_on_display()
-                        rx, ry, rw, rh = camera.camera.zoom
+                        rx, ry, rw, rh = camera.zoom
                         u, v = camera._display_to_sensor_forward(nx, ny)
                         sx = rx + u * rw
                         sy = ry + v * rh
@@ -451,7 +584,7 @@ def main():
 
                 if current_zoom > 1:
                     nx, ny = overlay_display.reticle_norm_on_display()
-                    rx, ry, rw, rh = camera.camera.zoom
+                    rx, ry, rw, rh = camera.zoom
                     u, v = camera._display_to_sensor_forward(nx, ny)
                     sx = rx + u * rw
                     sy = ry + v * rh
@@ -462,7 +595,7 @@ def main():
                 if ok_button_hold_time >= 3:
                     ok_button_press_duration = 0
                     ok_button_hold_time = 0
-                    ok_button_press_start_time = time.time()
+                    ok_button_press_start_time = clock.time()
 
                     buzzer_control.start_toggle(0.25, 1, 1)
                     state_overlay.set_text("V ADJ.")
@@ -482,7 +615,7 @@ def main():
                     overlay_display.save_offset()
                     if current_zoom > 1:
                         nx, ny = overlay_display.reticle_norm_on_display()
-                        rx, ry, rw, rh = camera.camera.zoom
+                        rx, ry, rw, rh = camera.zoom
                         u, v = camera._display_to_sensor_forward(nx, ny)
                         sx = rx + u * rw
                         sy = ry + v * rh
@@ -492,7 +625,7 @@ def main():
 
                 if current_zoom > 1:
                     nx, ny = overlay_display.reticle_norm_on_display()
-                    rx, ry, rw, rh = camera.camera.zoom
+                    rx, ry, rw, rh = camera.zoom
                     u, v = camera._display_to_sensor_forward(nx, ny)
                     sx = rx + u * rw
                     sy = ry + v * rh
@@ -509,7 +642,7 @@ def main():
                     state_overlay.set_text("LIVE")
                     state_machine.change_state(StateMachineEnum.NORMAL_STATE)
                     ok_button_hold_handled = True
-                    ok_button_press_start_time = time.time()
+                    ok_button_press_start_time = clock.time()
                     print("[thread] -> NORMAL_STATE", flush=True)
 
             elif current_state == StateMachineEnum.SAVING_VIDEO_STATE:
@@ -518,20 +651,38 @@ def main():
                     state_overlay.set_text("LIVE")
                     print("[thread] saving done -> NORMAL_STATE", flush=True)
 
-            time.sleep(tick)
+            work = time.perf_counter() - tick_t0
+            m_tick.observe(work)
+            m_state.set(current_state.value)
+            if work > tick:
+                m_overrun.inc()
+            clock.sleep(tick)
+
+    TRACER.install_signal()  # kill -USR1 <pid> dumps the trace
+
+    metrics_exporter = MetricsExporter(
+        json_path=os.environ.get("BORESIGHT_METRICS_JSON", "/tmp/boresight_metrics.json"),
+        socket_path=os.environ.get("BORESIGHT_METRICS_SOCK", "/tmp/boresight_metrics.sock"),
+    ).start()
 
     # Start the state machine thread
-    t = threading.Thread(target=state_machine_thread, daemon=True)
-    t.start()
+    t = clock.start_thread(state_machine_thread)
     print("[boot] state thread started", flush=True)
 
+    if clock.virtual:
+        clock.register()      # heartbeat loop below sleeps on the virtual clock too
+        clock.start_driver()
+        print("[boot] virtual clock driver started", flush=True)
+
     # Low-CPU main loop (heartbeat)
-    last_save_time = time.time()
+    last_save_time = clock.time()
     last_sec = None
+    last_jobs_text = None
+    last_disk_text = None
     try:
         while True:
-            time.sleep(0.05)
-            dt  = datetime.datetime.now()
+            clock.sleep(0.05)
+            dt  = datetime.datetime.fromtimestamp(clock.time())
             # Clock update once per second
             now_time = dt.strftime("%H:%M:%S")
             jdate_str = jdatetime.datetime.fromgregorian(datetime = dt).strftime('%Y/%m/%d')
@@ -543,13 +694,31 @@ def main():
                 calender_overlay.set_text(jdate_str)
 
                 cpu_temp_overlay.set_text(cpu_temp_str)
+
+                # background remux/hash progress (blank when idle)
+                left, pct = post_jobs.progress()
+                if left:
+                    post_jobs.ensure_worker()
+                jobs_text = f"SAVING {pct}% ({left})" if left else ""
+                if jobs_text != last_jobs_text:
+                    last_jobs_text = jobs_text
+                    jobs_overlay.set_text(jobs_text)
+
+                # projected recording time left; try retention before it runs out
+                recording = record_manager.active
+                disk_text = storage.hud_text(recording, record_manager.bytes_in_flight)
+                if disk_text and recording:
+                    storage.evict(storage.rate * storage.warn_s)
+                if disk_text != last_disk_text:
+                    last_disk_text = disk_text
+                    disk_overlay.set_text(disk_text)
                 # heartbeat
                 # print(f"[hb] {now}", flush=True)
 
             # Save offset every 10 seconds
-            if time.time() - last_save_time >= 10:
+            if clock.time() - last_save_time >= 10:
                 overlay_display.save_offset()
-                last_save_time = time.time()
+                last_save_time = clock.time()
 
     except KeyboardInterrupt:
         print("Exiting...", flush=True)
@@ -564,6 +733,7 @@ def main():
         except: pass
         camera.stop_preview()
         state_machine.stop()
+        metrics_exporter.stop()
         print("[exit] cleaned up", flush=True)
 
 
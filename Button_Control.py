@@ -1,5 +1,6 @@
 from gpiozero import Button
 from State_Machine import StateMachineEnum
+from Trace import TRACER
 class ButtonControl:
         # Define the flags as constants in the ButtonControl class
     OK_PRESSED = "OK_PRESSED"
@@ -27,21 +28,26 @@ class ButtonControl:
         self.button_ok.when_pressed = self.on_ok_pressed
         self.button_ok.when_released = self.on_ok_released
 
+    def _emit(self, flag):
+        # every edge starts a new trace flow (input -> photon)
+        TRACER.instant("gpio." + flag, new_flow=True)
+        self.state_update_callback(flag)
+
     def on_left_or_up(self):
         """Move the crosshair left/up."""
-        self.state_update_callback(ButtonControl.LEFT_UP_BUTTON_PRESSED)
+        self._emit(ButtonControl.LEFT_UP_BUTTON_PRESSED)
     def on_left_or_up_released(self):
-        self.state_update_callback(ButtonControl.LEFT_UP_BUTTON_RELEASED)
+        self._emit(ButtonControl.LEFT_UP_BUTTON_RELEASED)
 
     def on_right_or_down(self):
         """Move the crosshair right/down."""
-        self.state_update_callback(ButtonControl.RIGHT_DOWN_BUTTON_PRESSED)
+        self._emit(ButtonControl.RIGHT_DOWN_BUTTON_PRESSED)
 
     def on_right_or_down_released(self):
-        self.state_update_callback(ButtonControl.RIGHT_DOWN_BUTTON_RELEASED)
+        self._emit(ButtonControl.RIGHT_DOWN_BUTTON_RELEASED)
 
     def on_ok_pressed(self):
-        self.state_update_callback(ButtonControl.OK_PRESSED)
+        self._emit(ButtonControl.OK_PRESSED)
 
     def on_ok_released(self):
-        self.state_update_callback(ButtonControl.OK_RELEASED)
\ No newline at end of file
+        self._emit(ButtonControl.OK_RELEASED)
\ No newline at end of file
@@ -1,6 +1,10 @@
 import os
 import math
+from Sim_Backends import sim_enabled
+
 def get_cpu_temp():
+	if sim_enabled():
+		return 45
 	with os.popen('cat /sys/class/thermal/thermal_zone0/temp') as temp_file:
 		temp_str = temp_file.read().strip()
 		
@@ -0,0 +1,587 @@
+# Camera_Backends.py
+"""
+Camera backends behind CameraSetup. Each one exposes the PiCamera-style surface
+the rest of the app already uses (zoom, start/stop_recording, frame, framerate,
+resolution, start/stop_preview, close) plus a few explicit calls:
+
+  configure(...)            one-time setup (resolution, sensor mode, exposure, orientation)
+  set_orientation(...)      rotation / hflip / vflip
+  set_exposure(**settings)  iso, exposure_mode, awb_mode, shutter_speed, ...
+  set_sensor_mode(mode)     switch to a Sensor_Modes.SensorMode (not while recording)
+  split_recording(output)   carry on recording into output from the next keyframe (blocks)
+  splitter_port=2           start/split/stop_recording on a second encoder, e.g. a resized
+                            low-bitrate proxy (resize=(w, h), bitrate=...) next to the main one
+  sensor_model              'imx219' / 'ov5647' / ... (picks the Sensor_Modes table)
+  capture_array()           latest frame as HxWx3 uint8 (a copy)
+  frame_view()              context manager yielding the frame without copying where possible
+
+  PiCameraBackend   legacy MMAL stack (picamera)
+  Picamera2Backend  libcamera (picamera2): ScalerCrop for zoom, DMA-buf mapped frames
+  FakeCameraBackend software camera for BORESIGHT_SIM (zoom really crops a test scene)
+
+The ROI quantization and display<->sensor mapping stay in CameraSetup; zoom here
+is always the normalized (x, y, w, h) sensor ROI picamera uses.
+
+Picked by open_backend(): explicit name, else BORESIGHT_CAMERA_BACKEND
+('picamera', 'picamera2', 'fake'), else fake in sim mode, picamera if installed,
+picamera2 otherwise.
+"""
+import os
+import time
+import threading
+import collections
+from contextlib import contextmanager
+
+import numpy as np
+
+BACKEND_ENV = "BORESIGHT_CAMERA_BACKEND"
+
+# Same fields as picamera.PiVideoFrame (what the recorder reads)
+VideoFrame = collections.namedtuple(
+    "VideoFrame",
+    "index frame_type frame_size video_size split_size timestamp complete")
+
+
+class CameraBackend:
+    name = "base"
+
+    def configure(self, resolution=(1280, 720), sensor_mode=0, iso=0, framerate=30,
+                  exposure_mode="auto", awb_mode="auto", rotation=0, hflip=False, vflip=False,
+                  proxy_resolution=None):
+        raise NotImplementedError
+
+    # --- controls ---
+    @property
+    def zoom(self):
+        raise NotImplementedError
+
+    @zoom.setter
+    def zoom(self, roi):
+        raise NotImplementedError
+
+    def set_orientation(self, rotation=0, hflip=False, vflip=False):
+        raise NotImplementedError
+
+    def set_exposure(self, **settings):
+        raise NotImplementedError
+
+    sensor_model = None
+
+    def set_sensor_mode(self, mode):
+        raise NotImplementedError
+
+    # --- preview ---
+    def start_preview(self, fullscreen=True, **kw):
+        raise NotImplementedError
+
+    def stop_preview(self):
+        raise NotImplementedError
+
+    # --- recording ---
+    def start_recording(self, output, format=None, **kw):
+        raise NotImplementedError
+
+    def split_recording(self, output, **kw):
+        raise NotImplementedError
+
+    def wait_recording(self, timeout=0):
+        time.sleep(max(0.0, timeout))
+
+    def stop_recording(self, splitter_port=1):
+        raise NotImplementedError
+
+    @property
+    def frame(self):
+        """VideoFrame-like info about the last encoded frame (None when idle)."""
+        return None
+
+    # --- frame access ---
+    def capture_array(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def frame_view(self):
+        yield self.capture_array()
+
+    def close(self):
+        pass
+
+
+def _recording_format(output, format):
+    if format:
+        return format
+    if isinstance(output, str):
+        return os.path.splitext(output)[1][1:].lower() or "h264"
+    return "h264"
+
+
+# ===================
+# picamera (MMAL)
+# ===================
+class PiCameraBackend(CameraBackend):
+    name = "picamera"
+
+    def __init__(self, device=None):
+        if device is None:
+            from picamera import PiCamera
+            device = PiCamera()
+        self.device = device
+
+    def configure(self, resolution=(1280, 720), sensor_mode=0, iso=0, framerate=30,
+                  exposure_mode="auto", awb_mode="auto", rotation=0, hflip=False, vflip=False,
+                  proxy_resolution=None):
+        # proxy_resolution: nothing to set up, picamera resizes per port at start_recording
+        d = self.device
+        d.resolution    = resolution
+        d.sensor_mode   = sensor_mode
+        d.iso           = iso
+        d.framerate     = framerate
+        d.exposure_mode = exposure_mode
+        d.awb_mode      = awb_mode
+        self.set_orientation(rotation, hflip, vflip)
+
+    @property
+    def resolution(self):
+        return self.device.resolution
+
+    @property
+    def framerate(self):
+        return self.device.framerate
+
+    @property
+    def zoom(self):
+        return self.device.zoom
+
+    @zoom.setter
+    def zoom(self, roi):
+        self.device.zoom = roi
+
+    def set_orientation(self, rotation=0, hflip=False, vflip=False):
+        self.device.rotation = int(rotation)  # 0, 90, 180, 270
+        self.device.hflip    = bool(hflip)
+        self.device.vflip    = bool(vflip)
+
+    def set_exposure(self, **settings):
+        for k, v in settings.items():
+            setattr(self.device, k, v)
+
+    @property
+    def sensor_model(self):
+        return str(getattr(self.device, "revision", "") or "").lower() or None
+
+    def set_sensor_mode(self, mode):
+        # picamera restarts the pipeline itself; it refuses while recording
+        self.device.sensor_mode = mode.index
+
+    def start_preview(self, fullscreen=True, **kw):
+        return self.device.start_preview(fullscreen=fullscreen, **kw)
+
+    def stop_preview(self):
+        self.device.stop_preview()
+
+    def start_recording(self, output, format=None, **kw):
+        self.device.start_recording(output, format=format, **kw)
+
+    def split_recording(self, output, **kw):
+        # picamera waits for the next SPS header (inline_headers) and switches there
+        self.device.split_recording(output, **kw)
+
+    def wait_recording(self, timeout=0):
+        self.device.wait_recording(timeout)
+
+    def stop_recording(self, splitter_port=1):
+        # splitter_port / resize / bitrate are native picamera arguments
+        self.device.stop_recording(splitter_port=splitter_port)
+
+    @property
+    def recording(self):
+        return bool(self.device.recording)
+
+    @property
+    def frame(self):
+        return self.device.frame
+
+    def capture_array(self):
+        from picamera.array import PiRGBArray
+        out = PiRGBArray(self.device)
+        self.device.capture(out, "rgb", use_video_port=True)
+        return out.array
+
+    def close(self):
+        self.device.close()
+
+
+# ===================
+# picamera2 (libcamera)
+# ===================
+class Picamera2Backend(CameraBackend):
+    """
+    libcamera via picamera2. Zoom becomes the ScalerCrop control (sensor pixels
+    inside ScalerCropMaximum), orientation a libcamera Transform (the ISP can
+    only flip, so rotation must be 0 or 180), recording an H264Encoder feeding
+    the same .h264 path the recorder remuxes. sensor_mode uses the picamera
+    numbering from Sensor_Modes (mapped to the raw size); unknown -> libcamera
+    chooses. ScalerCrop limits are re-read per mode, so zoom stays mode-relative.
+    Splitter port 2 is a second H264Encoder on the "lores" stream, which exists
+    when configure() got a proxy_resolution.
+    """
+    name = "picamera2"
+    _AWB = {"auto": "Auto", "incandescent": "Incandescent", "tungsten": "Tungsten",
+            "fluorescent": "Fluorescent", "indoor": "Indoor", "sunlight": "Daylight",
+            "sun": "Daylight", "daylight": "Daylight", "cloudy": "Cloudy"}
+    _METER = {"average": "CentreWeighted", "spot": "Spot", "matrix": "Matrix"}
+
+    def __init__(self, camera_num=0, bitrate=17_000_000):
+        from picamera2 import Picamera2
+        self.picam2 = Picamera2(camera_num)
+        props = self.picam2.camera_properties
+        crop = props.get("ScalerCropMaximum")
+        if not crop:
+            pw, ph = props.get("PixelArraySize", (0, 0))
+            crop = (0, 0, pw, ph)
+        self._crop_max = tuple(int(v) for v in crop)
+        self.bitrate = int(bitrate)
+        self.intra_period = 30
+
+        self._lock = threading.Lock()
+        self._config = {}
+        self._zoom = (0.0, 0.0, 1.0, 1.0)
+        self._encoder = None
+        self._output = None
+        self._proxy = None            # (encoder, output) on the lores stream
+        self._frame = None
+        self._frame_index = 0
+        self._t0_ns = None
+        self._preview = False
+
+    # --- setup ---
+    def configure(self, resolution=(1280, 720), sensor_mode=0, iso=0, framerate=30,
+                  exposure_mode="auto", awb_mode="auto", rotation=0, hflip=False, vflip=False,
+                  proxy_resolution=None):
+        from Sensor_Modes import SENSOR_MODES
+        raw = None
+        for m in SENSOR_MODES.get(self.sensor_model, ()):
+            if m.index == sensor_mode:
+                raw = (m.width, m.height)
+        self._config = dict(resolution=tuple(resolution), raw_size=raw, framerate=framerate,
+                            rotation=int(rotation), hflip=bool(hflip), vflip=bool(vflip),
+                            lores=tuple(proxy_resolution) if proxy_resolution else None)
+        self._reconfigure()
+        self.set_exposure(iso=iso, exposure_mode=exposure_mode, awb_mode=awb_mode)
+
+    def _reconfigure(self):
+        from libcamera import Transform
+        c = self._config
+        rot = c["rotation"] % 360
+        if rot not in (0, 180):
+            raise ValueError(f"libcamera can only flip; rotation {rot} is not supported")
+        flip = rot == 180
+        kw = dict(main={"size": c["resolution"], "format": "XRGB8888"},
+                  transform=Transform(hflip=c["hflip"] ^ flip, vflip=c["vflip"] ^ flip),
+                  controls={"FrameRate": float(c["framerate"])},
+                  buffer_count=6)
+        if c["raw_size"]:
+            kw["raw"] = {"size": c["raw_size"]}
+        if c.get("lores"):
+            kw["lores"] = {"size": c["lores"], "format": "YUV420"}
+
+        was_running = self.picam2.started
+        if was_running:
+            self.picam2.stop()
+        self.picam2.configure(self.picam2.create_video_configuration(**kw))
+        self.picam2.start()
+        lim = self.picam2.camera_controls.get("ScalerCrop")
+        if lim and lim[1]:
+            self._crop_max = tuple(int(v) for v in lim[1])   # this mode's readable window
+        self.zoom = self._zoom
+
+    @property
+    def resolution(self):
+        return self._config.get("resolution")
+
+    @property
+    def framerate(self):
+        return self._config.get("framerate")
+
+    # --- controls ---
+    @property
+    def zoom(self):
+        return self._zoom
+
+    @zoom.setter
+    def zoom(self, roi):
+        x, y, w, h = (float(v) for v in roi)
+        mx, my, mw, mh = self._crop_max
+        crop = (mx + int(round(x * mw)), my + int(round(y * mh)),
+                max(1, int(round(w * mw))), max(1, int(round(h * mh))))
+        self.picam2.set_controls({"ScalerCrop": crop})
+        self._zoom = (x, y, w, h)
+
+    def set_orientation(self, rotation=0, hflip=False, vflip=False):
+        if self._encoder is not None:
+            raise RuntimeError("can't change orientation while recording")
+        self._config.update(rotation=int(rotation), hflip=bool(hflip), vflip=bool(vflip))
+        self._reconfigure()
+
+    @property
+    def sensor_model(self):
+        return str(self.picam2.camera_properties.get("Model", "") or "").lower() or None
+
+    def set_sensor_mode(self, mode):
+        if self._encoder is not None:
+            raise RuntimeError("can't change sensor mode while recording")
+        self._config["raw_size"] = (mode.width, mode.height)
+        self._reconfigure()
+
+    def set_exposure(self, **settings):
+        from libcamera import controls
+        ctl = {}
+        for k, v in settings.items():
+            if k == "iso":
+                if v:
+                    ctl["AnalogueGain"] = float(v) / 100.0
+            elif k == "exposure_mode":
+                ctl["AeEnable"] = v != "off"
+            elif k == "awb_mode":
+                if v == "off":
+                    ctl["AwbEnable"] = False
+                else:
+                    ctl["AwbEnable"] = True
+                    ctl["AwbMode"] = getattr(controls.AwbModeEnum, self._AWB.get(v, "Auto"))
+            elif k == "shutter_speed":
+                if v:
+                    ctl["ExposureTime"] = int(v)          # us, like picamera
+            elif k == "exposure_compensation":
+                ctl["ExposureValue"] = float(v) / 6.0     # picamera steps are 1/6 stop
+            elif k == "brightness":
+                ctl["Brightness"] = (float(v) - 50.0) / 50.0
+            elif k == "contrast":
+                ctl["Contrast"] = 1.0 + float(v) / 100.0
+            elif k == "saturation":
+                ctl["Saturation"] = 1.0 + float(v) / 100.0
+            elif k == "meter_mode":
+                ctl["AeMeteringMode"] = getattr(controls.AeMeteringModeEnum,
+                                                self._METER.get(v, "CentreWeighted"))
+            else:
+                raise ValueError(f"Unsupported exposure setting {k!r}")
+        if ctl:
+            self.picam2.set_controls(ctl)
+
+    # --- preview ---
+    def start_preview(self, fullscreen=True, **kw):
+        from picamera2 import Preview
+        if self._preview:
+            return
+        # a preview can only be attached while stopped
+        self.picam2.stop()
+        args = {}
+        if not fullscreen and "window" in kw:
+            x, y, w, h = kw["window"]
+            args = dict(x=x, y=y, width=w, height=h)
+        self.picam2.start_preview(Preview.DRM, **args)
+        self.picam2.start()
+        self._preview = True
+
+    def stop_preview(self):
+        if self._preview:
+            self.picam2.stop_preview()
+            self._preview = False
+
+    # --- recording ---
+    def _on_encoded(self, size, keyframe, timestamp_us):
+        """
+        Main encoder output, one call per ENCODED frame (before its bytes reach the
+        sink): index, keyframe flag and timestamp come from the encoder, so dropped
+        frames and repeated headers can't put .frame out of step with the stream.
+        """
+        if timestamp_us is None:
+            timestamp_us = time.monotonic_ns() // 1000
+        with self._lock:
+            if self._t0_ns is None:
+                self._t0_ns = int(timestamp_us) * 1000
+            i = self._frame_index
+            self._frame_index = i + 1
+            self._frame = VideoFrame(i, 1 if keyframe else 0, size, None, None,
+                                     int(timestamp_us) - self._t0_ns // 1000, True)
+
+    def start_recording(self, output, format=None, bitrate=None, intra_period=None, splitter_port=1,
+                        resize=None, **kw):
+        from picamera2.encoders import H264Encoder
+        from picamera2.outputs import FileOutput
+        fmt = _recording_format(output, format)
+        if fmt != "h264":
+            raise ValueError(f"Unsupported format {fmt}")  # recorder falls back to .h264 + remux
+        if splitter_port == 2:
+            lores = self._config.get("lores")
+            if not lores or (resize and tuple(resize) != lores):
+                raise RuntimeError(f"no lores stream of {resize} configured (configure(proxy_resolution=...))")
+            if self._proxy is not None:
+                raise RuntimeError("proxy recording is already running")
+            enc = H264Encoder(bitrate=int(bitrate or self.bitrate // 8), repeat=True, iperiod=self.intra_period)
+            out = _split_file_output(FileOutput)(output)
+            self.picam2.start_encoder(enc, out, name="lores")
+            self._proxy = (enc, out)
+            return
+        if self._encoder is not None:
+            raise RuntimeError("recording is already running")
+        if intra_period:
+            self.intra_period = int(intra_period)
+        enc = H264Encoder(bitrate=int(bitrate or self.bitrate), repeat=True, iperiod=self.intra_period)
+        with self._lock:
+            self._frame_index = 0
+            self._t0_ns = None
+            self._frame = None
+        self._output = _split_file_output(FileOutput)(output, on_frame=self._on_encoded)
+        self.picam2.start_encoder(enc, self._output)
+        self._encoder = enc
+
+    def split_recording(self, output, timeout=5.0, splitter_port=1, **kw):
+        out = self._output if splitter_port == 1 else (self._proxy[1] if self._proxy else None)
+        if out is None or (splitter_port == 1 and self._encoder is None):
+            raise RuntimeError("not recording")
+        if not out.split(output, timeout):
+            raise RuntimeError("timed out waiting for a keyframe to split at")
+
+    def stop_recording(self, splitter_port=1):
+        if splitter_port == 2:
+            proxy, self._proxy = self._proxy, None
+            if proxy is not None:
+                self.picam2.stop_encoder(proxy[0])
+            return
+        enc, self._encoder = self._encoder, None
+        if enc is not None:
+            self.picam2.stop_encoder(enc)
+
+    @property
+    def recording(self):
+        return self._encoder is not None or self._proxy is not None
+
+    @property
+    def frame(self):
+        return self._frame
+
+    # --- frame access ---
+    def capture_array(self):
+        return self.picam2.capture_array("main")[..., :3]
+
+    @contextmanager
+    def frame_view(self):
+        """Mapped DMA-buf of the newest request (BGRX); only valid inside the block."""
+        from picamera2 import MappedArray
+        with self.picam2.captured_request() as req:
+            with MappedArray(req, "main") as m:
+                yield m.array
+
+    def close(self):
+        self.stop_recording(2)
+        self.stop_recording()
+        self.stop_preview()
+        self.picam2.stop()
+        self.picam2.close()
+
+
+def _split_file_output(FileOutput):
+    """FileOutput that can switch files at the next keyframe (picamera2 has no split_recording)."""
+    class SplitFileOutput(FileOutput):
+        def __init__(self, file=None, *args, on_frame=None, **kw):
+            super().__init__(file, *args, **kw)
+            self._on_frame = on_frame     # (size, keyframe, timestamp_us) per encoded frame
+            self._next = None
+            self._owned = False       # True when the current file was opened by split()
+            self._switched = threading.Event()
+
+        def split(self, file, timeout=5.0):
+            self._switched.clear()
+            # paths are opened here so the old one can be closed at the switch
+            self._next = (open(file, "wb"), True) if isinstance(file, str) else (file, False)
+            if self._switched.wait(timeout):
+                return True
+            nxt, self._next = self._next, None
+            if nxt and nxt[1]:
+                nxt[0].close()
+            return False
+
+        def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+            # same signature as FileOutput.outputframe: picamera2 passes packet/audio positionally
+            if audio:
+                return super().outputframe(frame, keyframe, timestamp, packet, audio)
+            if self._on_frame is not None:
+                self._on_frame(len(frame), keyframe, timestamp)
+            if keyframe and self._next is not None:
+                (nxt, owned), self._next = self._next, None
+                old, self._owned = self._owned, owned
+                prev = self.fileoutput
+                self.fileoutput = nxt
+                if old:
+                    prev.close()
+                self._switched.set()
+            return super().outputframe(frame, keyframe, timestamp, packet, audio)
+    return SplitFileOutput
+
+
+# ===================
+# software fake
+# ===================
+class FakeCameraBackend(PiCameraBackend):
+    """
+    FakePiCamera (zoom log + synthetic H.264) plus a generated test scene, so
+    capture_array() shows the current ROI like a real sensor crop would.
+    """
+    name = "fake"
+    SCENE_SIZE = (1640, 1232)   # 4:3 like the full sensor
+
+    def __init__(self, clock=None, device=None):
+        if device is None:
+            from Sim_Backends import FakePiCamera
+            device = FakePiCamera(clock=clock)
+        super().__init__(device)
+        self._scene = None
+
+    def _make_scene(self):
+        w, h = self.SCENE_SIZE
+        xs = np.arange(w, dtype=np.int32)
+        ys = np.arange(h, dtype=np.int32)
+        scene = np.empty((h, w, 3), dtype=np.uint8)
+        scene[..., 0] = (xs * 255 // (w - 1))[None, :]
+        scene[..., 1] = (ys * 255 // (h - 1))[:, None]
+        scene[..., 2] = 64
+        scene[::64, :, :] = 255     # grid every 64 sensor px
+        scene[:, ::64, :] = 255
+        return scene
+
+    def capture_array(self):
+        if self._scene is None:
+            self._scene = self._make_scene()
+        w, h = self.device.resolution
+        x, y, zw, zh = self.device.zoom
+        sh, sw = self._scene.shape[:2]
+        cols = ((x + (np.arange(w) + 0.5) / w * zw) * sw).astype(np.intp).clip(0, sw - 1)
+        rows = ((y + (np.arange(h) + 0.5) / h * zh) * sh).astype(np.intp).clip(0, sh - 1)
+        return self._scene[rows[:, None], cols[None, :]]
+
+
+_BACKENDS = {
+    "picamera": PiCameraBackend,
+    "picamera2": Picamera2Backend,
+    "fake": FakeCameraBackend,
+}
+
+
+def open_backend(name=None, clock=None, **kw):
+    """Instantiate a backend by name (see module docstring for the default order)."""
+    name = (name or os.environ.get(BACKEND_ENV, "") or "auto").strip().lower()
+    if name == "auto":
+        from Sim_Backends import sim_enabled
+        if sim_enabled():
+            name = "fake"
+        else:
+            try:
+                import picamera  # noqa: F401
+                name = "picamera"
+            except ImportError:
+                name = "picamera2"
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown camera backend {name!r} (expected one of {', '.join(_BACKENDS)})")
+    if name == "fake":
+        return FakeCameraBackend(clock=clock, **kw)
+    return _BACKENDS[name](**kw)
@@ -1,5 +1,48 @@
 # Camera_Setup.py
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from Metrics import REGISTRY as METRICS
+from Event_Bus import BUS
+from Trace import TRACER
+from Sim_Clock import get_clock
+from Camera_Backends import open_backend
+from Sensor_Modes import SENSOR_MODES, SensorModePlanner
+
+# ---------- orientation as 3x3 affine maps on normalized (x, y, 1) ----------
+def _affine(a, b, c, d, e, f):
+    return np.array([[a, b, c], [d, e, f], [0.0, 0.0, 1.0]], dtype=np.float64)
+
+_IDENT = _affine(1, 0, 0, 0, 1, 0)
+_HFLIP = _affine(-1, 0, 1, 0, 1, 0)        # x -> 1-x
+_VFLIP = _affine(1, 0, 0, 0, -1, 1)        # y -> 1-y
+_ROT_A = _affine(0, 1, 0, -1, 0, 1)        # (x, y) -> (y, 1-x)
+_ROT_180 = _affine(-1, 0, 1, 0, -1, 1)     # (x, y) -> (1-x, 1-y)
+_ROT_B = _affine(0, -1, 1, 1, 0, 0)        # (x, y) -> (1-y, x)
+
+# index = rotation // 90
+_ROT_APPLY = (_IDENT, _ROT_A, _ROT_180, _ROT_B)   # display->sensor 'forward' rotation step
+_ROT_UNDO = (_IDENT, _ROT_B, _ROT_180, _ROT_A)    # the opposite-direction rotation step
+
+
+def _apply_affine(m, x, y):
+    """m = (a, b, c, d, e, f) top two matrix rows; returns clamped (x', y')."""
+    a, b, c, d, e, f = m
+    x, y = float(x), float(y)
+    xo = a * x + b * y + c
+    yo = d * x + e * y + f
+    xo = 0.0 if xo < 0.0 else (1.0 if xo > 1.0 else xo)
+    yo = 0.0 if yo < 0.0 else (1.0 if yo > 1.0 else yo)
+    return xo, yo
+
+
+def _apply_affine_np(M, pts):
+    """pts: array-like (..., 2) -> float64 array (..., 2), clamped to [0, 1]."""
+    p = np.asarray(pts, dtype=np.float64)
+    out = p @ M[:2, :2].T + M[:2, 2]
+    return np.clip(out, 0.0, 1.0, out=out)
 
 class CameraSetup:
     """
@@ -18,20 +61,36 @@ class CameraSetup:
     def __init__(self, resolution=(1280, 720), sensor_mode=5, iso=800, framerate=30,
                  exposure_mode='auto', awb_mode='auto',
                  rotation=180, hflip=False, vflip=False,
-                 mapping_mode='forward'):
-        from picamera import PiCamera
-        self.camera = PiCamera()
-        self.camera.resolution    = resolution
-        self.camera.sensor_mode   = sensor_mode
-        self.camera.iso           = iso
-        self.camera.framerate     = framerate
-        self.camera.exposure_mode = exposure_mode
-        self.camera.awb_mode      = awb_mode
-
-        # Orientation (affects display<->sensor mapping)
-        self.camera.rotation = int(rotation)  # 0, 90, 180, 270
-        self.camera.hflip    = bool(hflip)
-        self.camera.vflip    = bool(vflip)
+                 mapping_mode='forward', zoom_animation_frames=6, backend=None,
+                 auto_sensor_mode=True, sensor_model=None, proxy_resolution=None):
+        # picamera / picamera2 / fake (see Camera_Backends.open_backend)
+        self.camera = open_backend(backend)
+        self.camera.configure(resolution=resolution, sensor_mode=sensor_mode, iso=iso,
+                              framerate=framerate, exposure_mode=exposure_mode, awb_mode=awb_mode,
+                              rotation=int(rotation), hflip=bool(hflip), vflip=bool(vflip),
+                              proxy_resolution=proxy_resolution)
+        # size of the second (splitter port 2) stream the recorder may use for a proxy
+        self.proxy_resolution = tuple(proxy_resolution) if proxy_resolution else None
+
+        # Local copies of what we wrote: reading these back is an MMAL round-trip
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        self.framerate  = framerate
+        self.rotation   = int(rotation)
+        self.hflip      = bool(hflip)
+        self.vflip      = bool(vflip)
+        self._zoom      = (0.0, 0.0, 1.0, 1.0)   # newest ROI asked for (UI side owns it)
+        self._zoom_future = None
+        self._compile_orientation()
+
+        # Zoom-aware sensor mode: sensor_mode above is the BASE mode (defines sensor-normalized
+        # coords); the planner may move to a sharper mode while zoomed. Frozen while recording.
+        self.prerecord = None
+        self.sensor_mode = int(sensor_mode)
+        self._target_mode = self.sensor_mode
+        self.mode_planner = None
+        modes = SENSOR_MODES.get(sensor_model or self.camera.sensor_model) if auto_sensor_mode else None
+        if modes and any(m.index == self.sensor_mode for m in modes):
+            self.mode_planner = SensorModePlanner(modes, self.sensor_mode, self.resolution, framerate)
 
         # User preference; we still auto-pick per-zoom for robustness
         self._mapping_mode = mapping_mode if mapping_mode in ('forward', 'inverse') else 'forward'
@@ -39,27 +98,183 @@ class CameraSetup:
         # Optional override: display aspect (w/h). If None, derive from resolution.
         self._display_aspect = None
 
+        self._m_zoom = METRICS.histogram("camera_zoom_apply_seconds", "camera.zoom write latency")
+        self._m_zoom_count = METRICS.counter("camera_zoom_applied_total", "camera.zoom writes")
+        self._m_mode_switch = METRICS.histogram("camera_sensor_mode_switch_seconds", "sensor mode reconfiguration time")
+
+        # After boot every camera write goes through this thread (UI never waits on MMAL)
+        self.control = CameraControlWorker(self)
+        # Smooth zoom (0 frames -> jump straight to the target like center_zoom_step_at_sensor)
+        self.zoom_animator = ZoomAnimator(self, frames=zoom_animation_frames, fps=framerate)
+
     # ---------- Public API ----------
     def start_preview(self, fullscreen=True, **kw):
         self.camera.start_preview(fullscreen=fullscreen, **kw)
         time.sleep(0.2)
 
     def stop_preview(self):
+        self.zoom_animator.stop()
+        self.control.stop()
+        self.stop_prerecord()
         try:
             self.camera.stop_preview()
         finally:
             self.camera.close()
 
+    # ---------- pre-record ring ----------
+    def start_prerecord(self, ring):
+        """Keep the encoder running into `ring` (Record_Manager.PreRecordBuffer) from now on."""
+        self.prerecord = ring
+        self.camera.start_recording(ring, format="h264")
+
+    def stop_prerecord(self):
+        ring, self.prerecord = self.prerecord, None
+        if ring is not None and self.camera.recording:
+            self.camera.stop_recording()
+
+    def recording_to_file(self):
+        """True while a real recording is running (an idle pre-record ring doesn't count)."""
+        if self.prerecord is not None:
+            return self.prerecord.attached
+        return bool(self.camera.recording)
+
     def set_display_aspect(self, w, h):
         """Tell CameraSetup what aspect the preview fills (e.g., 1280x720)."""
         w = float(w); h = float(h)
         self._display_aspect = (w / h) if (w > 0 and h > 0) else None
 
     def set_orientation(self, *, rotation=None, hflip=None, vflip=None):
-        """Optional: change orientation at runtime."""
-        if rotation is not None: self.camera.rotation = int(rotation)
-        if hflip    is not None: self.camera.hflip    = bool(hflip)
-        if vflip    is not None: self.camera.vflip    = bool(vflip)
+        """
+        Optional: change orientation at runtime. The mapping switches immediately;
+        the camera write is queued on the control worker (returns its Future).
+        """
+        if rotation is not None: self.rotation = int(rotation)
+        if hflip    is not None: self.hflip    = bool(hflip)
+        if vflip    is not None: self.vflip    = bool(vflip)
+        self._compile_orientation()
+        return self.control.submit("orientation", dict(rotation=self.rotation, hflip=self.hflip, vflip=self.vflip))
+
+    def set_exposure(self, **settings):
+        """Queue iso / exposure_mode / awb_mode / shutter_speed / ... (latest value per key wins)."""
+        bad = set(settings) - CameraControlWorker.EXPOSURE_KEYS
+        if bad:
+            raise ValueError(f"Unsupported exposure setting(s): {', '.join(sorted(bad))}")
+        return self.control.submit("exposure", settings, merge=True)
+
+    def _compile_orientation(self):
+        """
+        Cache each display<->sensor mapping as a 3x3 affine matrix (+ its 6
+        coefficients for the scalar path) from the local rotation/hflip/vflip.
+        Called from __init__ and set_orientation only.
+        """
+        r  = (self.rotation // 90) % 4
+        hf = self.hflip
+        vf = self.vflip
+        F = _IDENT
+        if hf: F = _HFLIP @ F
+        if vf: F = _VFLIP @ F
+
+        self._orientation = (r * 90, hf, vf)
+        # flips first, then rotation
+        self._M_d2s_fwd = _ROT_APPLY[r] @ F
+        # undo rotation first, then flips (the other three helpers share this order)
+        self._M_d2s_inv = F @ _ROT_UNDO[r]
+        self._M_s2d_fwd = self._M_d2s_inv
+        self._M_s2d_inv = self._M_d2s_inv
+        self._aff_d2s_fwd = tuple(self._M_d2s_fwd[:2].ravel().tolist())
+        self._aff_d2s_inv = tuple(self._M_d2s_inv[:2].ravel().tolist())
+        self._aff_s2d_fwd = self._aff_d2s_inv
+        self._aff_s2d_inv = self._aff_d2s_inv
+
+    # ---------- batched mappings (NumPy, shape (..., 2)) ----------
+    def display_to_sensor_forward_np(self, pts):
+        return _apply_affine_np(self._M_d2s_fwd, pts)
+
+    def display_to_sensor_inverse_np(self, pts):
+        return _apply_affine_np(self._M_d2s_inv, pts)
+
+    def sensor_to_display_forward_np(self, pts):
+        return _apply_affine_np(self._M_s2d_fwd, pts)
+
+    def sensor_to_display_inverse_np(self, pts):
+        return _apply_affine_np(self._M_s2d_inv, pts)
+
+    @property
+    def zoom(self):
+        """Newest ROI handed to the camera (cached; no MMAL read)."""
+        return self._zoom
+
+    def set_zoom(self, roi, plan_mode=True):
+        """
+        Queue a camera.zoom write; only the newest pending ROI is applied. Returns a Future.
+        plan_mode=False skips the sensor mode planner (intermediate animation steps).
+        """
+        roi = tuple(float(v) for v in roi)
+        self._zoom = roi
+        if plan_mode:
+            self.plan_sensor_mode(roi)
+        fut = self._zoom_future = self.control.submit("roi", roi)
+        return fut
+
+    def wait_zoom(self, timeout=None):
+        """Block until the camera has the newest ROI handed to set_zoom(); returns that ROI."""
+        fut = self._zoom_future
+        return fut.result(timeout) if fut is not None else self._zoom
+
+    def plan_sensor_mode(self, roi, only_if_needed=False):
+        """Queue a sensor mode switch if the planner wants one for this ROI; returns the mode or None."""
+        p = self.mode_planner
+        if p is None or self.recording_to_file():
+            return None
+        m = p.plan(roi, self._target_mode, only_if_needed=only_if_needed)
+        if m is not None:
+            self._target_mode = m
+            self.control.submit("sensor_mode", m)
+        return m
+
+    def _switch_sensor_mode(self, index):
+        """Control worker only: reconfigure, remember what it cost, re-apply the ROI in the new FOV."""
+        cur = self.sensor_mode
+        if index == cur:
+            return
+        t0 = time.perf_counter()
+        ring = self.prerecord
+        if ring is not None and not ring.attached:
+            # the idle pre-record encoder has to stop for the pipeline restart
+            self.camera.stop_recording()
+            self.camera.set_sensor_mode(self.mode_planner.modes[index])
+            self.camera.start_recording(ring, format="h264")
+        else:
+            self.camera.set_sensor_mode(self.mode_planner.modes[index])
+        self.sensor_mode = index
+        dt = time.perf_counter() - t0
+        self.mode_planner.record_switch(cur, index, dt)
+        self._m_mode_switch.observe(dt)
+        print(f"[camera] sensor mode {cur} -> {index} ({dt * 1000:.0f} ms)", flush=True)
+        self._write_zoom(self._zoom)
+
+    def apply_zoom(self, roi):
+        """Write camera.zoom (x, y, w, h) synchronously (boot, 1x reset) and make it the current ROI."""
+        roi = tuple(float(v) for v in roi)
+        self._zoom = roi
+        self._write_zoom(roi)
+
+    def _write_zoom(self, roi):
+        """
+        camera.zoom write timed over the MMAL round-trip. The control worker
+        calls this with what it dequeued; it leaves self._zoom alone, since a
+        newer set_zoom() from the UI may already be waiting behind it.
+        """
+        t_trace = TRACER.begin()
+        t0 = time.perf_counter()
+        roi = tuple(roi)
+        p = self.mode_planner
+        # ROI is in base-mode coords; the camera wants it relative to the active mode's FOV
+        self.camera.zoom = p.to_mode_roi(roi, self.sensor_mode) if p is not None else roi
+        self._m_zoom.observe(time.perf_counter() - t0)
+        TRACER.end("camera.zoom", t_trace)
+        self._m_zoom_count.inc()
+        BUS.publish("zoom", roi=roi, source=self)
 
     def set_mapping_mode(self, mode: str):
         """'forward' or 'inverse' (kept for manual override / debugging)."""
@@ -89,7 +304,8 @@ class CameraSetup:
 
         # 1x -> full frame; do NOT recenter overlay (return same coords)
         if z <= 1.0001:
-            self.camera.zoom = (0.0, 0.0, 1.0, 1.0)
+            # through the worker too, so a zoom-in still queued there can't land after this
+            self.set_zoom((0.0, 0.0, 1.0, 1.0))
             return nx_in, ny_in
 
         # ---- Auto-select mapping: try both and choose the one that lands closest to (0.5, 0.5) ----
@@ -116,7 +332,7 @@ class CameraSetup:
         self._mapping_mode = mode  # remember what worked (nice for consistency)
 
         # Apply zoom
-        self.camera.zoom = roi
+        self.set_zoom(roi)
         return nx_after, ny_after
     
     def center_zoom_step_at_sensor(self, step: float, sensor_xy, max_step: float = 8.0):
@@ -125,6 +341,7 @@ class CameraSetup:
         Returns (nx_after, ny_after, roi) where nx/ny are display-normalized
         projection of the same world point after applying the ROI.
         """
+        t_trace = TRACER.begin()
         try: z = float(step)
         except: z = 1.0
         if z < 1.0: z = 1.0
@@ -136,16 +353,38 @@ class CameraSetup:
         sy = 0.0 if sy < 0.0 else (1.0 if sy > 1.0 else sy)
 
         if z <= 1.0001:
-            self.camera.zoom = (0.0, 0.0, 1.0, 1.0)
+            self.set_zoom((0.0, 0.0, 1.0, 1.0))
             # at 1x projection is just sensor->display
             nx, ny = self._sensor_to_display_inverse(sx, sy)
+            TRACER.end("camera.center_zoom_step_at_sensor", t_trace, {"zoom": z})
             return nx, ny, (0.0, 0.0, 1.0, 1.0)
 
         roi = self._roi_for_zoom(sx, sy, z)
-        self.camera.zoom = roi
+        self.set_zoom(roi)
         nx_after, ny_after = self._project_sensor_point_to_display_after_roi(sx, sy, roi)
+        TRACER.end("camera.center_zoom_step_at_sensor", t_trace, {"zoom": z})
         return nx_after, ny_after, roi
 
+    def animate_zoom_at_sensor(self, step: float, sensor_xy, max_step: float = 8.0):
+        """
+        Like center_zoom_step_at_sensor, but glide there: hands the target to the
+        ZoomAnimator, which applies a precomputed ROI trajectory one frame at a time.
+        Returns immediately; pressing again mid-flight retargets from where it is.
+        """
+        try: z = float(step)
+        except: z = 1.0
+        if z < 1.0: z = 1.0
+        if z > float(max_step): z = float(max_step)
+
+        sx, sy = float(sensor_xy[0]), float(sensor_xy[1])
+        sx = 0.0 if sx < 0.0 else (1.0 if sx > 1.0 else sx)
+        sy = 0.0 if sy < 0.0 else (1.0 if sy > 1.0 else sy)
+
+        if self.zoom_animator.frames <= 0:
+            self.center_zoom_step_at_sensor(z, (sx, sy), max_step)
+            return
+        self.zoom_animator.animate_to(z, (sx, sy))
+
     # ---------- Quantized, video-aspect ROI ----------
     def _roi_exact_center_video_aspect_quantized(self, center_x, center_y, zoom):
         """
@@ -159,7 +398,7 @@ class CameraSetup:
         cx = 0.0 if cx < 0.0 else (1.0 if cx > 1.0 else cx)
         cy = 0.0 if cy < 0.0 else (1.0 if cy > 1.0 else cy)
 
-        rw, rh = self.camera.resolution  # stream (e.g. 1280x720)
+        rw, rh = self.resolution  # stream (e.g. 1280x720), cached
         rw = int(rw); rh = int(rh)
         ar = (rw / float(rh)) if rh else (16.0/9.0)
 
@@ -237,52 +476,14 @@ class CameraSetup:
         DISPLAY-normalized -> SENSOR-normalized using the SAME order preview often applies:
         flips first, then rotation.
         """
-        x, y = float(nx), float(ny)
-        r  = (int(self.camera.rotation) // 90) % 4
-        hf = bool(self.camera.hflip)
-        vf = bool(self.camera.vflip)
-
-        # flips, then rotation
-        if hf: x = 1.0 - x
-        if vf: y = 1.0 - y
-
-        if r == 1:       # +90
-            x, y = y, 1.0 - x
-        elif r == 2:     # 180
-            x, y = 1.0 - x, 1.0 - y
-        elif r == 3:     # +270
-            x, y = 1.0 - y, x
-
-        # clamp
-        x = 0.0 if x < 0.0 else (1.0 if x > 1.0 else x)
-        y = 0.0 if y < 0.0 else (1.0 if y > 1.0 else y)
-        return x, y
+        return _apply_affine(self._aff_d2s_fwd, nx, ny)
 
     def _display_to_sensor_inverse(self, nx_disp, ny_disp):
         """
         DISPLAY-normalized -> SENSOR-normalized by UNDOing rotation first, then flips.
         Use this if your stack applies transforms in the opposite order.
         """
-        x, y = float(nx_disp), float(ny_disp)
-        r  = (int(self.camera.rotation) // 90) % 4
-        hf = bool(self.camera.hflip)
-        vf = bool(self.camera.vflip)
-
-        # undo rotation
-        if r == 1:       # undo +90 -> -90
-            x, y = 1.0 - y, x
-        elif r == 2:     # undo 180
-            x, y = 1.0 - x, 1.0 - y
-        elif r == 3:     # undo +270 -> -270 (+90)
-            x, y = y, 1.0 - x
-
-        # undo flips
-        if hf: x = 1.0 - x
-        if vf: y = 1.0 - y
-
-        x = 0.0 if x < 0.0 else (1.0 if x > 1.0 else x)
-        y = 0.0 if y < 0.0 else (1.0 if y > 1.0 else y)
-        return x, y
+        return _apply_affine(self._aff_d2s_inv, nx_disp, ny_disp)
 
     def _sensor_to_display_forward(self, u, v):
         """
@@ -291,27 +492,7 @@ class CameraSetup:
           - then apply flips
         Input u,v are pre-orientation preview-normalized (0..1).
         """
-        x, y = float(u), float(v)
-        r  = (int(self.camera.rotation) // 90) % 4
-        hf = bool(self.camera.hflip)
-        vf = bool(self.camera.vflip)
-
-        # apply rotation
-        if r == 1:
-            x, y = 1.0 - y, x
-        elif r == 2:
-            x, y = 1.0 - x, 1.0 - y
-        elif r == 3:
-            x, y = y, 1.0 - x
-
-        # then flips
-        if hf: x = 1.0 - x
-        if vf: y = 1.0 - y
-
-        # clamp
-        x = 0.0 if x < 0.0 else (1.0 if x > 1.0 else x)
-        y = 0.0 if y < 0.0 else (1.0 if y > 1.0 else y)
-        return x, y
+        return _apply_affine(self._aff_s2d_fwd, u, v)
 
     # ---------- Projection back to display ----------
     def _project_sensor_point_to_display_after_roi(self, sx, sy, roi):
@@ -338,24 +519,240 @@ class CameraSetup:
           - then undo flips
         Input u,v are pre-orientation preview-normalized.
         """
-        x, y = float(u), float(v)
-        r  = (int(self.camera.rotation) // 90) % 4
-        hf = bool(self.camera.hflip)
-        vf = bool(self.camera.vflip)
-
-        # undo rotation
-        if r == 1:
-            x, y = 1.0 - y, x
-        elif r == 2:
-            x, y = 1.0 - x, 1.0 - y
-        elif r == 3:
-            x, y = y, 1.0 - x
-
-        # undo flips
-        if hf: x = 1.0 - x
-        if vf: y = 1.0 - y
+        return _apply_affine(self._aff_s2d_inv, u, v)
 
-        # clamp
-        x = 0.0 if x < 0.0 else (1.0 if x > 1.0 else x)
-        y = 0.0 if y < 0.0 else (1.0 if y > 1.0 else y)
-        return x, y
+
+class ZoomAnimator:
+    """
+    Smooth zoom around a SENSOR anchor.
+
+    A trajectory is a short list of (z, cx, cy, roi) steps from the current zoom to
+    the target: zoom eased geometrically, center eased from the anchor toward frame
+    center when either end is 1x, every ROI from _roi_exact_center_video_aspect_quantized.
+    Trajectories between integer zoom levels are cached per anchor, so a repeated
+    1->2->...->8 session is only lookups. All math happens on the animator's own timer
+    thread (one ROI per frame, written through the control worker), never on the
+    state thread.
+    """
+    CACHE_SIZE = 64
+
+    def __init__(self, cam, frames=6, fps=30, clock=None):
+        self.cam = cam
+        self.frames = max(0, int(frames))
+        self.period = 1.0 / float(fps or 30)
+        self.clock = clock or get_clock()
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None          # (z, (sx, sy)) waiting to be picked up
+        self._traj = None
+        self._i = 0
+        self._z = 1.0                # last applied step
+        self._center = (0.5, 0.5)
+        self._cache = OrderedDict()
+
+    # ---------- state-thread side (cheap) ----------
+    def animate_to(self, z, anchor):
+        with self._lock:
+            self._target = (float(z), (float(anchor[0]), float(anchor[1])))
+            if self._thread is None:
+                self._thread = self.clock.start_thread(self._run, name="zoom-animator")
+        self._wake.set()
+
+    def cancel(self):
+        """Stop where we are (the last applied ROI stays)."""
+        with self._lock:
+            self._target = None
+            self._traj = None
+
+    def busy(self):
+        with self._lock:
+            return self._target is not None or self._traj is not None
+
+    @property
+    def zoom(self):
+        return self._z
+
+    def stop(self, timeout=1.0):
+        """Stop the timer thread; no ROI is written after this returns (unless the join times out)."""
+        with self._lock:
+            self._stop.set()
+            t = self._thread
+        self._wake.set()
+        if t is not None and t is not threading.current_thread():
+            t.join(timeout=timeout)
+
+    # ---------- trajectory ----------
+    def trajectory(self, z0, c0, z1, c1):
+        # keyed on the exact centers: the landing ROI must be the one center_zoom_step_at_sensor
+        # would give for this anchor, and the anchor only changes when the user moves the reticle
+        c0 = (float(c0[0]), float(c0[1]))
+        c1 = (float(c1[0]), float(c1[1]))
+        key = None
+        if abs(z0 - round(z0)) < 1e-6 and abs(z1 - round(z1)) < 1e-6:
+            key = (int(round(z0)), int(round(z1)), c0, c1, self.frames, self.cam.resolution)
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+
+        n = max(1, self.frames)
+        steps = []
+        for k in range(1, n + 1):
+            s = k / float(n)
+            e = s * s * (3.0 - 2.0 * s)                  # smoothstep ease in/out
+            z = z0 * (z1 / z0) ** e                      # geometric: constant perceived speed
+            cx = c0[0] + (c1[0] - c0[0]) * e
+            cy = c0[1] + (c1[1] - c0[1]) * e
+            if k == n:
+                z, cx, cy = z1, c1[0], c1[1]
+            if z <= 1.0001:
+                roi = (0.0, 0.0, 1.0, 1.0)
+            else:
+                roi = self.cam._roi_exact_center_video_aspect_quantized(cx, cy, z)
+            steps.append((z, cx, cy, roi))
+        steps = tuple(steps)
+
+        if key is not None:
+            self._cache[key] = steps
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return steps
+
+    # ---------- timer thread ----------
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                target, self._target = self._target, None
+                idle = target is None and self._traj is None
+            if idle:
+                self.clock.wait(self._wake, None)
+                self._wake.clear()
+                continue
+
+            if target is not None:
+                z1, anchor = target
+                # at 1x the view is centered on the frame; zoomed, on the anchor
+                c1 = anchor if z1 > 1.0001 else (0.5, 0.5)
+                c0 = self._center if self._z > 1.0001 else (0.5, 0.5)
+                if self._z <= 1.0001 and z1 > 1.0001:
+                    c0 = anchor                   # zooming in from 1x: grow around the anchor
+                traj = self.trajectory(self._z, c0, z1, c1)
+                # the active sensor mode has to see every step (zooming out of a cropped mode)
+                self.cam.plan_sensor_mode(max(traj, key=lambda st: st[3][2])[3], only_if_needed=True)
+                with self._lock:
+                    if self._target is None:      # not cancelled/retargeted meanwhile
+                        self._traj, self._i = traj, 0
+
+            with self._lock:
+                traj, i = self._traj, self._i
+                if traj is not None:
+                    self._i = i + 1
+                    if self._i >= len(traj):
+                        self._traj = None
+            if traj is not None:
+                z, cx, cy, roi = traj[i]
+                last = i == len(traj) - 1         # only the landing ROI may pick a sharper mode
+                if roi != self.cam.zoom:          # quantization often repeats a step; skip the write
+                    self.cam.set_zoom(roi, plan_mode=last)
+                elif last:
+                    self.cam.plan_sensor_mode(roi)
+                self._z, self._center = z, (cx, cy)
+                self.clock.wait(self._stop, self.period)
+
+
+class CameraControlWorker:
+    """
+    Owns the camera's MMAL round-trips after boot. Commands are keyed by kind
+    ('roi', 'sensor_mode', 'orientation', 'exposure'); a newer command of the same kind replaces
+    the pending one (exposure merges per key), so a burst of zoom presses costs
+    one camera.zoom write. Each submit() returns a Future that completes when the
+    camera reaches that state or a newer one (superseded futures share the result).
+    """
+    EXPOSURE_KEYS = frozenset(("iso", "exposure_mode", "awb_mode", "shutter_speed",
+                               "exposure_compensation", "brightness", "contrast",
+                               "saturation", "meter_mode"))
+
+    def __init__(self, cam, clock=None):
+        self.cam = cam
+        self.clock = clock or get_clock()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pending = OrderedDict()   # kind -> [payload, futures, t_submit]
+        self._thread = None
+        self._m_latency = METRICS.histogram("camera_control_latency_seconds", "submit -> applied on the camera")
+        self._m_coalesced = METRICS.counter("camera_control_coalesced_total", "commands replaced before they ran")
+        self._m_errors = METRICS.counter("camera_control_errors_total", "camera writes that raised")
+
+    def submit(self, kind, payload, merge=False):
+        fut = Future()
+        with self._lock:
+            if self._stop.is_set():
+                fut.set_exception(RuntimeError("camera control worker stopped"))
+                return fut
+            prev = self._pending.pop(kind, None)
+            if prev is None:
+                self._pending[kind] = [payload, [fut], time.perf_counter()]
+            else:
+                self._m_coalesced.inc()
+                if merge:
+                    payload = {**prev[0], **payload}
+                self._pending[kind] = [payload, prev[1] + [fut], prev[2]]
+            if self._thread is None:
+                self._thread = self.clock.start_thread(self._run, name="camera-control")
+        self._wake.set()
+        return fut
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stop(self, timeout=1.0):
+        """Apply whatever is still queued, then exit."""
+        with self._lock:
+            self._stop.set()
+            t = self._thread
+        self._wake.set()
+        if t is not None and t is not threading.current_thread():
+            t.join(timeout=timeout)
+
+    # ---------- worker ----------
+    def _apply(self, kind, payload):
+        cam = self.cam.camera
+        if kind == "roi":
+            self.cam._write_zoom(payload)
+        elif kind == "sensor_mode":
+            self.cam._switch_sensor_mode(payload)
+        elif kind == "orientation":
+            cam.set_orientation(**payload)
+        elif kind == "exposure":
+            cam.set_exposure(**payload)
+        else:
+            raise ValueError(f"Unknown camera command {kind!r}")
+
+    def _run(self):
+        while True:
+            with self._lock:
+                item = self._pending.popitem(last=False) if self._pending else None
+                done = item is None and self._stop.is_set()
+            if done:
+                return
+            if item is None:
+                self.clock.wait(self._wake, None)
+                self._wake.clear()
+                continue
+            kind, (payload, futures, t_submit) = item
+            try:
+                self._apply(kind, payload)
+            except Exception as e:
+                self._m_errors.inc()
+                print(f"[camera] {kind} failed: {e}", flush=True)
+                for f in futures:
+                    f.set_exception(e)
+                continue
+            self._m_latency.observe(time.perf_counter() - t_submit)
+            for f in futures:
+                f.set_result(payload)
@@ -0,0 +1,53 @@
+# Event_Bus.py
+"""
+In-process publish/subscribe for UI state changes, so listeners (the sidecar
+recorder) hear about a change when it happens instead of polling for it.
+
+Topics published by the app:
+  "reticle"  cx, cy, source   OverlayDisplay.set_center / center_on_screen / nudge_*
+  "zoom"     roi, source      CameraSetup.apply_zoom (the ROI the camera just got)
+  "text"     text, source     TextOverlay.set_text
+
+publish() calls the subscribers inline on the publisher's thread (UI, control
+worker, ...), so a subscriber must be cheap: note the change and signal. A
+subscriber that raises is reported and skipped, never the publisher's problem.
+With nobody subscribed a publish is one dict lookup.
+"""
+import threading
+
+from Metrics import REGISTRY as METRICS
+
+_M_EVENTS = METRICS.counter("bus_events_total", "events published on the UI event bus")
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs = {}             # topic -> tuple of callbacks (copy-on-write, read without the lock)
+
+    def subscribe(self, topic, fn):
+        with self._lock:
+            self._subs[topic] = self._subs.get(topic, ()) + (fn,)
+        return fn
+
+    def unsubscribe(self, topic, fn):
+        with self._lock:
+            subs = tuple(f for f in self._subs.get(topic, ()) if f != fn)
+            if subs:
+                self._subs[topic] = subs
+            else:
+                self._subs.pop(topic, None)
+
+    def publish(self, topic, **data):
+        subs = self._subs.get(topic)
+        if not subs:
+            return
+        _M_EVENTS.inc()
+        for fn in subs:
+            try:
+                fn(topic, data)
+            except Exception as e:
+                print(f"[bus] {topic} subscriber failed: {e}", flush=True)
+
+
+BUS = EventBus()
@@ -0,0 +1,362 @@
+# Export_Server.py
+"""
+Small HTTP server for pulling recordings off the device (instead of scp/pscp).
+
+  GET /               HTML list of Saved_Videos in transfer order (proxies first)
+  GET /index.json     same as JSON: name, size, duration_s, live
+  GET /<name>         the file, sent with os.sendfile (no copy through Python)
+
+Range requests ("bytes=a-b", "bytes=a-", "bytes=-n"; If-Range on the ETag) make
+downloads resumable. A file that is still being written ("live": a recording
+whose sidecar has no footer yet, or a remux's .mp4.part) is streamed as it
+grows when asked for without a Range: no Content-Length, the response ends when
+the writer is done or the file stops growing for follow_idle_s. A Range on a
+live file gets what exists right now (Content-Range .../*). A followed .mp4 has
+mehd = 0 (the muxer patches the duration at close); players don't need it.
+
+It runs as its own process under ionice idle + nice 19 (like the Post_Jobs
+worker), so it never competes with the encoder for CPU, the GIL or the card:
+
+    python Export_Server.py serve ~/Saved_Videos [port] [host]
+    curl -O -C - http://127.0.0.1:8080/VID_x.mp4
+
+There is no authentication, so it listens on 127.0.0.1 unless told otherwise
+(reach it with ssh -L 8080:127.0.0.1:8080). Serving the card to the whole
+network takes an explicit host, e.g. "0.0.0.0" / BORESIGHT_EXPORT_HOST.
+"""
+import os
+import sys
+import json
+import time
+import errno
+import html
+import ipaddress
+import shutil
+import socket
+import struct
+import threading
+import subprocess
+from urllib.parse import unquote, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from Fmp4_Muxer import TIMESCALE
+from Post_Jobs import JOB_DIR, sidecar_of, _has_footer, _moof_duration
+from Storage_Manager import STEM_SUFFIXES, transfer_order
+
+LOCAL_HOST = "127.0.0.1"
+
+_CONTENT_TYPES = {".mp4": "video/mp4", ".h264": "video/h264", ".jsonl": "application/x-ndjson",
+                  ".json": "application/json", ".sha256": "text/plain; charset=utf-8"}
+_CHUNK = 1 << 20                # per sendfile() call
+_SEND_TIMEOUT_S = 30            # a client that takes nothing for this long is gone
+
+
+def _mp4_duration(path):
+    """Seconds from mvhd/mehd, or the sum of the fragments of an open fMP4; None if unknown."""
+    with open(path, "rb") as f:
+        end = os.fstat(f.fileno()).st_size
+        pos, ticks, fragmented, moof = 0, 0, False, None
+        while pos + 8 <= end:
+            f.seek(pos)
+            size, typ = struct.unpack(">I4s", f.read(8))
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+            if size < 8 or pos + size > end:
+                break                                   # torn tail of a file being written
+            if typ == b"moov":
+                moov = f.read(min(size - 8, 1 << 20))
+                i = moov.find(b"mehd")
+                if i >= 0:
+                    fragmented = True
+                    v = moov[i + 4]
+                    ms = struct.unpack(">Q" if v else ">I", moov[i + 8:i + (16 if v else 12)])[0]
+                    if ms:
+                        return ms / 1000.0
+                i = moov.find(b"mvhd")
+                if i >= 0 and not fragmented:
+                    v = moov[i + 4]
+                    if v:
+                        scale, dur = struct.unpack(">IQ", moov[i + 24:i + 36])
+                    else:
+                        scale, dur = struct.unpack(">II", moov[i + 16:i + 24])
+                    return dur / scale if scale else None
+            elif typ == b"moof":
+                moof = f.read(size - 8)
+            elif typ == b"mdat" and moof is not None:
+                ticks += _moof_duration(moof)
+                moof = None
+            pos += size
+    return ticks / TIMESCALE if fragmented else None
+
+
+def _parse_range(value, size):
+    """(start, end) inclusive, None for 'ignore the header', or 'bad' for 416."""
+    if not value or not value.startswith("bytes=") or "," in value:
+        return None                                     # multi-range: whole file is allowed
+    first, _, last = value[6:].strip().partition("-")
+    try:
+        if first == "":
+            n = int(last)
+            if n <= 0:
+                return "bad"
+            return max(0, size - n), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "bad"
+    return start, min(end, size - 1)
+
+
+def _is_loopback(host):
+    """True for a loopback literal or "localhost"; never resolves names (no DNS before bind)."""
+    host = (host or "").strip().strip("[]")
+    if host.lower() in ("localhost", "localhost.localdomain", "ip6-localhost"):
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False                                    # "" (all interfaces) or some other name
+
+
+class ExportServer:
+    def __init__(self, base_dir, port=8080, host=LOCAL_HOST, follow_idle_s=10.0, poll_s=0.25):
+        self.base_dir = os.path.expanduser(base_dir)
+        self.follow_idle_s = float(follow_idle_s)
+        self.poll_s = float(poll_s)
+        self._durations = {}                            # name -> (size, mtime, seconds)
+        self._lock = threading.Lock()
+        if not _is_loopback(host):
+            print(f"[export] WARNING: serving {self.base_dir} without auth on {host or '*'}:{port}", flush=True)
+        self.httpd = ThreadingHTTPServer((host, int(port)), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.export = self
+        self.port = self.httpd.server_address[1]
+
+    def serve_forever(self):
+        print(f"[export] serving {self.base_dir} on port {self.port}", flush=True)
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Serve from a daemon thread (tests); the app runs start_export_server() instead."""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # ---------- listing ----------
+    def listing(self):
+        # one scandir per request: the recorder and the post jobs keep changing the directory
+        files = {}
+        for e in os.scandir(self.base_dir):
+            if e.is_file(follow_symlinks=False):
+                st = e.stat()
+                files[e.name] = (st.st_size, st.st_mtime)
+        out = []
+        for name, size in transfer_order(files):
+            out.append({"name": name, "size": size, "duration_s": self.duration(name),
+                        "live": self.is_live(name)})
+        return out
+
+    def duration(self, name):
+        if not name.endswith((".mp4", ".mp4.part")):
+            return None
+        path = os.path.join(self.base_dir, name)
+        try:
+            st = os.stat(path)
+            with self._lock:
+                hit = self._durations.get(name)
+            if hit and hit[:2] == (st.st_size, st.st_mtime):
+                return hit[2]
+            secs = _mp4_duration(path)
+        except (OSError, struct.error):
+            return None
+        secs = None if secs is None else round(secs, 3)
+        with self._lock:
+            self._durations[name] = (st.st_size, st.st_mtime, secs)
+        return secs
+
+    def is_live(self, name):
+        """Is somebody still writing this file?"""
+        if name.endswith(".part"):
+            return os.path.exists(os.path.join(self.base_dir, name))
+        for suffix in sorted(STEM_SUFFIXES, key=len, reverse=True):
+            if name.endswith(suffix):
+                sidecar = sidecar_of(os.path.join(self.base_dir, name[:-len(suffix)]))
+                return os.path.exists(sidecar) and not _has_footer(sidecar)
+        return False
+
+    def resolve(self, url_path):
+        """Path of a servable file for /<name>, else None (no subdirectories, no dotfiles)."""
+        name = unquote(url_path.split("?", 1)[0].lstrip("/"))
+        if not name or name != os.path.basename(name) or name.startswith("."):
+            return None
+        path = os.path.join(self.base_dir, name)
+        return path if os.path.isfile(path) else None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "BoresightExport/1"
+
+    def setup(self):
+        super().setup()
+        # fd stays blocking for sendfile(); a stalled send fails after the timeout instead of hanging
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO,
+                                   struct.pack("ll", _SEND_TIMEOUT_S, 0))
+
+    def log_message(self, fmt, *args):
+        print(f"[export] {self.address_string()} {fmt % args}", flush=True)
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        exp = self.server.export
+        path = self.path.split("?", 1)[0]
+        if path in ("/", "/index.html"):
+            return self._send_listing(exp.listing(), body)
+        if path == "/index.json":
+            return self._send_bytes(json.dumps(exp.listing(), indent=1).encode(), "application/json", body)
+        fpath = exp.resolve(path)
+        if fpath is None:
+            return self._send_bytes(b"not found\n", "text/plain", body, status=404)
+        try:
+            self._send_file(exp, fpath, body)
+        except (BrokenPipeError, ConnectionResetError, BlockingIOError, socket.timeout):
+            self.close_connection = True               # client went away or stopped reading
+
+    # ---------- responses ----------
+    def _send_bytes(self, data, ctype, body=True, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def _send_listing(self, items, body):
+        rows = []
+        for it in items:
+            dur = "" if it["duration_s"] is None else f"{int(it['duration_s']) // 60}:{it['duration_s'] % 60:04.1f}"
+            rows.append(f"<tr><td><a href=\"/{quote(it['name'])}\">{html.escape(it['name'])}</a></td>"
+                        f"<td align=right>{it['size'] / 1e6:.1f} MB</td><td align=right>{dur}</td>"
+                        f"<td>{'recording' if it['live'] else ''}</td></tr>")
+        page = ("<!doctype html><meta charset=utf-8><title>Saved_Videos</title>"
+                "<table><tr><th>file</th><th>size</th><th>duration</th><th></th></tr>"
+                + "".join(rows) + "</table>\n")
+        self._send_bytes(page.encode(), "text/html; charset=utf-8", body)
+
+    def _send_file(self, exp, fpath, body):
+        name = os.path.basename(fpath)
+        ctype = _CONTENT_TYPES.get(os.path.splitext(name[:-5] if name.endswith(".part") else name)[1],
+                                   "application/octet-stream")
+        with open(fpath, "rb") as f:
+            fd = f.fileno()
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            st = os.fstat(fd)
+            size = st.st_size
+            live = exp.is_live(name)
+            etag = f'"{size:x}-{st.st_mtime_ns:x}"'
+            rng = self.headers.get("Range")
+            if rng and self.headers.get("If-Range") not in (None, etag):
+                rng = None                              # changed since the client's first part
+            rng = _parse_range(rng, size)
+
+            if rng == "bad":
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if rng is None and live:
+                # follow the writer: length unknown, the end of the response is the end of the file
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                if body:
+                    self.wfile.flush()
+                    self._follow(exp, fd, name)
+                return
+            start, end = rng if rng is not None else (0, size - 1)
+            self.send_response(206 if rng is not None else 200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            if rng is not None:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{'*' if live else size}")
+            if not live:
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+            self.end_headers()
+            if body:
+                self.wfile.flush()
+                self._sendfile(fd, start, end + 1 - start)
+
+    def _sendfile(self, fd, offset, count):
+        """os.sendfile() from the page cache straight to the socket; returns bytes sent."""
+        sock = self.connection.fileno()
+        sent = 0
+        while sent < count:
+            try:
+                n = os.sendfile(sock, fd, offset + sent, min(_CHUNK, count - sent))
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            if n == 0:
+                # file got shorter (repair job): the length we promised can't be kept
+                self.close_connection = True
+                break
+            sent += n
+        return sent
+
+    def _follow(self, exp, fd, name):
+        pos, idle_since = 0, time.monotonic()
+        while True:
+            size = os.fstat(fd).st_size
+            if pos < size:
+                pos += self._sendfile(fd, pos, size - pos)
+                idle_since = time.monotonic()
+                continue
+            if not exp.is_live(name):
+                if os.fstat(fd).st_size == pos:
+                    return
+                continue                                # the writer's last bytes landed meanwhile
+            if time.monotonic() - idle_since > exp.follow_idle_s:
+                return                                  # writer died (crash orphan); don't hang
+            time.sleep(exp.poll_s)
+
+
+def start_export_server(base_dir, port=8080, host=LOCAL_HOST, log_dir=None):
+    """Run the server as its own idle-priority process; returns the Popen."""
+    cmd = [sys.executable, os.path.abspath(__file__), "serve", os.path.expanduser(base_dir),
+           str(int(port)), host]
+    if shutil.which("nice"):
+        cmd = ["nice", "-n", "19"] + cmd
+    if shutil.which("ionice"):
+        cmd = ["ionice", "-c", "3"] + cmd
+    log_dir = log_dir or os.path.join(os.path.expanduser(base_dir), JOB_DIR)
+    os.makedirs(log_dir, exist_ok=True)
+    log = open(os.path.join(log_dir, "export.log"), "ab")
+    try:
+        return subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    finally:
+        log.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4, 5) and sys.argv[1] == "serve":
+        ExportServer(sys.argv[2],
+                     port=int(sys.argv[3]) if len(sys.argv) > 3 else 8080,
+                     host=sys.argv[4] if len(sys.argv) > 4 else LOCAL_HOST).serve_forever()
+    else:
+        print("usage: Export_Server.py serve <Saved_Videos dir> [port] [host]")
@@ -0,0 +1,263 @@
+# Fmp4_Muxer.py
+"""
+Pure-Python fragmented MP4 writer for the camera's H.264 elementary stream.
+
+Fmp4Writer is a file-like sink: hand it to camera.start_recording(writer,
+format="h264") or PreRecordBuffer.attach(writer) and it turns the Annex-B NAL
+units into an .mp4 as they arrive:
+
+  ftyp + moov (avcC from the first SPS/PPS)      written once, at the first keyframe
+  moof + mdat                                    one fragment per GOP (>= min_fragment_s)
+  close()                                        last fragment + real duration in mvex/mehd
+                                                 (seek back and overwrite; Hash_Manifest.
+                                                 HashingWriter re-hashes that first chunk)
+
+Nothing is re-read, so stop() costs one fragment write instead of a remux.
+Timing comes from the encoder: stamp(pts_us) before a write says "these bytes
+are the frame the encoder timestamped pts_us" (camera.frame.timestamp), and
+every sample's trun duration is the gap to the next sample's PTS, with tfdt the
+running sum. Samples without a stamp (raw .h264 remux, headers-only writes)
+fall back to the nominal frame rate. SEI NALs stay in front of their slice.
+"""
+import struct
+import collections
+import threading
+
+TIMESCALE = 90000
+
+_MATRIX = struct.pack(">9I", 0x00010000, 0, 0, 0, 0x00010000, 0, 0, 0, 0x40000000)
+
+# trun sample flags (ISO/IEC 14496-12 8.8.3.1)
+_SYNC_FLAGS = 0x02000000       # depends on nothing
+_NONSYNC_FLAGS = 0x01010000    # depends on others, non-sync sample
+
+
+def _box(typ, *payload):
+    body = b"".join(payload)
+    return struct.pack(">I4s", 8 + len(body), typ) + body
+
+
+def _full(typ, version, flags, *payload):
+    return _box(typ, struct.pack(">I", (version << 24) | flags), *payload)
+
+
+def iter_nals(buf, start=0):
+    """Yield (offset, end) of every COMPLETE NAL payload in an Annex-B buffer (last one excluded)."""
+    i = buf.find(b"\x00\x00\x01", start)
+    while i >= 0:
+        j = buf.find(b"\x00\x00\x01", i + 3)
+        if j < 0:
+            return
+        end = j
+        while end > i + 3 and buf[end - 1] == 0:   # trailing zeros belong to the next start code
+            end -= 1
+        yield i + 3, end
+        i = j
+
+
+class Fmp4Writer:
+    def __init__(self, path, fps=30.0, resolution=(1280, 720), min_fragment_s=1.0,
+                 max_fragment_s=4.0, sink=None):
+        self.path = path
+        self.fps = float(fps or 30.0)
+        self.width, self.height = int(resolution[0]), int(resolution[1])
+        self.sample_duration = int(round(TIMESCALE / self.fps))
+        self._min_frag = max(1, int(round(min_fragment_s * self.fps)))
+        self._max_frag = max(self._min_frag, int(round(max_fragment_s * self.fps)))
+        self._f = sink if sink is not None else open(path, "wb")
+
+        self._lock = threading.Lock()
+        self._buf = bytearray()
+        self._sps = None
+        self._pps = None
+        self._prefix = []            # SEI etc. waiting for their slice
+        self._samples = []           # [(bytes, is_key, pts_ticks or None)] of the open fragment
+        self._marks = collections.deque()   # (stream offset, pts_ticks) from stamp()
+        self._pts = None             # pts_ticks of the slice being parsed
+        self._offset = 0             # stream offset of self._buf[0]
+        self._received = 0           # stream bytes handed to write()
+        self._last_dur = self.sample_duration
+        self._init_written = False
+        self._mehd_pos = None
+        self._seq = 0
+        self.frames = 0              # samples already in fragments
+        self.decode_ticks = 0        # TIMESCALE ticks already in fragments (next tfdt)
+        self.dropped = 0             # slices before the first SPS/PPS (undecodable)
+        self.bytes_written = 0
+        self.closed = False
+
+    # ---------- file-like ----------
+    def stamp(self, pts_us):
+        """The bytes of the next write() start a frame the encoder timestamped pts_us."""
+        if pts_us is None:
+            return
+        with self._lock:
+            self._marks.append((self._received, int(round(pts_us * TIMESCALE / 1e6))))
+
+    def write(self, b):
+        with self._lock:
+            buf = self._buf
+            buf += b
+            self._received += len(b)
+            last = 0
+            for s, e in iter_nals(buf):
+                self._pts_at(self._offset + s)
+                self._nal(bytes(buf[s:e]))
+                last = e                  # next start code (the pending NAL) begins at/after e
+            if last:
+                del buf[:last]
+                self._offset += last
+        return len(b)
+
+    def _pts_at(self, pos):
+        # the newest stamp at or before the NAL's offset is its frame's
+        marks = self._marks
+        while marks and marks[0][0] <= pos:
+            self._pts = marks.popleft()[1]
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            # the tail of the buffer is the last NAL (no start code after it)
+            buf = self._buf
+            i = buf.find(b"\x00\x00\x01")
+            if i >= 0 and len(buf) > i + 3:
+                self._pts_at(self._offset + i + 3)
+                self._nal(bytes(buf[i + 3:]).rstrip(b"\x00"))
+            self._buf = bytearray()
+            if self._samples:
+                self._fragment()
+            self._patch_duration()
+            self.closed = True
+        try:
+            self._f.flush()
+        except Exception:
+            pass
+        self._f.close()
+
+    @property
+    def duration_s(self):
+        return (self.decode_ticks + len(self._samples) * self._last_dur) / TIMESCALE
+
+    # ---------- NAL -> samples ----------
+    def _nal(self, nal):
+        if not nal:
+            return
+        t = nal[0] & 0x1F
+        if t == 7:
+            self._sps = nal
+        elif t == 8:
+            self._pps = nal
+        elif t in (1, 5):
+            sample = b"".join(struct.pack(">I", len(n)) + n for n in self._prefix + [nal])
+            self._prefix = []
+            self._sample(sample, t == 5, self._pts)
+            self._pts = None            # a second slice without its own stamp gets the nominal gap
+        elif t == 9:
+            pass                        # access unit delimiter: implied by the sample boundaries
+        else:
+            self._prefix.append(nal)    # SEI and friends ride with the next slice
+
+    def _sample(self, data, key, pts):
+        if not self._init_written:
+            if not (key and self._sps and self._pps):
+                self.dropped += 1
+                return
+            self._write_init()
+        n = len(self._samples)
+        if (key and n >= self._min_frag) or n >= self._max_frag:
+            self._fragment(pts)
+        self._samples.append((data, key, pts))
+
+    # ---------- boxes ----------
+    def _out(self, data):
+        self._f.write(data)
+        self.bytes_written += len(data)
+
+    def _avcc(self):
+        sps, pps = self._sps, self._pps
+        body = struct.pack(">BBBBBB", 1, sps[1], sps[2], sps[3], 0xFF, 0xE1)
+        body += struct.pack(">H", len(sps)) + sps
+        body += struct.pack(">BH", 1, len(pps)) + pps
+        if sps[1] in (100, 110, 122, 144):
+            body += bytes((0xFD, 0xF8, 0xF8, 0))   # 4:2:0, 8-bit, no SPS extensions
+        return _box(b"avcC", body)
+
+    def _write_init(self):
+        w, h = self.width, self.height
+        ftyp = _box(b"ftyp", b"iso5", struct.pack(">I", 512), b"iso5iso6avc1mp41")
+        mvhd = _full(b"mvhd", 0, 0, struct.pack(">IIII", 0, 0, 1000, 0),
+                     struct.pack(">IH", 0x00010000, 0x0100), b"\0" * 10, _MATRIX,
+                     b"\0" * 24, struct.pack(">I", 2))
+        tkhd = _full(b"tkhd", 0, 3, struct.pack(">IIIII", 0, 0, 1, 0, 0), b"\0" * 8,
+                     struct.pack(">HHHH", 0, 0, 0, 0), _MATRIX, struct.pack(">II", w << 16, h << 16))
+        mdhd = _full(b"mdhd", 0, 0, struct.pack(">IIIIHH", 0, 0, TIMESCALE, 0, 0x55C4, 0))
+        hdlr = _full(b"hdlr", 0, 0, struct.pack(">I", 0), b"vide", b"\0" * 12, b"VideoHandler\0")
+        vmhd = _full(b"vmhd", 0, 1, b"\0" * 8)
+        dinf = _box(b"dinf", _full(b"dref", 0, 0, struct.pack(">I", 1), _full(b"url ", 0, 1)))
+        avc1 = _box(b"avc1", b"\0" * 6, struct.pack(">H", 1), b"\0" * 16,
+                    struct.pack(">HHIII", w, h, 0x00480000, 0x00480000, 0),
+                    struct.pack(">H", 1), b"\0" * 32, struct.pack(">Hh", 0x18, -1), self._avcc())
+        stbl = _box(b"stbl",
+                    _full(b"stsd", 0, 0, struct.pack(">I", 1), avc1),
+                    _full(b"stts", 0, 0, struct.pack(">I", 0)),
+                    _full(b"stsc", 0, 0, struct.pack(">I", 0)),
+                    _full(b"stsz", 0, 0, struct.pack(">II", 0, 0)),
+                    _full(b"stco", 0, 0, struct.pack(">I", 0)))
+        trak = _box(b"trak", tkhd, _box(b"mdia", mdhd, hdlr, _box(b"minf", vmhd, dinf, stbl)))
+        mehd = _full(b"mehd", 1, 0, struct.pack(">Q", 0))
+        trex = _full(b"trex", 0, 0, struct.pack(">IIIII", 1, 1, 0, 0, 0))
+        moov = _box(b"moov", mvhd, trak, _box(b"mvex", mehd, trex))
+
+        # remember where mehd's duration lives so close() can fill it in
+        self._mehd_pos = len(ftyp) + moov.find(b"mehd") + 4     # version/flags
+        self._out(ftyp + moov)
+        self._init_written = True
+
+    def _durations(self, samples, next_pts):
+        """Per-sample ticks: gap to the next sample's PTS, else the last real gap."""
+        out = []
+        for i, (_, _, pts) in enumerate(samples):
+            nxt = samples[i + 1][2] if i + 1 < len(samples) else next_pts
+            if pts is not None and nxt is not None and nxt > pts:
+                self._last_dur = nxt - pts
+            out.append(self._last_dur)
+        return out
+
+    def _fragment(self, next_pts=None):
+        samples, self._samples = self._samples, []
+        n = len(samples)
+        self._seq += 1
+        durs = self._durations(samples, next_pts)
+
+        trun_len = 8 + 4 + 4 + 4 + n * 12
+        tfhd = _full(b"tfhd", 0, 0x020000, struct.pack(">I", 1))          # default-base-is-moof
+        tfdt = _full(b"tfdt", 1, 0, struct.pack(">Q", self.decode_ticks))
+        traf_len = 8 + len(tfhd) + len(tfdt) + trun_len
+        moof_len = 8 + 16 + traf_len
+        entries = b"".join(struct.pack(">III", dur, len(d), _SYNC_FLAGS if k else _NONSYNC_FLAGS)
+                           for dur, (d, k, _) in zip(durs, samples))
+        trun = _full(b"trun", 0, 0x000701, struct.pack(">Ii", n, moof_len + 8), entries)
+        moof = _box(b"moof", _full(b"mfhd", 0, 0, struct.pack(">I", self._seq)),
+                    _box(b"traf", tfhd, tfdt, trun))
+        payload = [d for d, _, _ in samples]
+        mdat_len = 8 + sum(len(d) for d in payload)
+        self._out(moof + struct.pack(">I4s", mdat_len, b"mdat") + b"".join(payload))
+        self.frames += n
+        self.decode_ticks += sum(durs)
+
+    def _patch_duration(self):
+        if self._mehd_pos is None:
+            return
+        try:
+            pos = self._f.tell()
+            self._f.seek(self._mehd_pos + 4)            # skip version/flags
+            # mehd counts in the movie timescale (mvhd: 1000), not the track's
+            self._f.write(struct.pack(">Q", self.decode_ticks * 1000 // TIMESCALE))
+            self._f.seek(pos)
+        except (AttributeError, OSError, ValueError):
+            pass                                         # non-seekable sink: duration stays 0
@@ -0,0 +1,98 @@
+# H264_Sei.py
+"""
+Per-frame reticle metadata carried inside the H.264 stream itself, as SEI
+user_data_unregistered messages (payloadType 5), one in front of every slice:
+
+  NAL 0x06 | payloadType 5 | payloadSize | UUID (16) | payload | rbsp trailing bits
+
+payload (big-endian): version u8, frame u32, utc f8 (unix s), cx i4, cy i4,
+zoom ROI zx zy zw zh f4, state text (u8 length + utf-8).
+
+"frame" is the frame's index in the file it was written to, so the metadata
+can't drift from the picture and survives copying the .mp4 on its own. Decoders
+ignore unknown user data. The muxer keeps SEI NALs in front of their slice, so
+the messages end up in the .mp4 samples as well as in a raw .h264.
+
+scan() reads them back without decoding anything: the UUID contains no zero
+bytes, so it's never touched by emulation prevention and a plain find() over
+the mmapped file lands on every message, whatever the container.
+
+    python H264_Sei.py dump VID_x.mp4
+"""
+import sys
+import mmap
+import struct
+
+import numpy as np
+
+UUID = bytes.fromhex("a6aa028760ca4f1f90dc0e642fde5445")
+VERSION = 1
+_FIXED = struct.Struct(">BIdii4f")
+NONE_I32 = -(1 << 31)
+_MAX_STATE = 64
+
+
+def _escape(rbsp):
+    """Emulation prevention: no 00 00 0x (x <= 3) inside a NAL."""
+    out = bytearray()
+    zeros = 0
+    for b in rbsp:
+        if zeros >= 2 and b <= 3:
+            out.append(3)
+            zeros = 0
+        out.append(b)
+        zeros = zeros + 1 if b == 0 else 0
+    return bytes(out)
+
+
+def _unescape(b):
+    return b.replace(b"\x00\x00\x03", b"\x00\x00")
+
+
+def sei_nal(frame, utc, cx, cy, zoom, state_text):
+    """Annex-B SEI NAL (with 4-byte start code) for one frame."""
+    zx, zy, zw, zh = zoom or (0.0, 0.0, 0.0, 0.0)
+    state = (state_text or "").encode("utf-8")[:_MAX_STATE]
+    payload = UUID + _FIXED.pack(VERSION, frame, utc,
+                                 NONE_I32 if cx is None else cx, NONE_I32 if cy is None else cy,
+                                 zx, zy, zw, zh) + bytes([len(state)]) + state
+    # payloadSize < 255 always (16 + 37 + 1 + 64), so one byte
+    return b"\x00\x00\x00\x01" + _escape(bytes([0x06, 5, len(payload)]) + payload + b"\x80")
+
+
+def scan(path):
+    """
+    All messages in a .mp4 or .h264, as NumPy columns in stream order:
+    {frame, utc, cx, cy, zx, zy, zw, zh, state (id)} plus "strings" (id -> text).
+    """
+    rows, strings = [], {}
+    need = len(UUID) + _FIXED.size + 1 + _MAX_STATE
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        i = mm.find(UUID)
+        while i >= 0:
+            if i >= 3 and mm[i - 3] == 0x06 and mm[i - 2] == 5:
+                # escaped bytes can only make the window longer, never shorter
+                body = _unescape(mm[i + len(UUID):i + len(UUID) + 2 * need])
+                if len(body) > _FIXED.size and body[0] == VERSION:
+                    v = _FIXED.unpack_from(body)
+                    n = body[_FIXED.size]
+                    text = body[_FIXED.size + 1:_FIXED.size + 1 + n].decode("utf-8", "replace")
+                    rows.append(v[1:] + (strings.setdefault(text, len(strings)),))
+            i = mm.find(UUID, i + len(UUID))
+    dtype = [("frame", "<i4"), ("utc", "<f8"), ("cx", "<i4"), ("cy", "<i4"),
+             ("zx", "<f4"), ("zy", "<f4"), ("zw", "<f4"), ("zh", "<f4"), ("state", "<i4")]
+    arr = np.array(rows, dtype=dtype)
+    cols = {name: arr[name] for name in arr.dtype.names}
+    cols["strings"] = list(strings)
+    return cols
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "dump":
+        c = scan(sys.argv[2])
+        for k in range(len(c["frame"])):
+            print(int(c["frame"][k]), f"{c['utc'][k]:.3f}", int(c["cx"][k]), int(c["cy"][k]),
+                  [round(float(c[z][k]), 4) for z in ("zx", "zy", "zw", "zh")],
+                  c["strings"][c["state"][k]])
+    else:
+        print("usage: H264_Sei.py dump <file.mp4|file.h264>")
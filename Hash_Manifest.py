@@ -0,0 +1,305 @@
+# Hash_Manifest.py
+"""
+SHA-256 of recordings computed while they are written, and the signed
+per-stem manifest (<stem>.manifest.json) the results end up in.
+
+  StreamHash      one sha256 per chunk_bytes chunk plus a running sha256 of the
+                  whole file, fed with the bytes in file order
+  HashingWriter   file-like wrapper that feeds a StreamHash on the way to the
+                  real sink (StagedWriter, plain file, ...). Besides appending
+                  it can seek() back into the first chunk and overwrite bytes
+                  there (Fmp4Writer filling in mehd at close): chunk 0 is kept
+                  in RAM and re-hashed, nothing is read back
+
+A file's digest is "root", the sha256 of its chunk digests (raw 32 bytes each,
+in order), so a patched first chunk or a sidecar footer appended by the
+Post_Jobs worker (StreamHash.resume) costs one chunk, not the file. "sha256",
+the plain sha256sum of the file, comes from the running hash while that still
+describes the bytes (nothing patched, nothing resumed in another process);
+otherwise the idle-priority Post_Jobs hash job reads the file once, checks it
+against the root and fills it in.
+
+Manifest (one per stem, rewritten atomically, re-signed on every change):
+  {"type": "manifest", "version": 2, "stem", "created_utc", "updated_utc",
+   "hash": "sha256", "chunk_bytes",
+   "files": {name: {"size", "root", "chunks": [sha256 of every chunk], ["sha256"]}},
+   "signature": {"alg": "hmac-sha256", "key_id", "value"}}
+
+The signature is an HMAC over the canonical JSON of everything but
+"signature", keyed with the device key: BORESIGHT_SIGN_KEY, default
+~/.boresight/manifest.key (32 random bytes, created on first use). The chunk
+list tells a verifier which MB of a damaged file differs.
+
+    python Hash_Manifest.py verify VID_x.manifest.json [--files]
+"""
+import os
+import sys
+import hmac
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from Metrics import REGISTRY as METRICS
+
+_M_HASHED = METRICS.counter("hash_inline_bytes_total", "bytes hashed on the way to the card")
+
+VERSION = 2
+CHUNK_BYTES = 1 << 20
+SUFFIX = ".manifest.json"
+_KEY = None
+
+
+def _ts_now_utc():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def root_of(chunks):
+    """sha256 over the raw chunk digests: the file's digest in the manifest."""
+    return hashlib.sha256(b"".join(bytes.fromhex(c) for c in chunks)).hexdigest()
+
+
+class StreamHash:
+    def __init__(self, chunk_bytes=CHUNK_BYTES):
+        self.chunk_bytes = int(chunk_bytes)
+        self._lock = threading.Lock()
+        self._h = hashlib.sha256()
+        self._chunk = hashlib.sha256()
+        self._fill = 0
+        self._head = None            # chunk 0's bytes once keep_head() asked for them
+        self.exact = True            # _h is still the sha256 of the bytes on disk
+        self.chunks = []
+        self.size = 0
+
+    @classmethod
+    def resume(cls, entry, path, chunk_bytes=CHUNK_BYTES):
+        """
+        Carry on hashing a file from its manifest entry (another process
+        appends to it): only the open last chunk is read back, and it has to
+        match the entry. The whole-file sha256 can't be carried over.
+        """
+        size, chunks = entry["size"], list(entry["chunks"])
+        full = size // chunk_bytes
+        with open(path, "rb") as f:
+            grown = os.fstat(f.fileno()).st_size != size
+            f.seek(full * chunk_bytes)
+            tail = f.read(size - full * chunk_bytes)
+        if (grown or len(chunks) != full + (1 if tail else 0) or len(tail) != size - full * chunk_bytes or
+                (tail and hashlib.sha256(tail).hexdigest() != chunks[-1])):
+            raise ValueError(f"{os.path.basename(path)} changed since it was hashed")
+        h = cls(chunk_bytes)
+        h.chunks, h.size, h.exact = chunks[:full], size, False
+        h._chunk.update(tail)
+        h._fill = len(tail)
+        return h
+
+    def keep_head(self):
+        """Keep chunk 0 in RAM so patch() can rewrite it (call before the first update)."""
+        if self.size:
+            raise ValueError("keep_head() after data was hashed")
+        self._head = bytearray()
+
+    def patch(self, offset, data):
+        """Bytes at offset (inside chunk 0) were overwritten: re-hash chunk 0 from RAM."""
+        with self._lock:
+            head = self._head
+            if head is None or offset < 0 or offset + len(data) > len(head):
+                raise ValueError("can only patch inside the kept first chunk")
+            if head[offset:offset + len(data)] == data:
+                return
+            head[offset:offset + len(data)] = data
+            if self.chunks:
+                self.chunks[0] = hashlib.sha256(head).hexdigest()
+            else:
+                self._chunk = hashlib.sha256(head)      # chunk 0 still open: head is all of it
+            self.exact = False
+
+    def update(self, b):
+        mv = memoryview(b).cast("B")
+        with self._lock:
+            # hashlib drops the GIL for big buffers (fragments), so this doesn't hold up other threads
+            if self.exact:
+                self._h.update(mv)
+            head = self._head
+            if head is not None and len(head) < self.chunk_bytes:
+                head += mv[:self.chunk_bytes - len(head)]
+            self.size += len(mv)
+            while len(mv):
+                take = min(len(mv), self.chunk_bytes - self._fill)
+                self._chunk.update(mv[:take])
+                self._fill += take
+                mv = mv[take:]
+                if self._fill == self.chunk_bytes:
+                    self.chunks.append(self._chunk.hexdigest())
+                    self._chunk = hashlib.sha256()
+                    self._fill = 0
+        _M_HASHED.inc(len(b))
+
+    def result(self):
+        """{"size", "root", "chunks"} of everything so far, plus "sha256" while it's exact."""
+        with self._lock:
+            chunks = self.chunks + ([self._chunk.hexdigest()] if self._fill else [])
+            out = {"size": self.size, "root": root_of(chunks), "chunks": chunks}
+            if self.exact:
+                out["sha256"] = self._h.hexdigest()
+            return out
+
+
+class HashingWriter:
+    def __init__(self, f, hasher):
+        self._f = f
+        self.hasher = hasher
+        hasher.keep_head()
+        self._pos = None             # offset of a patch in progress; None = appending
+        self.path = getattr(f, "path", getattr(f, "name", None))
+
+    def write(self, b):
+        data = b.encode("utf-8") if isinstance(b, str) else b
+        if self._pos is None:
+            n = self._f.write(b)
+            self.hasher.update(data)
+            return n
+        if self._pos + len(data) > min(self.hasher.size, self.hasher.chunk_bytes):
+            raise ValueError("patch runs past the first chunk")
+        n = self._f.write(b)
+        self.hasher.patch(self._pos, data)
+        self._pos += len(data)
+        return n
+
+    def tell(self):
+        return self.hasher.size if self._pos is None else self._pos
+
+    def seek(self, pos, whence=0):
+        """Back into the first chunk (header patches) or to the end; nothing else."""
+        end = self.hasher.size
+        if whence == 2:
+            pos += end
+        elif whence != 0 or pos < 0 or pos > end:
+            raise ValueError(f"HashingWriter can't seek to {pos} (whence {whence})")
+        self._f.seek(pos)
+        self._pos = None if pos == end else pos
+        return pos
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def hash_file(path, chunk_bytes=CHUNK_BYTES):
+    """Same result as a StreamHash that saw the whole file (reads it once)."""
+    h = StreamHash(chunk_bytes)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            h.update(chunk)
+    return h.result()
+
+
+# ---------- signing ----------
+def load_key(path=None):
+    global _KEY
+    if path is None and _KEY is not None:
+        return _KEY
+    path = os.path.expanduser(path or os.environ.get("BORESIGHT_SIGN_KEY", "~/.boresight/manifest.key"))
+    try:
+        with open(path, "rb") as f:
+            key = f.read()
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        key = os.urandom(32)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return load_key(path)                       # another process just made it
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        print(f"[hash] new manifest signing key {path}", flush=True)
+    if not key:
+        raise ValueError(f"empty signing key {path}")
+    _KEY = key
+    return key
+
+
+def _canonical(doc):
+    return json.dumps({k: v for k, v in doc.items() if k != "signature"},
+                      sort_keys=True, separators=(",", ":")).encode()
+
+
+def sign(doc, key):
+    return {"alg": "hmac-sha256", "key_id": hashlib.sha256(key).hexdigest()[:16],
+            "value": hmac.new(key, _canonical(doc), hashlib.sha256).hexdigest()}
+
+
+def verify_signature(doc, key):
+    sig = doc.get("signature") or {}
+    return sig.get("alg") == "hmac-sha256" and hmac.compare_digest(sig.get("value", ""),
+                                                                   sign(doc, key)["value"])
+
+
+# ---------- manifest ----------
+def manifest_path(base):
+    """<base>.manifest.json for a stem path (no extension)."""
+    return base + SUFFIX
+
+
+def read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def update_manifest(path, files=None, remove=(), key=None):
+    """Merge {name: result} into the manifest (created if missing), drop `remove`, re-sign."""
+    now = _ts_now_utc()
+    doc = read_manifest(path) or {"created_utc": now}
+    doc.update(type="manifest", version=VERSION, stem=os.path.basename(path)[:-len(SUFFIX)],
+               updated_utc=now, hash="sha256", chunk_bytes=CHUNK_BYTES)
+    entries = doc.setdefault("files", {})
+    entries.update(files or {})
+    for name in remove:
+        entries.pop(name, None)
+    doc.pop("signature", None)
+    doc["signature"] = sign(doc, key or load_key())
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(doc, f, indent=1)
+    os.replace(tmp, path)
+    return doc
+
+
+def verify_files(path):
+    """[(name, problem)] for files that no longer match the manifest; reads every file."""
+    doc = read_manifest(path) or {}
+    base_dir = os.path.dirname(path)
+    bad = []
+    for name, want in sorted(doc.get("files", {}).items()):
+        try:
+            got = hash_file(os.path.join(base_dir, name), doc.get("chunk_bytes", CHUNK_BYTES))
+        except OSError as e:
+            bad.append((name, str(e)))
+            continue
+        if (got["size"] != want["size"] or got["root"] != want.get("root", got["root"]) or
+                got["sha256"] != want.get("sha256", got["sha256"])):
+            diff = [i for i, (a, b) in enumerate(zip(got["chunks"], want["chunks"])) if a != b]
+            bad.append((name, f"size {got['size']} (manifest {want['size']}), differing chunks {diff[:20]}"))
+    return bad
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4) and sys.argv[1] == "verify":
+        doc = read_manifest(sys.argv[2])
+        if doc is None:
+            sys.exit(f"can't read {sys.argv[2]}")
+        ok = verify_signature(doc, load_key())
+        print("signature", "ok" if ok else "BAD", doc.get("signature", {}).get("key_id"))
+        if len(sys.argv) == 4 and sys.argv[3] == "--files":
+            problems = verify_files(sys.argv[2])
+            for name in sorted(doc.get("files", {})):
+                print(name, next((p for n, p in problems if n == name), "ok"))
+            ok = ok and not problems
+        sys.exit(0 if ok else 1)
+    else:
+        print("usage: Hash_Manifest.py verify <stem.manifest.json> [--files]")
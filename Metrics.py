@@ -0,0 +1,262 @@
+# Metrics.py
+"""
+Tiny in-process metrics: counters, gauges and fixed-bucket latency histograms.
+
+Observations never allocate containers: a histogram is a preallocated array of
+bucket counts plus a running sum, so it is cheap enough for the refresh/update
+paths. Updates are lock-free (a lost increment under contention is fine for telemetry).
+
+Exposed by MetricsExporter as:
+  - a JSON snapshot rewritten every `interval` seconds
+  - Prometheus text on a local Unix socket (plain connect or HTTP GET both work)
+"""
+import os
+import json
+import time
+import array
+import socket
+import threading
+from bisect import bisect_left
+
+# seconds; covers a 0.5 ms update up to a multi-second remux
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+                           0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help="", labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def snapshot(self):
+        return {"value": self.value}
+
+    def prom_lines(self):
+        yield f"{self.name}{_label_str(self.labels)} {self.value}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help="", labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0.0
+
+    def set(self, v):
+        self.value = v
+
+    def inc(self, n=1):
+        self.value += n
+
+    def dec(self, n=1):
+        self.value -= n
+
+    def snapshot(self):
+        return {"value": self.value}
+
+    def prom_lines(self):
+        yield f"{self.name}{_label_str(self.labels)} {self.value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help="", labels=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.bounds = tuple(sorted(float(b) for b in buckets))
+        self.counts = array.array("Q", [0] * (len(self.bounds) + 1))  # last = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, v):
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.count += 1
+        self.sum += v
+        if v > self.max:
+            self.max = v
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        n = self.count
+        if n == 0:
+            return 0.0
+        rank = q * n
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p90": self.quantile(0.90),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.bounds] + ["+Inf"], self.counts.tolist())),
+        }
+
+    def prom_lines(self):
+        acc = 0
+        base = list(self.labels)
+        for b, c in zip(self.bounds + (float("inf"),), self.counts):
+            acc += c
+            le = "+Inf" if b == float("inf") else repr(b)
+            yield f"{self.name}_bucket{_label_str(base + [('le', le)])} {acc}"
+        yield f"{self.name}_sum{_label_str(self.labels)} {self.sum}"
+        yield f"{self.name}_count{_label_str(self.labels)} {self.count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}   # (name, labels) -> metric
+
+    def _get(self, cls, name, help, labels, **kw):
+        key = (name, tuple(sorted((labels or {}).items())))
+        m = self._metrics.get(key)
+        if m is None:
+            with self._lock:
+                m = self._metrics.get(key)
+                if m is None:
+                    m = cls(name, help, labels=key[1], **kw)
+                    self._metrics[key] = m
+        return m
+
+    # Call these once at setup and keep the object; don't look up per observation.
+    def counter(self, name, help="", labels=None):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help="", labels=None):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help="", labels=None, buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def snapshot(self):
+        out = {}
+        for (name, labels), m in list(self._metrics.items()):
+            out[name + _label_str(labels)] = {"type": m.kind, **m.snapshot()}
+        return out
+
+    def prometheus_text(self):
+        lines = []
+        seen = set()
+        for (name, _), m in sorted(self._metrics.items(), key=lambda kv: kv[0]):
+            if name not in seen:
+                seen.add(name)
+                if m.help:
+                    lines.append(f"# HELP {name} {m.help}")
+                lines.append(f"# TYPE {name} {m.kind}")
+            lines.extend(m.prom_lines())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MetricsExporter:
+    """Periodic JSON snapshot + Prometheus text on a Unix socket."""
+
+    def __init__(self, registry=REGISTRY, json_path="/tmp/boresight_metrics.json",
+                 socket_path="/tmp/boresight_metrics.sock", interval=5.0):
+        self.registry = registry
+        self.json_path = json_path
+        self.socket_path = socket_path
+        self.interval = float(interval)
+        self._stop = threading.Event()
+        self._threads = []
+        self._sock = None
+        self._t0 = time.monotonic()
+
+    def start(self):
+        if self.json_path:
+            self._spawn(self._json_loop)
+        if self.socket_path:
+            try:
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)
+                s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                s.bind(self.socket_path)
+                s.listen(4)
+                s.settimeout(1.0)
+                self._sock = s
+                self._spawn(self._serve_loop)
+            except OSError as e:
+                print("[metrics] socket disabled:", e, flush=True)
+        return self
+
+    def _spawn(self, target):
+        t = threading.Thread(target=target, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def write_json(self):
+        snap = {"uptime_s": round(time.monotonic() - self._t0, 3),
+                "time_unix": time.time(),
+                "metrics": self.registry.snapshot()}
+        tmp = self.json_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snap, f)
+        os.replace(tmp, self.json_path)  # readers never see a half-written file
+
+    def _json_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write_json()
+            except Exception as e:
+                print("[metrics] json write failed:", e, flush=True)
+
+    def _serve_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                conn.settimeout(0.2)
+                try:
+                    req = conn.recv(1024)
+                except socket.timeout:
+                    req = b""
+                body = self.registry.prometheus_text().encode("utf-8")
+                if req.startswith(b"GET"):
+                    conn.sendall(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                                 + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii"))
+                conn.sendall(body)
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    def stop(self):
+        self._stop.set()
+        if self._sock:
+            try:
+                self._sock.close()
+                os.remove(self.socket_path)
+            except OSError:
+                pass
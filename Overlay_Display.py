@@ -1,11 +1,34 @@
 import os
 import json
+import time
 import threading
 
 import numpy as np
 import cv2 as cv
 from PIL import Image, ImageDraw, ImageFont
-from dispmanx import DispmanX
+
+from Sim_Backends import sim_enabled
+if sim_enabled():
+    from Sim_Backends import FakeDispmanX as DispmanX
+else:
+    from dispmanx import DispmanX
+from Metrics import REGISTRY as METRICS
+from Event_Bus import BUS
+from Trace import TRACER
+from Sim_Clock import get_clock
+
+
+def _update_hist(layer):
+    return METRICS.histogram("disp_update_seconds", "DispmanX update() latency per layer",
+                             labels={"layer": layer})
+
+
+def _timed_update(disp, hist):
+    t_trace = TRACER.begin()
+    t0 = time.perf_counter()
+    disp.update()
+    hist.observe(time.perf_counter() - t0)
+    TRACER.end("disp.update", t_trace, hist.labels)
 
 
 # =========================
@@ -26,6 +49,8 @@ class OverlayDisplay:
 
         # Create DispmanX display object (your wrapper)
         self.disp = DispmanX(pixel_format="RGBA", buffer_type="numpy", layer=2000)
+        self._m_update = _update_hist(2000)
+        self._m_refresh = METRICS.histogram("overlay_refresh_seconds", "OverlayDisplay.refresh() latency")
         self.disp_width, self.disp_height = self.disp.size
 
         # draw params (visual)
@@ -186,18 +211,23 @@ class OverlayDisplay:
         W, H = self.desired_res
         self.center_x_px = W // 2
         self.center_y_px = H // 2
+        self._publish_center()
         if refresh:
             self.refresh()
 
     def set_center(self, cx_px, cy_px, refresh=True):
         self.center_x_px = int(np.clip(cx_px, self.radius, self.desired_res[0] - 1 - self.radius))
         self.center_y_px = int(np.clip(cy_px, self.radius, self.desired_res[1] - 1 - self.radius))
+        self._publish_center()
         if refresh:
             self.refresh()
 
     def get_center(self):
         return self.center_x_px, self.center_y_px
 
+    def _publish_center(self):
+        BUS.publish("reticle", cx=self.center_x_px, cy=self.center_y_px, source=self)
+
     # -------------- drawing --------------
     def _draw_reticle(self, img_array, cx, cy):
         """
@@ -360,21 +390,27 @@ class OverlayDisplay:
 
     def refresh(self):
         """Redraw reticle and push the centered bitmap to the display."""
+        t_trace = TRACER.begin()
+        t0 = time.perf_counter()
         self.update_overlay_image(self.center_y_px, self.center_x_px)
         y0, y1 = self.offset_y, self.offset_y + self.desired_res[1]
         x0, x1 = self.offset_x, self.offset_x + self.desired_res[0]
         self.disp.buffer[y0:y1, x0:x1, :] = self.overlay_image
-        self.disp.update()
+        _timed_update(self.disp, self._m_update)
+        self._m_refresh.observe(time.perf_counter() - t0)
+        TRACER.end("overlay.refresh", t_trace)
 
     # helpers to move the reticle center
     def nudge_vertical(self, dx):   # move center left/right
         W = self.desired_res[0]
         self.center_x_px = int(np.clip(self.center_x_px + dx, self.radius, W - 1 - self.radius))
+        self._publish_center()
         self.refresh()
 
     def nudge_horizontal(self, dy): # move center up/down
         H = self.desired_res[1]
         self.center_y_px = int(np.clip(self.center_y_px + dy, self.radius, H - 1 - self.radius))
+        self._publish_center()
         self.refresh()
 
     def reticle_norm_on_display(self):
@@ -397,6 +433,7 @@ class OverlayDisplay:
 class StaticPNGOverlay:
     def __init__(self, png_path, layer=1999, pos=('left', 'top'), scale=None, offset=20):
         self.disp = DispmanX(pixel_format="RGBA", buffer_type="numpy", layer=layer)
+        self._m_update = _update_hist(layer)
         self.disp_w, self.disp_h = self.disp.size
         self.offset = offset
         self.pos = pos
@@ -441,11 +478,11 @@ class StaticPNGOverlay:
         if y0 < 0: sy0 = -y0; y0 = 0
         if x1 > x0 and y1 > y0:
             self.disp.buffer[y0:y1, x0:x1, :] = self.img[sy0:sy0+(y1-y0), sx0:sx0+(x1-x0), :]
-        self.disp.update()  # one-time push
+        _timed_update(self.disp, self._m_update)  # one-time push
 
     def hide(self):
         self.disp.buffer[:] = 0
-        self.disp.update()
+        _timed_update(self.disp, self._m_update)
 
 
 # ===================
@@ -459,8 +496,12 @@ class TextOverlay:
                  rec_indicator=True,
                  rec_color=(255, 0, 0, 255),
                  rec_blink=True,
-                 rec_blink_interval=0.5):  # seconds
+                 rec_blink_interval=0.5,  # seconds
+                 clock=None):
+        self.clock = clock or get_clock()
         self.disp = DispmanX(pixel_format="RGBA", buffer_type="numpy", layer=layer)
+        self._m_update = _update_hist(layer)
+        self._m_render = METRICS.histogram("text_render_seconds", "TextOverlay._render() latency")
         self.disp_w, self.disp_h = self.disp.size
         self.font = ImageFont.truetype(font_path, font_size)
         self.color = color
@@ -507,6 +548,7 @@ class TextOverlay:
         return font.getsize(txt)
 
     def _render(self, text, dot_on):
+        t0 = time.perf_counter()
         img = Image.new('RGBA', (self.disp_w, self.disp_h), (0, 0, 0, 0))
         draw = ImageDraw.Draw(img)
         w, h = self._measure(draw, text, self.font)
@@ -559,14 +601,14 @@ class TextOverlay:
         draw.text((text_x, text_y), text, font=self.font, fill=self.color)
 
         self.disp.buffer[:] = np.array(img, dtype=np.uint8)
-        self.disp.update()
+        _timed_update(self.disp, self._m_update)
+        self._m_render.observe(time.perf_counter() - t0)
 
     def _start_blink(self):
         if self._blink_thread and self._blink_thread.is_alive():
             return
         self._blink_stop.clear()
-        self._blink_thread = threading.Thread(target=self._blink_loop, daemon=True)
-        self._blink_thread.start()
+        self._blink_thread = self.clock.start_thread(self._blink_loop)
 
     def _stop_blink(self):
         if self._blink_thread and self._blink_thread.is_alive():
@@ -584,10 +626,11 @@ class TextOverlay:
                 self._blink_phase = not self._blink_phase
                 self._render(text, dot_on=self._blink_phase)
             # sleep last to render immediately after state change
-            self._blink_stop.wait(self.rec_blink_interval)
+            self.clock.wait(self._blink_stop, self.rec_blink_interval)
 
     def set_text(self, text):
         with self._lock:
+            changed = text != self._current_text
             self._current_text = text
             is_rec = text.strip().upper().startswith("REC") and self.rec_indicator
 
@@ -600,6 +643,8 @@ class TextOverlay:
                 # draw static (no dot or solid dot if blinking disabled)
                 self._stop_blink()
                 self._render(text, dot_on=is_rec and not self.rec_blink)
+        if changed:
+            BUS.publish("text", text=text, source=self)
 
     def close(self):
         self._stop_blink()
@@ -618,6 +663,7 @@ class ContainerOverlay:
         layer: z-order; must be ABOVE preview, BELOW text/reticle
         """
         self.disp = DispmanX(pixel_format="RGBA", buffer_type="numpy", layer=layer)
+        self._m_update = _update_hist(layer)
         self.disp_w, self.disp_h = self.disp.size
         self.alpha = int(max(0, min(255, alpha)))
         self.inner_size = inner_size
@@ -654,11 +700,11 @@ class ContainerOverlay:
         x0, y0, x1, y1 = self._calc_inner_rect()
         if x1 > x0 and y1 > y0:
             buf[y0:y1, x0:x1, 3] = 0  # alpha=0 -> fully transparent
-        self.disp.update()
+        _timed_update(self.disp, self._m_update)
 
     def hide(self):
         self.disp.buffer[:] = 0
-        self.disp.update()
+        _timed_update(self.disp, self._m_update)
 
     def set_inner_size(self, inner_size):
         self.inner_size = inner_size
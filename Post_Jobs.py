@@ -0,0 +1,535 @@
+# Post_Jobs.py
+"""
+Persistent post-recording work (remux, fMP4 repair, footer finalization, hashing)
+done by a low-priority worker process, so the state machine goes back to LIVE
+the moment a recording stops.
+
+State lives in an append-only journal, <Saved_Videos>/.jobs/journal.jsonl:
+  {"op": "add", "id": ..., "kind": "remux", "args": {...}}
+  {"op": "progress", "id": ..., "pct": 42}
+  {"op": "done", "id": ..., "ok": true, "error": null}
+A job is pending until its "done" line exists, so a crash or power cut just
+means the worker picks it up again on the next boot.
+
+The worker (`python Post_Jobs.py worker <dir>`) runs under ionice idle + nice 19,
+works FIFO and exits when nothing is left; JobQueue.ensure_worker() restarts it.
+While it runs it holds an flock on .jobs/worker.lock (a worker outlives the
+app, it's in its own session), and the UI side leaves the journal and the
+.mp4.part files alone while that lock is taken.
+scan_orphans() re-enqueues what a crash left behind: .h264 without .mp4,
+sidecars without a footer, half-written fMP4 tails.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import fcntl
+import struct
+import hashlib
+import itertools
+import threading
+import subprocess
+from collections import OrderedDict
+from datetime import datetime
+
+JOB_DIR = ".jobs"
+WORKER_LOCK = "worker.lock"
+KINDS = ("remux", "repair_mp4", "finalize", "hash")
+_ids = itertools.count(1)
+
+
+def _ts_now_utc():
+    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _append(path, ev, durable=True):
+    line = (json.dumps(ev) + "\n").encode()
+    # one O_APPEND write per event: UI process and worker can both append safely
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+        if durable:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _apply(jobs, ev):
+    op, jid = ev.get("op"), ev.get("id")
+    if op == "add":
+        jobs[jid] = {"id": jid, "kind": ev["kind"], "args": ev.get("args", {}),
+                     "state": "pending", "pct": 0}
+    elif jid in jobs:
+        if op == "progress":
+            jobs[jid]["pct"] = ev.get("pct", 0)
+            jobs[jid]["state"] = "running"
+        elif op == "done":
+            jobs[jid]["state"] = "done" if ev.get("ok") else "failed"
+            jobs[jid]["pct"] = 100
+            jobs[jid]["error"] = ev.get("error")
+
+
+def read_journal(path, offset=0, jobs=None):
+    """Replay journal lines from `offset`; returns (jobs, new_offset). A torn last line is left for later."""
+    jobs = OrderedDict() if jobs is None else jobs
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return jobs, offset
+    end = data.rfind(b"\n") + 1
+    for line in data[:end].splitlines():
+        try:
+            _apply(jobs, json.loads(line))
+        except ValueError:
+            continue
+    return jobs, offset + end
+
+
+def _lock_worker(job_dir, block=True):
+    """flock on worker.lock; returns the open fd (the lock lives as long as it) or None if taken."""
+    fd = os.open(os.path.join(job_dir, WORKER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB))
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _unlock_worker(fd):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def worker_alive(job_dir):
+    """True while some worker process (ours or a previous app run's) holds the lock."""
+    fd = _lock_worker(job_dir, block=False)
+    if fd is None:
+        return True
+    _unlock_worker(fd)
+    return False
+
+
+SIDECAR_EXTS = (".jsonl", ".bsc")
+
+
+def sidecar_of(base):
+    """<base>.jsonl or <base>.bsc, whichever the recorder wrote."""
+    for ext in SIDECAR_EXTS:
+        if os.path.exists(base + ext):
+            return base + ext
+    return base + SIDECAR_EXTS[0]
+
+
+def _has_footer(jsonl_path):
+    if jsonl_path.endswith(".bsc"):
+        import Sidecar_Binary
+        return Sidecar_Binary.has_footer(jsonl_path)
+    try:
+        with open(jsonl_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 4096))
+            return b'"type": "footer"' in f.read()
+    except OSError:
+        return False
+
+
+class JobQueue:
+    def __init__(self, base_dir):
+        self.base_dir = os.path.expanduser(base_dir)
+        self.dir = os.path.join(self.base_dir, JOB_DIR)
+        os.makedirs(self.dir, exist_ok=True)
+        self.journal = os.path.join(self.dir, "journal.jsonl")
+        self._lock = threading.Lock()
+        self._proc = None
+        self.on_done = []                 # callbacks(job) for jobs that finished since the last refresh()
+        self._compact()
+        self._jobs, self._offset = read_journal(self.journal)
+        self._reported = {j["id"] for j in self._jobs.values() if j["state"] in ("done", "failed")}
+
+    def _compact(self):
+        """Drop finished jobs from the journal (boot only). Skipped while a worker is alive:
+        its done/progress lines would land in the file we're about to replace."""
+        fd = _lock_worker(self.dir, block=False)
+        if fd is None:
+            print("[jobs] worker still running; journal not compacted", flush=True)
+            return
+        try:
+            jobs, _ = read_journal(self.journal)
+            keep = [j for j in jobs.values() if j["state"] in ("pending", "running")]
+            if len(keep) == len(jobs):
+                return
+            tmp = self.journal + ".tmp"
+            with open(tmp, "w") as f:
+                for j in keep:
+                    f.write(json.dumps({"op": "add", "id": j["id"], "kind": j["kind"], "args": j["args"]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.journal)
+        finally:
+            _unlock_worker(fd)     # a worker started meanwhile was waiting on it
+
+    # ---------- UI side ----------
+    def add(self, kind, **args):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        jid = f"{time.time_ns():x}-{os.getpid()}-{next(_ids)}"
+        with self._lock:
+            _append(self.journal, {"op": "add", "id": jid, "kind": kind, "args": args})
+        self.ensure_worker()
+        return jid
+
+    def refresh(self):
+        with self._lock:
+            self._jobs, self._offset = read_journal(self.journal, self._offset, self._jobs)
+            finished = [j for j in self._jobs.values()
+                        if j["state"] in ("done", "failed") and j["id"] not in self._reported]
+            self._reported.update(j["id"] for j in finished)
+        for j in finished:
+            for cb in self.on_done:
+                try:
+                    cb(j)
+                except Exception as e:
+                    print(f"[jobs] on_done callback failed: {e}", flush=True)
+        return self._jobs
+
+    def pending(self):
+        return [j for j in self.refresh().values() if j["state"] in ("pending", "running")]
+
+    def progress(self):
+        """(jobs left, pct of the one running) for the HUD; (0, 100) when idle."""
+        left = self.pending()
+        if not left:
+            return 0, 100
+        return len(left), int(left[0].get("pct", 0))
+
+    def ensure_worker(self):
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                return
+            self._proc = None
+        if not self.pending():
+            return
+        cmd = [sys.executable, os.path.abspath(__file__), "worker", self.base_dir]
+        if shutil.which("nice"):
+            cmd = ["nice", "-n", "19"] + cmd
+        if shutil.which("ionice"):
+            cmd = ["ionice", "-c", "3"] + cmd
+        log = open(os.path.join(self.dir, "worker.log"), "ab")
+        try:
+            with self._lock:
+                # own session: keeps going if the app exits mid-job
+                self._proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT,
+                                              stdin=subprocess.DEVNULL, start_new_session=True,
+                                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        finally:
+            log.close()
+
+    def wait_idle(self, timeout=None):
+        t_end = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if t_end is not None and time.monotonic() > t_end:
+                return False
+            self.ensure_worker()
+            time.sleep(0.1)
+        return True
+
+    # ---------- recordings ----------
+    def enqueue_recording(self, stem, h264=None, fps=30.0, resolution=None, remove_h264=True):
+        """Everything a stopped (or crashed) recording still needs, in order."""
+        base = os.path.join(self.base_dir, stem)
+        mp4 = base + ".mp4"
+        if h264:
+            self.add("remux", h264=h264, mp4=mp4, fps=fps, resolution=resolution, remove_h264=remove_h264)
+        self.add("finalize", sidecar=sidecar_of(base), mp4=mp4, h264=h264)
+        self.add("hash", stem=stem)
+
+    def scan_orphans(self):
+        """Boot-time sweep of Saved_Videos; returns the stems that were re-enqueued."""
+        busy = set()
+        for j in self.pending():
+            a = j["args"]
+            for k in ("h264", "mp4", "sidecar", "jsonl"):
+                if a.get(k):
+                    busy.add(os.path.splitext(os.path.basename(a[k]))[0])
+            if a.get("stem"):
+                busy.add(a["stem"])
+
+        # a live worker may be remuxing into a .part right now
+        keep_parts = worker_alive(self.dir)
+        stems = {}
+        for name in os.listdir(self.base_dir):
+            stem, ext = os.path.splitext(name)
+            if name.endswith(".mp4.part"):
+                if not keep_parts:
+                    os.remove(os.path.join(self.base_dir, name))     # half a remux; it restarts
+                continue
+            if ext in (".h264", ".mp4") + SIDECAR_EXTS:
+                stems.setdefault(stem, set()).add(ext)
+
+        found = []
+        for stem, exts in sorted(stems.items()):
+            if stem in busy:
+                continue
+            base = os.path.join(self.base_dir, stem)
+            sidecar = sidecar_of(base)
+            if ".h264" in exts and ".mp4" not in exts:
+                self.enqueue_recording(stem, h264=base + ".h264", resolution=_sidecar_resolution(sidecar))
+            elif exts & set(SIDECAR_EXTS) and not _has_footer(sidecar):
+                if ".mp4" in exts:
+                    self.add("repair_mp4", mp4=base + ".mp4")
+                self.enqueue_recording(stem)
+            else:
+                continue
+            found.append(stem)
+        if found:
+            print(f"[jobs] recovering {len(found)} recording(s): {', '.join(found)}", flush=True)
+        return found
+
+
+def job_stem(job):
+    """Recording stem a job works on."""
+    a = job["args"]
+    if a.get("stem"):
+        return a["stem"]
+    for k in ("mp4", "sidecar", "jsonl", "h264"):
+        if a.get(k):
+            return os.path.splitext(os.path.basename(a[k]))[0]
+    return None
+
+
+def _sidecar_resolution(jsonl_path):
+    try:
+        if jsonl_path.endswith(".bsc"):
+            import Sidecar_Binary
+            hdr = Sidecar_Binary.read_header(jsonl_path)
+        else:
+            with open(jsonl_path, "r") as f:
+                hdr = json.loads(f.readline())
+        return hdr.get("video", {}).get("resolution")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# ===================
+# worker side
+# ===================
+class _Progress:
+    def __init__(self, journal, jid):
+        self.journal, self.jid, self.last = journal, jid, -1
+
+    def __call__(self, frac):
+        pct = int(max(0.0, min(1.0, frac)) * 100)
+        if pct >= self.last + 5:
+            self.last = pct
+            _append(self.journal, {"op": "progress", "id": self.jid, "pct": pct}, durable=False)
+
+
+def job_remux(h264, mp4, fps=30.0, resolution=None, remove_h264=True, progress=None):
+    """.h264 -> .mp4 with our muxer; the output is hashed as it's written into <stem>.manifest.json."""
+    from Fmp4_Muxer import Fmp4Writer
+    import Hash_Manifest
+    if not os.path.exists(h264):
+        if os.path.exists(mp4):
+            return                      # done before a crash, only the journal line was missing
+        raise FileNotFoundError(h264)
+    part = mp4 + ".part"
+    total = max(1, os.path.getsize(h264))
+    hasher = Hash_Manifest.StreamHash()
+    w = Fmp4Writer(part, fps=fps, resolution=resolution or (1280, 720),
+                   sink=Hash_Manifest.HashingWriter(open(part, "wb"), hasher))
+    done = 0
+    with open(h264, "rb") as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            w.write(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done / total)
+    w.close()
+    if w.frames == 0:
+        os.remove(part)
+        raise ValueError(f"{os.path.basename(h264)}: no decodable frames")
+    os.replace(part, mp4)
+    if remove_h264:
+        os.remove(h264)
+    Hash_Manifest.update_manifest(Hash_Manifest.manifest_path(os.path.splitext(mp4)[0]),
+                                  {os.path.basename(mp4): hasher.result()},
+                                  remove=[os.path.basename(h264)] if remove_h264 else ())
+
+
+def job_repair_mp4(mp4, progress=None):
+    """Cut a crashed fMP4 back to its last complete fragment and fill in the duration."""
+    from Fmp4_Muxer import TIMESCALE
+    with open(mp4, "r+b") as f:
+        data = f.read()
+        pos, good, ticks, mehd = 0, 0, 0, None
+        pending_moof = None
+        while pos + 8 <= len(data):
+            size, typ = struct.unpack(">I4s", data[pos:pos + 8])
+            if size < 8 or pos + size > len(data):
+                break
+            if typ == b"moov":
+                i = data.find(b"mehd", pos, pos + size)
+                mehd = i + 8 if i >= 0 else None
+                good = pos + size
+            elif typ == b"moof":
+                pending_moof = data[pos:pos + size]
+            elif typ == b"mdat" and pending_moof is not None:
+                ticks += _moof_duration(pending_moof)
+                pending_moof = None
+                good = pos + size
+            elif typ == b"ftyp":
+                good = pos + size
+            pos += size
+        f.truncate(good)
+        if mehd is not None:
+            f.seek(mehd)
+            f.write(struct.pack(">Q", int(round(ticks * 1000 / TIMESCALE))))
+    if progress:
+        progress(1.0)
+
+
+def _moof_duration(moof):
+    i = moof.find(b"trun")
+    if i < 0:
+        return 0
+    flags = struct.unpack(">I", moof[i + 4:i + 8])[0] & 0xFFFFFF
+    n = struct.unpack(">I", moof[i + 8:i + 12])[0]
+    p = i + 12 + (4 if flags & 0x1 else 0) + (4 if flags & 0x4 else 0)
+    if not flags & 0x100:
+        return 0
+    per = 4 * sum(1 for bit in (0x100, 0x200, 0x400, 0x800) if flags & bit)
+    return sum(struct.unpack(">I", moof[p + k * per:p + k * per + 4])[0] for k in range(n))
+
+
+def job_finalize(mp4, sidecar=None, h264=None, progress=None, jsonl=None):
+    sidecar = sidecar or jsonl          # journals from before .bsc sidecars say "jsonl"
+    if not os.path.exists(sidecar) or _has_footer(sidecar):
+        return
+    final = mp4 if os.path.exists(mp4) else (h264 if h264 and os.path.exists(h264) else None)
+    import Hash_Manifest
+    from Record_Manager import append_footer
+    # the recorder's manifest has the sidecar up to here: carry that hash on through the footer
+    manifest = Hash_Manifest.manifest_path(os.path.splitext(sidecar)[0])
+    name = os.path.basename(sidecar)
+    entry = ((Hash_Manifest.read_manifest(manifest) or {}).get("files") or {}).get(name)
+    hasher = None
+    if entry:
+        try:
+            hasher = Hash_Manifest.StreamHash.resume(entry, sidecar)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[jobs] {e}; {name} left to the hash job", flush=True)
+    append_footer(sidecar, {
+        "stopped_utc": _ts_now_utc(),
+        "final_video_file": os.path.basename(final) if final else None,
+        "intended_video_file": os.path.basename(mp4),
+        "remux_ok": final == mp4,
+        "muxer": "remux" if h264 else "fmp4",
+        "finalized_by": "post_jobs",
+    }, hasher=hasher)
+    if hasher is not None:
+        Hash_Manifest.update_manifest(manifest, {name: hasher.result()})
+    elif entry:
+        Hash_Manifest.update_manifest(manifest, remove=[name])
+    if progress:
+        progress(1.0)
+
+
+def job_hash(stem, progress=None, base_dir=None):
+    """
+    sha256sum-compatible <stem>.sha256 next to the recording, every file in it.
+    An exact sha256 from <stem>.manifest.json is copied; a file the manifest
+    only has a root for (fMP4 with the duration patched in, sidecar finished
+    by the worker) is read once here at idle priority, checked against that
+    root and its sha256 added to the manifest.
+    """
+    import Hash_Manifest
+    files = [stem + ext for ext in (".mp4", ".h264", "_proxy.mp4") + SIDECAR_EXTS
+             if os.path.exists(os.path.join(base_dir, stem + ext))]
+    manifest = Hash_Manifest.manifest_path(os.path.join(base_dir, stem))
+    known = (Hash_Manifest.read_manifest(manifest) or {}).get("files", {})
+    total = max(1, sum(os.path.getsize(os.path.join(base_dir, n)) for n in files))
+    done = 0
+    lines, filled = [], {}
+    for name in files:
+        path = os.path.join(base_dir, name)
+        entry = known.get(name)
+        if entry and entry.get("sha256") and entry.get("size") == os.path.getsize(path):
+            done += entry["size"]
+            lines.append(f"{entry['sha256']}  {name}\n")
+            continue
+        h = Hash_Manifest.StreamHash()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(h.chunk_bytes), b""):
+                h.update(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done / total)
+        r = h.result()
+        lines.append(f"{r['sha256']}  {name}\n")
+        if entry and entry.get("root"):
+            if (r["size"], r["root"]) == (entry.get("size"), entry["root"]):
+                filled[name] = dict(entry, sha256=r["sha256"])
+            else:
+                # the signed entry stays as recorded: that mismatch is the evidence
+                print(f"[jobs] {name} differs from its manifest entry; manifest left as is", flush=True)
+    if filled:
+        Hash_Manifest.update_manifest(manifest, filled)
+    tmp = os.path.join(base_dir, stem + ".sha256.tmp")
+    with open(tmp, "w") as f:
+        f.writelines(lines)
+    os.replace(tmp, os.path.join(base_dir, stem + ".sha256"))
+
+
+def run_worker(base_dir):
+    job_dir = os.path.join(base_dir, JOB_DIR)
+    journal = os.path.join(job_dir, "journal.jsonl")
+    # one worker at a time; a second one waits here until the first has drained the journal
+    lock = _lock_worker(job_dir)
+    try:
+        _work(base_dir, journal)
+    finally:
+        _unlock_worker(lock)
+
+
+def _work(base_dir, journal):
+    jobs, offset = read_journal(journal)
+    while True:
+        jobs, offset = read_journal(journal, offset, jobs)
+        todo = [j for j in jobs.values() if j["state"] in ("pending", "running")]
+        if not todo:
+            return
+        job = todo[0]
+        prog = _Progress(journal, job["id"])
+        t0 = time.monotonic()
+        try:
+            args = dict(job["args"])
+            if job["kind"] == "remux":
+                job_remux(progress=prog, **args)
+            elif job["kind"] == "repair_mp4":
+                job_repair_mp4(progress=prog, **args)
+            elif job["kind"] == "finalize":
+                job_finalize(progress=prog, **args)
+            elif job["kind"] == "hash":
+                job_hash(progress=prog, base_dir=base_dir, **args)
+            else:
+                raise ValueError(f"Unknown job kind {job['kind']!r}")
+            err = None
+        except Exception as e:
+            err = f"{type(e).__name__}: {e}"
+        _append(journal, {"op": "done", "id": job["id"], "ok": err is None, "error": err})
+        print(f"[jobs] {job['kind']} {job['id']} {'ok' if err is None else err} "
+              f"({time.monotonic() - t0:.2f} s)", flush=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "worker":
+        run_worker(os.path.expanduser(sys.argv[2]))
+    else:
+        print("usage: Post_Jobs.py worker <Saved_Videos dir>")
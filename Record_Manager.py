@@ -1,9 +1,62 @@
-import os, json, time, threading, shutil, subprocess
+import os, json, time, threading, shutil, subprocess, collections
 from datetime import datetime
+from Metrics import REGISTRY as METRICS
+from Sim_Clock import get_clock
+from Fmp4_Muxer import Fmp4Writer
+from Event_Bus import BUS
+import Sidecar_Binary
+import H264_Sei
+import Hash_Manifest
+from Hash_Manifest import StreamHash, HashingWriter
+
+_M_START = METRICS.histogram("recording_start_seconds", "RecordingManager.start() latency")
+_M_STOP = METRICS.histogram("recording_stop_seconds", "RecordingManager.stop() latency (incl. remux)")
+_M_REMUX = METRICS.histogram("remux_seconds", "h264 -> mp4 remux latency")
+_M_REMUX_FAIL = METRICS.counter("remux_failures_total", "remux attempts that did not produce an mp4")
+_M_MUX_CLOSE = METRICS.histogram("fmp4_close_seconds", "live fMP4 muxer close (last fragment) latency")
+_M_PREROLL = METRICS.gauge("prerecord_buffer_bytes", "bytes held in the pre-record ring")
+_M_STAGE = METRICS.gauge("stage_buffer_bytes", "recording bytes staged in RAM, not yet on disk")
+_M_STAGE_HW = METRICS.gauge("stage_buffer_high_water_bytes", "most bytes staged at once (current file)")
+_M_STAGE_WRITE = METRICS.histogram("stage_write_seconds", "one staged chunk write() to the card")
+_M_STAGE_FSYNC = METRICS.histogram("stage_fsync_seconds", "staged writer fsync latency")
+_M_STAGE_STALL = METRICS.counter("stage_stalls_total", "encoder writes that waited for a full stage buffer")
 
 def _ts_now_utc():
     return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
 
+def _ts_utc(t):
+    return datetime.utcfromtimestamp(t).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+def _round_roi(roi):
+    return [round(float(v), 6) for v in roi]
+
+def _vcl_count(b):
+    """Number of coded slices (= frames with picamera's one slice per frame) in an Annex-B chunk."""
+    n = 0
+    i = b.find(b"\x00\x00\x01")
+    while 0 <= i < len(b) - 3:
+        if (b[i + 3] & 0x1F) in (1, 5):
+            n += 1
+        i = b.find(b"\x00\x00\x01", i + 3)
+    return n
+
+def _frame_pts(frame_fn):
+    """Encoder timestamp (us) of the frame being written right now, or None."""
+    if frame_fn is None:
+        return None
+    try:
+        return getattr(frame_fn(), "timestamp", None)
+    except Exception:
+        return None     # picamera raises when the port isn't recording
+
+
+def _stamp(f, pts_us):
+    """Tell an Fmp4Writer (possibly behind a FrameTap) the PTS of the bytes written next."""
+    stamp = getattr(f, "stamp", None)
+    if stamp is not None and pts_us is not None:
+        stamp(pts_us)
+
+
 def _ensure_dir(p):
     if p:
         os.makedirs(p, exist_ok=True)
@@ -19,30 +72,422 @@ def unique_stem(base_dir, prefix="VID"):
     n = 1
     def clashes(s):
         return any(os.path.exists(os.path.join(base_dir, s + ext))
-                   for ext in (".mp4", ".jsonl", ".h264"))
+                   for ext in (".mp4", ".jsonl", ".bsc", ".h264", "_proxy.mp4", ".segments.json",
+                               "_000.mp4", "_000.jsonl", "_000.bsc", "_000_proxy.mp4"))
     candidate = stem
     while clashes(candidate):
         candidate = f"{stem}-{n}"
         n += 1
     return candidate  # return stem only
 
+class StagedWriter:
+    """
+    File-like recording sink that never lets the SD card stall the encoder.
+
+    write() copies into a bounded RAM buffer and returns; a writer thread puts
+    it on disk in chunk_bytes pieces (whole chunks only, so every write is
+    sequential and chunk-aligned), fsyncs every fsync_s and drops the written
+    pages from the cache. Only a full buffer makes write() wait (counted in
+    stage_stalls_total); while one waits the writer thread also puts the
+    partial tail down, so a write that doesn't fit next to an unfinished chunk
+    can't wait forever. The buffer holds at least two chunks. high_water /
+    max_write_s size the buffer against the card's real GC pauses.
+
+    flush() does not wait for the card; seek() and close() drain first.
+    """
+    def __init__(self, path, buffer_bytes=16 << 20, chunk_bytes=1 << 20, fsync_s=1.0):
+        self.path = path
+        self.chunk = int(chunk_bytes)
+        self.capacity = max(int(buffer_bytes), 2 * self.chunk)
+        self.fsync_s = float(fsync_s or 0)
+        self._f = open(path, "wb", buffering=0)
+        self._cv = threading.Condition()
+        self._buf = bytearray()
+        self._pos = 0                   # logical position (what tell() reports)
+        self._drain = False             # write the partial tail too
+        self._waiters = 0               # write() calls blocked on a full buffer
+        self._closed = False
+        self._error = None
+        self.high_water = 0
+        _M_STAGE_HW.set(0)
+        self.stalls = 0
+        self.max_write_s = 0.0
+        # plain thread on purpose: real I/O, not part of the (possibly virtual) app clock
+        self._th = threading.Thread(target=self._run, name="staged-writer", daemon=True)
+        self._th.start()
+
+    # ---------- encoder side ----------
+    def write(self, b):
+        n = len(b)
+        with self._cv:
+            if self._error is not None:
+                raise self._error
+            if self._buf and len(self._buf) + n > self.capacity:
+                self.stalls += 1
+                _M_STAGE_STALL.inc()
+                self._waiters += 1
+                self._cv.notify_all()
+                try:
+                    while self._buf and len(self._buf) + n > self.capacity and self._error is None:
+                        self._cv.wait(0.5)
+                finally:
+                    self._waiters -= 1
+            self._buf += b
+            self._pos += n
+            if len(self._buf) > self.high_water:
+                self.high_water = len(self._buf)
+                _M_STAGE_HW.set(self.high_water)
+            if len(self._buf) >= self.chunk:
+                self._cv.notify_all()
+        return n
+
+    def flush(self):
+        pass
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=0):
+        self._wait_drained()
+        pos = self._f.seek(pos, whence)
+        self._pos = pos
+        return pos
+
+    def close(self):
+        with self._cv:
+            if self._closed:
+                return
+            self._closed = True
+            self._cv.notify_all()
+        self._th.join()
+        try:
+            os.fsync(self._f.fileno())
+        except OSError:
+            pass
+        self._f.close()
+        _M_STAGE.set(0)
+        if self._error is not None:
+            raise self._error
+
+    def _wait_drained(self):
+        with self._cv:
+            self._drain = True
+            self._cv.notify_all()
+            while self._buf and self._error is None:
+                self._cv.wait(0.5)
+            self._drain = False
+            if self._error is not None:
+                raise self._error
+
+    # ---------- writer thread ----------
+    def _run(self):
+        last_sync = time.monotonic()
+        dirty = 0
+        while True:
+            with self._cv:
+                while True:
+                    full = len(self._buf) - len(self._buf) % self.chunk
+                    sync_due = dirty and self.fsync_s and time.monotonic() - last_sync >= self.fsync_s
+                    tail = self._drain or self._closed or self._waiters
+                    if full or sync_due or (tail and self._buf):
+                        break
+                    if self._closed:
+                        return
+                    self._cv.wait(self.fsync_s or None)
+                n = len(self._buf) if tail else full
+                data = self._buf[:n]
+                del self._buf[:n]
+                _M_STAGE.set(len(self._buf))
+            try:
+                if data:
+                    t0 = time.perf_counter()
+                    self._f.write(data)
+                    dt = time.perf_counter() - t0
+                    _M_STAGE_WRITE.observe(dt)
+                    self.max_write_s = max(self.max_write_s, dt)
+                    dirty += len(data)
+                if dirty and self.fsync_s and time.monotonic() - last_sync >= self.fsync_s:
+                    t0 = time.perf_counter()
+                    fd = self._f.fileno()
+                    os.fsync(fd)
+                    if hasattr(os, "posix_fadvise"):
+                        # written video is never read back here; keep the page cache for the app
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                    _M_STAGE_FSYNC.observe(time.perf_counter() - t0)
+                    last_sync = time.monotonic()
+                    dirty = 0
+            except OSError as e:
+                with self._cv:
+                    self._error = e
+                    self._buf.clear()
+                    self._cv.notify_all()
+                print(f"[rec] staged write to {self.path} failed: {e}", flush=True)
+                return
+            with self._cv:
+                self._cv.notify_all()       # room for the encoder / drained for seek()
+
+    def stats(self):
+        return {"high_water_bytes": self.high_water, "stalls": self.stalls,
+                "max_write_s": round(self.max_write_s, 4)}
+
+
+class PreRecordBuffer:
+    """
+    Always-on in-RAM H.264 ring (PiCameraCircularIO, but for any backend).
+    The encoder writes here all the time; the last `seconds` are kept as whole
+    GOPs (SPS .. next SPS) so a flush always starts on a keyframe.
+
+    attach(f) writes the buffered GOPs to f and from then on passes the live
+    stream straight through; detach() hands f back and goes back to buffering.
+    split(f2) moves the live stream to f2 at the next SPS (segment rotation).
+
+    Each chunk keeps the encoder timestamp it arrived with (pts_fn -> the
+    camera.frame being written), so the backlog reaches the muxer with its real
+    frame timing and not just the nominal rate.
+    """
+    def __init__(self, seconds=5.0, fps=30.0, max_bytes=32 << 20, clock=None, pts_fn=None):
+        self.clock = clock or get_clock()
+        self.seconds = float(seconds)
+        self.fps = float(fps or 30.0)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self.pts_fn = pts_fn
+        self._gops = collections.deque()   # [[(chunk, pts_us)], frames, bytes]
+        self._frames = 0
+        self._bytes = 0
+        self._out = None                   # attached file
+        self._spill = None                 # writes that arrive while attach() copies the backlog
+        self._next = None                  # split() target, switched to at the next SPS
+        self._split_done = threading.Event()
+        self.attached = False
+
+    # ---------- encoder side ----------
+    @staticmethod
+    def _sps_pos(b):
+        """Offset of the first SPS start code in b (incl. a 4-byte start code's leading 0), or -1."""
+        i = b.find(b"\x00\x00\x01")
+        while 0 <= i < len(b) - 3:
+            if (b[i + 3] & 0x1F) == 7:
+                return i - 1 if (i > 0 and b[i - 1] == 0) else i
+            i = b.find(b"\x00\x00\x01", i + 3)
+        return -1
+
+    def write(self, b):
+        b = bytes(b)
+        pts = _frame_pts(self.pts_fn)
+        with self._lock:
+            if self._out is not None:
+                if self._next is not None:
+                    pos = self._sps_pos(b)
+                    if pos >= 0:
+                        if pos:
+                            _stamp(self._out, pts)
+                            self._out.write(b[:pos])
+                        self._out, self._next = self._next, None
+                        b = b[pos:]
+                        self._split_done.set()
+                _stamp(self._out, pts)
+                self._out.write(b)
+            elif self._spill is not None:
+                self._spill.append((b, pts))
+            else:
+                self._buffer(b, pts)
+        return len(b)
+
+    def flush(self):
+        with self._lock:
+            if self._out is not None and hasattr(self._out, "flush"):
+                self._out.flush()
+
+    def _buffer(self, b, pts):
+        pos = self._sps_pos(b)
+        if pos > 0:
+            self._append(b[:pos], pts)
+            b = b[pos:]
+            pos = 0
+        if pos == 0:
+            self._gops.append([[], 0, 0])
+        if not self._gops:
+            return                         # nothing before the first keyframe is decodable
+        self._append(b, pts)
+        need = self.seconds * self.fps
+        while len(self._gops) > 1 and (self._frames - self._gops[0][1] >= need or self._bytes > self.max_bytes):
+            _, f, n = self._gops.popleft()
+            self._frames -= f
+            self._bytes -= n
+        _M_PREROLL.set(self._bytes)
+
+    def _append(self, b, pts):
+        if not self._gops or not b:
+            return
+        g = self._gops[-1]
+        n = _vcl_count(b)
+        g[0].append((b, pts))
+        g[1] += n
+        g[2] += len(b)
+        self._frames += n
+        self._bytes += len(b)
+
+    # ---------- recorder side ----------
+    def attach(self, f):
+        """Flush the buffered GOPs into f, then go live. Returns the pre-roll in seconds."""
+        with self._lock:
+            gops, self._gops = self._gops, collections.deque()
+            frames, self._frames, self._bytes = self._frames, 0, 0
+            self._spill = []
+        # the backlog is copied outside the lock so the encoder never waits on the SD card
+        for chunks, _, _ in gops:
+            for c, pts in chunks:
+                _stamp(f, pts)
+                f.write(c)
+        with self._lock:
+            for c, pts in self._spill:
+                _stamp(f, pts)
+                f.write(c)
+            self._spill = None
+            self._out = f
+            self.attached = True
+        _M_PREROLL.set(0)
+        return frames / self.fps
+
+    def split(self, f, timeout=5.0):
+        """Hand the live stream to f from the next keyframe on; returns the previous file."""
+        with self._lock:
+            if self._out is None:
+                raise RuntimeError("ring is not attached")
+            prev = self._out
+            self._split_done.clear()
+            self._next = f
+        if not self.clock.wait(self._split_done, timeout):
+            with self._lock:
+                self._next = None
+            raise RuntimeError("timed out waiting for a keyframe to split at")
+        return prev
+
+    def detach(self):
+        with self._lock:
+            f, self._out = self._out, None
+            self.attached = False
+        return f
+
+    def reset(self):
+        with self._lock:
+            self._gops.clear()
+            self._frames = self._bytes = 0
+
+
+class FrameTap:
+    """
+    Sits between the encoder (or ring) and the file sink and calls
+    on_frame(file_index) for every coded frame just before it is written, so
+    sidecar rows can be keyed to the exact frame in the file. If on_frame
+    returns bytes (an SEI NAL) they go into the stream right in front of that
+    frame's slice. Everything else is passed through to the sink.
+
+    Fed straight by the encoder, pts_fn (-> camera.frame) stamps each write
+    with the encoder's timestamp for the muxer; behind the ring the ring does
+    that instead.
+    """
+    def __init__(self, out, on_frame=None, pts_fn=None):
+        self.out = out
+        self.on_frame = on_frame        # set once the segment's MetadataRecorder is running
+        self.pts_fn = pts_fn
+        self.frames = 0
+
+    def write(self, b):
+        if self.pts_fn is not None:
+            _stamp(self.out, _frame_pts(self.pts_fn))
+        cb = self.on_frame
+        if cb is None:
+            self.frames += _vcl_count(b)
+            return self.out.write(b)
+        parts, last = [], 0
+        i = b.find(b"\x00\x00\x01")
+        while 0 <= i < len(b) - 3:
+            if (b[i + 3] & 0x1F) in (1, 5):
+                extra = cb(self.frames)
+                self.frames += 1
+                if extra:
+                    start = i - 1 if i > 0 and b[i - 1] == 0 else i     # 4-byte start code
+                    parts += (b[last:start], extra)
+                    last = start
+            i = b.find(b"\x00\x00\x01", i + 3)
+        if not parts:
+            return self.out.write(b)
+        parts.append(b[last:])
+        self.out.write(b"".join(parts))
+        return len(b)
+
+    def flush(self):
+        if hasattr(self.out, "flush"):
+            self.out.flush()
+
+    def close(self):
+        self.out.close()
+
+    def __getattr__(self, name):
+        return getattr(self.out, name)
+
+
 class MetadataRecorder:
-    def __init__(self, jsonl_path, video_path, overlay_display, state_text_fn, extra_header=None, hz=1):
+    """
+    Sidecar rows next to the video. jsonl_path ending in .bsc writes the binary
+    columnar format (Sidecar_Binary: batched blocks, no per-row JSON or syscall);
+    anything else is the line-per-row .jsonl.
+
+    Rows are change-driven: the recorder listens on the event bus (reticle
+    moves, zoom ROI applied, HUD text set) and writes a row only when the
+    reticle/zoom/state actually changed, plus a keepalive row every keepalive_s.
+    Between rows the previous row holds. Nothing polls, so it costs nothing
+    while idle.
+
+    With a FrameTap feeding on_frame() a change is written with the next
+    encoded frame: "frame" is that frame's index in the video file and "t_rel"
+    its PTS from the encoder's timestamps (camera.frame), so rows line up with
+    frames even when the real frame timing isn't the nominal fps. Without a tap
+    rows carry the wall-clock time of the change.
+
+    sei=True additionally hands FrameTap an H264_Sei message for every frame,
+    so the same state is stored inside the video stream.
+    """
+    def __init__(self, jsonl_path, video_path, overlay_display, state_text_fn, extra_header=None,
+                 keepalive_s=1.0, clock=None, preroll_s=0.0, zoom_fn=None, frame_fn=None, fps=30.0,
+                 sei=False, hasher=None):
+        self.clock = clock or get_clock()
+        self.sei = bool(sei)
+        self.hasher = hasher          # StreamHash fed with every sidecar byte (None = no inline hash)
+        self.frame_fn = frame_fn        # -> camera.frame (index, timestamp in us), or None
+        self.fps = float(fps or 30.0)
+        self.frame_driven = frame_fn is not None   # rows come from on_frame(), not the bus thread
+        self.binary = jsonl_path.endswith(".bsc")
+        self.zoom_fn = zoom_fn          # -> (x, y, w, h) sensor ROI, or None
+        # video time 0 is preroll_s before start(); every t_rel is shifted to match the file
+        self.preroll_s = float(preroll_s or 0.0)
         self.jsonl_path = jsonl_path
         self.video_path = video_path
         self.overlay_display = overlay_display
         self.state_text_fn = state_text_fn or (lambda: "")
         self.extra_header = extra_header or {}
-        self.hz = max(1, int(hz))
+        self.keepalive_s = float(keepalive_s)
+        self._keepalive_frames = max(1, int(round(self.keepalive_s * self.fps)))
+        self._lock = threading.Lock()
+        self._cur = self._sample()      # (cx, cy, zoom, state_text) as of the last event
+        self._dirty = True              # first frame always gets a row
+        self._row_frame = None          # file frame of the last row
+        self._pending = collections.deque()
+        self._last_enc = None
+        self._base_us = None            # encoder timestamp of file frame 0
+        self._wake = threading.Event()
         self._stop = threading.Event()
         self._th = None
         self._t0 = None
         self._file = None
+        self.events = 0
+        self.rows = 0
 
-    def start(self):
+    def start(self, t0=None):
         _ensure_dir(os.path.dirname(self.jsonl_path))
-        self._file = open(self.jsonl_path, "w", buffering=1)
-        self._t0 = time.monotonic()
+        self._t0 = self.clock.monotonic() if t0 is None else t0
 
         header = {
             "type": "header",
@@ -51,6 +496,10 @@ class MetadataRecorder:
             "created_utc": _ts_now_utc(),
             "video_file": os.path.basename(self.video_path),
             "base_stem": os.path.splitext(os.path.basename(self.video_path))[0],
+            "preroll_s": round(self.preroll_s, 3),
+            "rows": "delta",
+            "keepalive_s": self.keepalive_s,
+            "sei_uuid": H264_Sei.UUID.hex() if self.sei else None,
             "overlay_style": {
                 "radius": getattr(self.overlay_display, "radius", None),
                 "ring_thickness": getattr(self.overlay_display, "ring_thickness", None),
@@ -61,44 +510,155 @@ class MetadataRecorder:
             },
             **self.extra_header
         }
-        self._file.write(json.dumps(header) + "\n")
+        if self.binary:
+            self._file = Sidecar_Binary.BinarySidecarWriter(self.jsonl_path, header, hasher=self.hasher)
+        else:
+            self._file = open(self.jsonl_path, "w", buffering=1, encoding="utf-8")
+            if self.hasher is not None:
+                self._file = HashingWriter(self._file, self.hasher)
+            self._file.write(json.dumps(header) + "\n")
 
-        self._th = threading.Thread(target=self._run, daemon=True)
-        self._th.start()
+        for topic in ("reticle", "zoom", "text"):
+            BUS.subscribe(topic, self._on_event)
+        # anything that changed between __init__ and the subscription
+        self._set_state(self._sample())
+        if not self.frame_driven:
+            self._queue_row(self.preroll_s)
+        self._th = self.clock.start_thread(self._run)
+
+    def _sample(self):
+        cx = cy = None
+        if self.overlay_display is not None:
+            cx, cy = self.overlay_display.get_center()
+        zoom = None
+        if self.zoom_fn is not None:
+            try:
+                zoom = _round_roi(self.zoom_fn())
+            except Exception:
+                zoom = None
+        return cx, cy, zoom, self.state_text_fn() or ""
+
+    def _on_event(self, topic, data):
+        """Bus callback (publisher's thread): fold the change into the current state."""
+        if topic == "reticle" and data.get("source") is not self.overlay_display:
+            return
+        with self._lock:
+            cx, cy, zoom, text = self._cur
+            if topic == "reticle":
+                cx, cy = data["cx"], data["cy"]
+            elif topic == "zoom":
+                zoom = _round_roi(data["roi"])
+            else:
+                text = self.state_text_fn() or ""      # any HUD text may be the state line
+            self._set_state_locked((cx, cy, zoom, text))
+
+    def _set_state(self, cur):
+        with self._lock:
+            self._set_state_locked(cur)
+
+    def _set_state_locked(self, cur):
+        if cur == self._cur:
+            return
+        self._cur = cur
+        self.events += 1
+        if self.frame_driven:
+            self._dirty = True                      # written with the next frame
+        elif self._t0 is not None:
+            self._queue_row(self.clock.monotonic() - self._t0 + self.preroll_s)
+
+    def _queue_row(self, t_rel, frame=-1):
+        self._pending.append((t_rel, frame, time.time()) + self._cur)
+        self._wake.set()
+
+    def on_frame(self, index):
+        """
+        Encoder thread, once per frame written to the file: keep it cheap (rows
+        are written by _run). Returns the frame's SEI NAL when sei is on.
+        """
+        if self._stop.is_set():
+            return None         # frames after stop() belong to nobody
+        enc = self.frame_fn() if self.frame_fn is not None else None
+        if enc is not None:
+            if enc.index == self._last_enc:
+                return None     # ring backlog flushed in one go: frames from before REC, no state for them
+            self._last_enc = enc.index
+        sei = H264_Sei.sei_nal(index, time.time(), *self._cur) if self.sei else None
+        if not self._dirty and index - self._row_frame < self._keepalive_frames:
+            return sei
+        ts = getattr(enc, "timestamp", None)
+        if ts is not None:
+            if self._base_us is None:
+                self._base_us = ts - index * 1e6 / self.fps   # frames before the first stamped one: nominal
+            pts = (ts - self._base_us) / 1e6
+        else:
+            pts = index / self.fps
+        self.frame_driven = True
+        self._dirty = False
+        self._row_frame = index
+        self._queue_row(pts, index)
+        return sei
+
+    def _drain(self):
+        while self._pending:
+            self._write_tick(*self._pending.popleft())
+            self.rows += 1
 
     def _run(self):
-        period = 1.0 / self.hz
-        next_t = time.monotonic()
         while not self._stop.is_set():
-            now_mono = time.monotonic()
-            if now_mono >= next_t:
-                try:
-                    cx = int(getattr(self.overlay_display, "vertical_x"))
-                    cy = int(getattr(self.overlay_display, "horizontal_y"))
-                except Exception:
-                    cx = cy = None
-
-                row = {
-                    "type": "tick",
-                    "utc": _ts_now_utc(),
-                    "t_rel": round(now_mono - self._t0, 3),
-                    "overlay": {"cx": cx, "cy": cy},
-                    "state_text": (self.state_text_fn() or ""),
-                }
-                self._file.write(json.dumps(row) + "\n")
-                next_t += period
-            else:
-                time.sleep(min(0.01, max(0.0, next_t - now_mono)))
+            woke = self.clock.wait(self._wake, self.keepalive_s)
+            self._wake.clear()
+            if not woke and not self.frame_driven and not self._stop.is_set():
+                self._queue_row(self.clock.monotonic() - self._t0 + self.preroll_s)   # keepalive
+            self._drain()
+        self._drain()
+
+    def _write_tick(self, t_rel, frame, utc, cx, cy, zoom, state_text):
+        if self.binary:
+            none = Sidecar_Binary.NONE_I32
+            zx, zy, zw, zh = zoom or (0.0, 0.0, 0.0, 0.0)
+            self._file.append(t_rel=t_rel, frame=frame, utc=utc,
+                              cx=none if cx is None else cx, cy=none if cy is None else cy,
+                              zx=zx, zy=zy, zw=zw, zh=zh, state_text=state_text)
+            return
+        row = {
+            "type": "tick",
+            "utc": _ts_utc(utc),
+            "t_rel": round(t_rel, 4),
+            "overlay": {"cx": cx, "cy": cy},
+            "state_text": state_text,
+        }
+        if frame >= 0:
+            row["frame"] = frame
+        if zoom is not None:
+            row["zoom"] = zoom
+        self._file.write(json.dumps(row) + "\n")
 
     def stop(self):
+        for topic in ("reticle", "zoom", "text"):
+            BUS.unsubscribe(topic, self._on_event)
         self._stop.set()
+        self._wake.set()
         if self._th:
             self._th.join(timeout=2.0)
         if self._file:
+            self._drain()
             self._file.flush()
             self._file.close()
             self._file = None
 
+
+def append_footer(meta_path, footer, hasher=None):
+    """Footer row/block for either sidecar format (hasher: the sidecar's StreamHash, if any)."""
+    footer = dict(type="footer", **footer)
+    if meta_path.endswith(".bsc"):
+        Sidecar_Binary.append_footer(meta_path, footer, hasher=hasher)
+    else:
+        line = json.dumps(footer) + "\n"
+        with open(meta_path, "a", encoding="utf-8") as f:
+            f.write(line)
+        if hasher is not None:
+            hasher.update(line.encode("utf-8"))
+
 # --- helpers for remux ---
 def _guess_fps(camera_obj, default=30.0):
     # Try common spots: your CameraSetup may have .camera (PiCamera) or direct .framerate
@@ -135,7 +695,46 @@ def _remux_h264_to_mp4(h264_path, mp4_path, fps):
     return False
 
 class RecordingManager:
-    def __init__(self, base_dir="~/Saved_Videos", remove_h264_after_remux=True):
+    def __init__(self, base_dir="~/Saved_Videos", remove_h264_after_remux=True, clock=None,
+                 prerecord_seconds=0, live_mux=True, jobs=None, segment_seconds=0, segment_mb=0,
+                 storage=None, stage_mb=16, fsync_s=1.0, sidecar_format="jsonl", sei=False,
+                 proxy_resolution=None, proxy_bitrate=1_500_000, hash_inline=True):
+        self.clock = clock or get_clock()
+        # SHA-256 of video + sidecar bytes as they are written -> signed <stem>.manifest.json
+        # at the end of every segment (Hash_Manifest); the hash job then reads nothing twice
+        self.hash_inline = bool(hash_inline)
+        self._hashes = {}             # path -> StreamHash of the current segment's files
+        # low-res proxy (<stem>_proxy.mp4) from splitter port 2 next to every live-muxed recording;
+        # same stem and sidecar, its own bitrate cap. None = off
+        self.proxy_resolution = tuple(proxy_resolution) if proxy_resolution else None
+        self.proxy_bitrate = int(proxy_bitrate)
+        self._proxy = None            # {"video", "sink", "tap", "frame_offset"} of the current segment
+        self._camera = None           # backend the proxy port runs on
+        # also embed the per-frame state as H.264 SEI user data (needs the FrameTap path)
+        self.sei = bool(sei)
+        # "jsonl" (one JSON line per row) or "bsc" (Sidecar_Binary; export to .jsonl offline)
+        if sidecar_format not in ("jsonl", "bsc"):
+            raise ValueError(f"Unknown sidecar format {sidecar_format!r}")
+        self.sidecar_ext = "." + sidecar_format
+        # RAM-staged writes (StagedWriter) so SD card stalls don't reach the encoder; 0 = plain files
+        self.stage_bytes = int(float(stage_mb or 0) * (1 << 20))
+        self.fsync_s = float(fsync_s or 0)
+        self._stage = None            # StagedWriter of the current segment
+        # Storage_Manager.StorageManager: preflight before start(), usage index kept current
+        self.storage = storage
+        # Post_Jobs.JobQueue: remux/finalize/hash happen off the UI path (None = do it inline)
+        self.jobs = jobs
+        # live_mux: wrap the encoder's NALs into fragmented MP4 while recording (no remux on stop)
+        self.live_mux = bool(live_mux)
+        self._sink = None
+        # FrameTap in front of the sink: sidecar rows per encoded frame (None = 1 Hz wall-clock ticks)
+        self._tap = None
+        self._frame_fn = None         # -> camera.frame of the encoder feeding us
+        self._resolution = None
+        self._fps = 30.0
+        # pre-record ring (armed by arm(); 0 = classic start/stop_recording per file)
+        self.prerecord_seconds = float(prerecord_seconds or 0)
+        self.ring = None
         self.base_dir = os.path.expanduser(base_dir)
         _ensure_dir(self.base_dir)
         self.video_path = None        # intended final (mp4)
@@ -143,99 +742,527 @@ class RecordingManager:
         self.meta = None
         self.active = False
 
+        # segment rotation (0 = one file per recording): split at a keyframe every
+        # segment_seconds / segment_mb, each segment with its own sidecar slice,
+        # tied together by <session>.segments.json
+        self.segment_seconds = float(segment_seconds or 0)
+        self.segment_bytes = int(float(segment_mb or 0) * 1e6)
+        self.session_stem = None
+        self.manifest_path = None
+        self.segments = []
+        self._seg_index = 0
+        self._seg_offset = 0.0        # session time at the start of the current segment
+        self._seg_thread = None
+        self._seg_stop = threading.Event()
+        self._split_target = None     # camera backend or ring that does the split
+        self._ui = (None, None, None)  # overlay_display, state_text_fn, zoom_fn for the next slices
+
         # fallback vars when PiCamera can't write MP4 directly
         self.stem = None
         self.raw_h264_path = None
         self.needs_remux = False
         self.remove_h264_after_remux = remove_h264_after_remux
 
-    def start(self, camera, overlay_display, state_text_fn):
+    def arm(self, camera_setup):
+        """Start the always-on encoder into the pre-record ring (no-op if disabled)."""
+        if self.prerecord_seconds <= 0 or self.ring is not None:
+            return
+        self._resolution = getattr(camera_setup, "resolution", None)
+        self._frame_fn = lambda: getattr(camera_setup.camera, "frame", None)
+        self.ring = PreRecordBuffer(self.prerecord_seconds, fps=_guess_fps(camera_setup), clock=self.clock,
+                                    pts_fn=self._frame_fn)
+        camera_setup.start_prerecord(self.ring)
+        print(f"[rec] pre-record armed ({self.prerecord_seconds:g} s)", flush=True)
+
+    def disarm(self, camera_setup):
+        if self.ring is not None:
+            camera_setup.stop_prerecord()
+            self.ring = None
+
+    @property
+    def segmenting(self):
+        return self.segment_seconds > 0 or self.segment_bytes > 0
+
+    def _set_segment_paths(self, index):
+        self.stem = f"{self.session_stem}_{index:03d}" if self.segmenting else self.session_stem
+        self.video_path = os.path.join(self.base_dir, f"{self.stem}.mp4")
+        self.meta_path = os.path.join(self.base_dir, f"{self.stem}{self.sidecar_ext}")
+
+    def start(self, camera, overlay_display, state_text_fn, zoom_fn=None):
         if self.active:
             return self.video_path
+        t0 = time.perf_counter()
+        if self.storage is not None:
+            self.storage.preflight()      # StorageFull -> caller stays LIVE
+        self.session_stem = unique_stem(self.base_dir, prefix="VID")  # same stem
+        self.segments = []
+        self._seg_index = 0
+        self._seg_offset = 0.0
+        self._ui = (overlay_display, state_text_fn, zoom_fn)
+        self._camera = camera
+        self._hashes = {}
+        self._set_segment_paths(0)
+        self.manifest_path = (os.path.join(self.base_dir, f"{self.session_stem}.segments.json")
+                              if self.segmenting else None)
+        if self.ring is not None:
+            self._start_from_ring()
+        else:
+            self._start_direct(camera)
+        self._start_proxy()
+        self._start_segment_monitor(self.ring if self.ring is not None else camera)
+        self.active = True
+        _M_START.observe(time.perf_counter() - t0)
+        return self.video_path
 
-        self.stem = unique_stem(self.base_dir, prefix="VID")  # same stem
-        intended_mp4 = os.path.join(self.base_dir, f"{self.stem}.mp4")
-        self.meta_path = os.path.join(self.base_dir, f"{self.stem}.jsonl")
+    def _start_direct(self, camera):
+        self._fps = _guess_fps(camera)
+        self._resolution = self._resolution or getattr(camera, "resolution", None)
+        intended_mp4 = self.video_path
 
         # Try to start recording to MP4; if camera rejects (e.g., PiCamera), fall back to .h264
         self.needs_remux = False
         self.raw_h264_path = None
+        self._sink = None
+        self._tap = None
+        self._frame_fn = lambda: getattr(camera, "frame", None)
         try:
-            if hasattr(camera, "start_recording"):
-                camera.start_recording(intended_mp4)
-                self.video_path = intended_mp4
-            else:
+            if not hasattr(camera, "start_recording"):
                 raise RuntimeError("Camera_Setup has no start_recording(path)")
+            if self.live_mux:
+                # our own muxer takes the H.264 stream and writes the .mp4 directly
+                self._sink = self._open_sink(intended_mp4)
+                self._tap = FrameTap(self._sink, pts_fn=self._frame_fn)
+                meta = self._new_meta()
+                try:
+                    camera.start_recording(self._tap, format="h264")
+                except Exception:
+                    self._sink.close()
+                    self._sink = self._tap = None
+                    raise
+            else:
+                meta = self._new_meta()
+                camera.start_recording(intended_mp4)
         except Exception as e:
             # Fallback: PiCamera only supports H.264 elementary stream
             self.raw_h264_path = os.path.join(self.base_dir, f"{self.stem}.h264")
             if hasattr(camera, "start_recording"):
-                camera.start_recording(self.raw_h264_path)
-                self.video_path = intended_mp4  # final goal after remux
+                self._sink = self._open_file(self.raw_h264_path)
+                self._tap = FrameTap(self._sink)
+                meta = self._new_meta()
+                camera.start_recording(self._tap, format="h264")
                 self.needs_remux = True
             else:
                 raise
 
         # Start metadata (always references the intended final video name)
-        self.meta = MetadataRecorder(
+        self._start_meta(meta)
+
+    def _start_from_ring(self):
+        """Pre-record path: the encoder is already running, just tap the ring into a new .h264."""
+        self._fps = self.ring.fps
+        if self.live_mux:
+            self.raw_h264_path = None
+            self.needs_remux = False
+            self._sink = self._open_sink(self.video_path)
+        else:
+            self.raw_h264_path = os.path.join(self.base_dir, f"{self.stem}.h264")
+            self.needs_remux = True
+            self._sink = self._open_file(self.raw_h264_path)
+        self._tap = FrameTap(self._sink)
+        meta = self._new_meta()
+        # the sidecar clock starts at the instant the ring is cut, not after the backlog copy
+        t_cut = self.clock.monotonic()
+        # backlog frames pass the tap before it has a callback: they count, but get no rows
+        meta.preroll_s = self.ring.attach(self._tap)
+        self._tap.on_frame = meta.on_frame
+        self._start_meta(meta, t0=t_cut)
+
+    def _new_meta(self):
+        """Sidecar recorder for the current paths, fed per frame by self._tap when there is one."""
+        overlay_display, state_text_fn, zoom_fn = self._ui
+        meta = MetadataRecorder(
             jsonl_path=self.meta_path,
             video_path=self.video_path,
             overlay_display=overlay_display,
             state_text_fn=state_text_fn,
-            extra_header={},
-            hz=1
+            extra_header=self._video_header(),
+            keepalive_s=1.0,
+            clock=self.clock,
+            zoom_fn=zoom_fn,
+            frame_fn=self._frame_fn if self._tap is not None else None,
+            fps=self._fps,
+            sei=self.sei and self._tap is not None,
+            hasher=self._hasher(self.meta_path),
         )
-        self.meta.start()
-        self.active = True
-        return self.video_path
+        if self._tap is not None and self.ring is None:
+            self._tap.on_frame = meta.on_frame
+        return meta
 
-    def stop(self, camera):
-        if not self.active:
-            return
+    def _start_meta(self, meta, t0=None):
+        if self.segmenting:
+            meta.extra_header["segment"] = {"session": self.session_stem, "index": self._seg_index,
+                                            "offset_s": round(self._seg_offset, 3)}
+        self.meta = meta
+        self.meta.start(t0=t0)
 
-        # stop metadata capture
-        if self.meta:
-            self.meta.stop()
+    def _video_header(self):
+        # enough to remux an orphaned .h264 after a crash
+        res = self._resolution
+        return {"video": {"resolution": list(res) if res else None, "fps": self._fps}}
 
-        # stop camera recording
-        if hasattr(camera, "stop_recording"):
+    def _hasher(self, path):
+        if not self.hash_inline:
+            return None
+        h = self._hashes[path] = StreamHash()
+        return h
+
+    def _hashed(self, path, f):
+        h = self._hasher(path)
+        return f if h is None else HashingWriter(f, h)
+
+    def _open_file(self, path):
+        self._stage = None
+        if self.stage_bytes <= 0:
+            return self._hashed(path, open(path, "wb"))
+        self._stage = StagedWriter(path, buffer_bytes=self.stage_bytes, fsync_s=self.fsync_s)
+        return self._hashed(path, self._stage)
+
+    def _open_sink(self, mp4_path):
+        return Fmp4Writer(mp4_path, fps=self._fps, resolution=self._resolution or (1280, 720),
+                          sink=self._open_file(mp4_path))
+
+    # ---------- proxy ----------
+    def _new_proxy(self):
+        """Sink + tap for this segment's proxy; frame_offset = main-file frame of proxy frame 0."""
+        path = os.path.join(self.base_dir, f"{self.stem}_proxy.mp4")
+        if self.stage_bytes > 0:
+            out = StagedWriter(path, buffer_bytes=max(1 << 20, self.stage_bytes // 4), fsync_s=self.fsync_s)
+        else:
+            out = open(path, "wb")
+        # nominal timing: camera.frame is the main port's, port 2 writes on its own schedule
+        sink = Fmp4Writer(path, fps=self._fps, resolution=self.proxy_resolution, sink=self._hashed(path, out))
+        proxy = {"video": path, "sink": sink, "tap": FrameTap(sink), "frame_offset": None}
+        main_tap = self._tap
+
+        def first_frame(index):
+            # both ports encode the same sensor frames; the main one is written first (+-1 frame)
+            if proxy["frame_offset"] is None:
+                proxy["frame_offset"] = max(0, main_tap.frames - 1) if main_tap is not None else None
+                proxy["tap"].on_frame = None
+        proxy["tap"].on_frame = first_frame
+        return proxy
+
+    def _start_proxy(self):
+        self._proxy = None
+        if not self.proxy_resolution:
+            return
+        if not self.live_mux or self.needs_remux:
+            print("[rec] proxy needs the live muxer; not recording one", flush=True)
+            return
+        proxy = self._new_proxy()
+        try:
+            self._camera.start_recording(proxy["tap"], format="h264", splitter_port=2,
+                                         resize=self.proxy_resolution, bitrate=self.proxy_bitrate)
+        except Exception as e:
+            print(f"[rec] proxy not started: {e}", flush=True)
+            proxy["sink"].close()
             try:
-                camera.stop_recording()
-            except Exception:
+                os.remove(proxy["video"])
+            except OSError:
                 pass
+            return
+        self._proxy = proxy
+
+    def _stop_proxy(self):
+        if self._proxy is not None:
+            try:
+                self._camera.stop_recording(splitter_port=2)
+            except Exception as e:
+                print(f"[rec] stopping the proxy failed: {e}", flush=True)
 
-        final_video = self.video_path
+    # ---------- segments ----------
+    def _start_segment_monitor(self, target):
+        self._split_target = None
+        if not self.segmenting:
+            return
+        if not hasattr(target, "split") and not hasattr(target, "split_recording"):
+            print("[rec] camera can't split recordings; segmenting disabled for this one", flush=True)
+            return
+        self._split_target = target
+        self._seg_stop.clear()
+        self._seg_thread = self.clock.start_thread(self._segment_loop, name="segments")
+
+    def _segment_size(self):
+        sink = self._sink
+        if isinstance(sink, Fmp4Writer):
+            return sink.bytes_written
+        try:
+            return sink.tell() if sink is not None else os.path.getsize(self.raw_h264_path)
+        except (OSError, ValueError, TypeError):
+            return 0
+
+    @property
+    def bytes_in_flight(self):
+        """Bytes of the segment being written (not in the storage index yet)."""
+        if not self.active:
+            return 0
+        proxy = self._proxy
+        return self._segment_size() + (proxy["sink"].bytes_written if proxy is not None else 0)
+
+    def _segment_loop(self):
+        while not self.clock.wait(self._seg_stop, 0.25):
+            elapsed = self.clock.monotonic() - self.meta._t0
+            if ((self.segment_seconds and elapsed >= self.segment_seconds) or
+                    (self.segment_bytes and self._segment_size() >= self.segment_bytes)):
+                try:
+                    self._rotate()
+                except Exception as e:
+                    print(f"[rec] segment split failed, carrying on in one file: {e}", flush=True)
+                    return
+
+    def _take_segment(self):
+        return {"index": self._seg_index, "stem": self.stem, "video": self.video_path,
+                "meta_path": self.meta_path, "meta": self.meta, "sink": self._sink,
+                "h264": self.raw_h264_path, "needs_remux": self.needs_remux,
+                "offset": self._seg_offset, "stage": self._stage, "tap": self._tap,
+                "proxy": self._proxy, "hashes": self._hashes}
+
+    def _rotate(self):
+        """Move the encoder to the next segment at a keyframe, then finish the previous one."""
+        seg = self._take_segment()
+        self._hashes = {}
+        self._seg_index += 1
+        self._set_segment_paths(self._seg_index)
+        if self.needs_remux:
+            self.raw_h264_path = os.path.join(self.base_dir, f"{self.stem}.h264")
+            out = self._open_file(self.raw_h264_path)
+        else:
+            out = self._open_sink(self.video_path)
+        # the new slice's rows start with the keyframe the split lands on
+        tap = None
+        if seg["tap"] is not None:
+            tap = FrameTap(out, pts_fn=seg["tap"].pts_fn)
+        self._tap = tap
+        meta = self._new_meta()
+        if tap is not None:
+            tap.on_frame = meta.on_frame
+        try:
+            if isinstance(self._split_target, PreRecordBuffer):
+                self._split_target.split(tap or out)
+            else:
+                self._split_target.split_recording(tap or out)
+        except Exception:
+            self._tap = seg["tap"]
+            self._hashes = seg["hashes"]
+            out.close()
+            for p in (self.video_path, self.raw_h264_path):
+                if p and os.path.exists(p) and p != seg["video"] and p != seg["h264"]:
+                    os.remove(p)
+            self._seg_index -= 1
+            self.stem, self.video_path, self.meta_path = seg["stem"], seg["video"], seg["meta_path"]
+            self.raw_h264_path = seg["h264"]
+            self._stage = seg["stage"]
+            raise
+        t_cut = self.clock.monotonic()
+        self._sink = out
+        if seg["proxy"] is not None:
+            # the proxy follows at its own next keyframe
+            self._proxy = self._new_proxy()
+            try:
+                self._camera.split_recording(self._proxy["tap"], splitter_port=2)
+            except Exception as e:
+                print(f"[rec] proxy split failed, it carries on in {os.path.basename(seg['proxy']['video'])}: {e}",
+                      flush=True)
+                self._proxy["sink"].close()
+                os.remove(self._proxy["video"])
+                self._hashes.pop(self._proxy["video"], None)
+                self._proxy, seg["proxy"] = seg["proxy"], None
+                if self._proxy["video"] in seg["hashes"]:
+                    # still growing: its hash goes with the segment it ends in
+                    self._hashes[self._proxy["video"]] = seg["hashes"].pop(self._proxy["video"])
+        self._seg_offset = seg["offset"] + self._segment_duration(seg, t_cut)
+        self._start_meta(meta, t0=t_cut)
+        self._finish_segment(seg, t_cut, last=False)
+
+    def _segment_duration(self, seg, t_end):
+        """Length of a finished segment's video: frames in the file when tapped, else wall clock."""
+        if seg["tap"] is not None:
+            return seg["tap"].frames / self._fps
+        meta = seg["meta"]
+        return t_end - meta._t0 + meta.preroll_s
+
+    def _finish_segment(self, seg, t_end, last):
+        """Close one segment's files; its video is final (or queued for remux) when this returns."""
+        meta = seg["meta"]
+        if meta:
+            meta.stop()
+        final_video = seg["video"]
         remux_ok = False
 
+        sink = seg["sink"]
+        if sink is not None:
+            # live fMP4: only the last fragment is left to write
+            t_close = time.perf_counter()
+            try:
+                sink.close()
+                remux_ok = isinstance(sink, Fmp4Writer)
+            except Exception as e:
+                print(f"[rec] closing {getattr(sink, 'name', getattr(sink, 'path', '?'))} failed: {e}", flush=True)
+            if isinstance(sink, Fmp4Writer):
+                _M_MUX_CLOSE.observe(time.perf_counter() - t_close)
+
+        proxy = seg.get("proxy")
+        if proxy is not None:
+            try:
+                proxy["sink"].close()
+            except Exception as e:
+                print(f"[rec] closing {os.path.basename(proxy['video'])} failed: {e}", flush=True)
+            proxy = {"video": os.path.basename(proxy["video"]), "resolution": list(self.proxy_resolution),
+                     "bitrate": self.proxy_bitrate, "frame_offset": proxy["frame_offset"]}
+
+        h264 = seg["h264"]
+        queued = False
+        if seg["needs_remux"] and self.jobs is not None and h264 and os.path.exists(h264):
+            # the worker remuxes, writes the footer and hashes; the UI goes straight back to LIVE
+            self._write_hash_manifest(seg)      # before the worker starts changing these files
+            self.jobs.enqueue_recording(seg["stem"], h264=h264, fps=self._fps,
+                                        resolution=self._video_header()["video"]["resolution"],
+                                        remove_h264=self.remove_h264_after_remux)
+            queued = True
+
         # If we recorded raw .h264, try to remux it now
-        if self.needs_remux and self.raw_h264_path and os.path.exists(self.raw_h264_path):
-            fps = _guess_fps(camera)
+        elif seg["needs_remux"] and h264 and os.path.exists(h264):
+            t_remux = time.perf_counter()
             try:
-                remux_ok = _remux_h264_to_mp4(self.raw_h264_path, self.video_path, fps)
-                if remux_ok and self.remove_h264_after_remux:
+                if self.hash_inline:
+                    # our muxer, hashed into the manifest as it writes (MP4Box/ffmpeg can't be)
+                    from Post_Jobs import job_remux
+                    job_remux(h264, seg["video"], fps=self._fps,
+                              resolution=self._video_header()["video"]["resolution"],
+                              remove_h264=self.remove_h264_after_remux)
+                    remux_ok = True
+                else:
+                    remux_ok = _remux_h264_to_mp4(h264, seg["video"], self._fps)
+                if remux_ok and self.remove_h264_after_remux and os.path.exists(h264):
                     try:
-                        os.remove(self.raw_h264_path)
+                        os.remove(h264)
                     except OSError:
                         pass
             except Exception:
                 remux_ok = False
+            _M_REMUX.observe(time.perf_counter() - t_remux)
 
             if not remux_ok:
+                _M_REMUX_FAIL.inc()
                 # fall back to returning the .h264 if remux failed
-                final_video = self.raw_h264_path
+                final_video = h264
 
-        # Append a footer row with the actual outcome
-        try:
-            with open(self.meta_path, "a") as f:
-                f.write(json.dumps({
-                    "type": "footer",
+        if not queued:
+            # Append a footer row with the actual outcome
+            try:
+                append_footer(seg["meta_path"], {
                     "stopped_utc": _ts_now_utc(),
                     "final_video_file": os.path.basename(final_video),
-                    "intended_video_file": os.path.basename(self.video_path),
+                    "intended_video_file": os.path.basename(seg["video"]),
                     "remux_ok": remux_ok,
-                }) + "\n")
-        except Exception:
-            pass
+                    "muxer": "fmp4" if (remux_ok and not seg["needs_remux"]) else "remux",
+                    "stage": seg["stage"].stats() if seg["stage"] else None,
+                    "proxy": proxy,
+                }, hasher=seg["hashes"].get(seg["meta_path"]))
+            except Exception:
+                pass
+            self._write_hash_manifest(seg)
+            if self.jobs is not None:
+                self.jobs.add("hash", stem=seg["stem"])
+
+        if self.storage is not None:
+            self.storage.note_stem(seg["stem"])
+            if meta and not queued and os.path.exists(final_video):
+                self.storage.observe_recording(os.path.getsize(final_video), self._segment_duration(seg, t_end))
+
+        if self.segmenting:
+            self.segments.append({
+                "index": seg["index"],
+                "video": os.path.basename(final_video),
+                "sidecar": os.path.basename(seg["meta_path"]),
+                "offset_s": round(seg["offset"], 3),
+                "duration_s": round(self._segment_duration(seg, t_end), 3) if meta else None,
+                "bytes": os.path.getsize(final_video) if os.path.exists(final_video) else None,
+                "status": "queued" if queued else ("ready" if os.path.exists(final_video) else "failed"),
+                "proxy": proxy["video"] if proxy else None,
+            })
+            self._write_manifest(complete=last)
+            if not last:
+                print(f"[rec] segment {seg['index']} done: {os.path.basename(final_video)}", flush=True)
+        return final_video
+
+    def _write_hash_manifest(self, seg):
+        """Signed <stem>.manifest.json from the segment's inline hashes (merged with a remux's entry)."""
+        files = {}
+        for path, h in seg.get("hashes", {}).items():
+            r = h.result()
+            try:
+                if os.path.getsize(path) == r["size"]:
+                    files[os.path.basename(path)] = r
+                else:
+                    print(f"[rec] {os.path.basename(path)} changed behind the hasher; left to the hash job",
+                          flush=True)
+            except OSError:
+                pass                  # gone (remuxed .h264, abandoned split)
+        if not files:
+            return
+        path = Hash_Manifest.manifest_path(os.path.join(self.base_dir, seg["stem"]))
+        try:
+            Hash_Manifest.update_manifest(path, files)
+        except Exception as e:
+            print(f"[rec] writing {os.path.basename(path)} failed: {e}", flush=True)
+
+    def _write_manifest(self, complete):
+        doc = {
+            "type": "segments",
+            "session": self.session_stem,
+            "updated_utc": _ts_now_utc(),
+            "segment_seconds": self.segment_seconds,
+            "segment_bytes": self.segment_bytes,
+            "complete": complete,
+            "segments": self.segments,
+        }
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(doc, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+        if self.storage is not None:
+            self.storage.note(self.manifest_path)
+
+    def stop(self, camera):
+        if not self.active:
+            return
+        t0 = time.perf_counter()
+
+        # no more rotations (waits for one in progress)
+        if self._seg_thread is not None:
+            self._seg_stop.set()
+            self._seg_thread.join(timeout=10.0)
+            self._seg_thread = None
+
+        # stop metadata capture
+        if self.meta:
+            self.meta.stop()
+        self._stop_proxy()
+
+        if self.ring is not None and self.ring.attached:
+            # pre-record path: the encoder keeps feeding the ring
+            self.ring.detach()
+        # stop camera recording
+        elif hasattr(camera, "stop_recording"):
+            try:
+                camera.stop_recording()
+            except Exception:
+                pass
+
+        final_video = self._finish_segment(self._take_segment(), self.clock.monotonic(), last=True)
+        self._sink = self._tap = self._proxy = None
 
         self.active = False
+        _M_STOP.observe(time.perf_counter() - t0)
         return final_video, self.meta_path
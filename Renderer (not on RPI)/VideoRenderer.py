@@ -16,27 +16,145 @@ except Exception:
 def _stem_paths(stem_or_path):
     p = os.path.expanduser(stem_or_path)
     base, ext = os.path.splitext(p)
+    # binary .bsc sidecar if the camera wrote one, else .jsonl
+    sidecar = base + ".bsc" if os.path.isfile(base + ".bsc") else base + ".jsonl"
     if ext.lower() == ".mp4":
-        mp4 = p; jsonl = base + ".jsonl"
-    elif ext.lower() == ".jsonl":
+        mp4 = p; jsonl = sidecar
+    elif ext.lower() in (".jsonl", ".bsc"):
         jsonl = p; mp4 = base + ".mp4"
     else:
-        mp4 = base + ".mp4"; jsonl = base + ".jsonl"
+        mp4 = base + ".mp4"; jsonl = sidecar
     if not os.path.isfile(mp4):   raise FileNotFoundError(f"Video not found: {mp4}")
-    if not os.path.isfile(jsonl): raise FileNotFoundError(f"Metadata not found: {jsonl}")
+    if not os.path.isfile(jsonl): jsonl = None     # maybe the video carries it (SEI)
     out = base + "_overlay.mp4"
     return mp4, jsonl, out
 
-def _load_header_and_ticks(jsonl_path):
-    header, ticks = {}, []
-    with open(jsonl_path, "r") as f:
+def _camera_module(name):
+    # Sidecar_Binary.py / H264_Sei.py live in the camera code (one level up); or copy them next to this file
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    return __import__(name)
+
+def _sidecar_rows(path):
+    if path.endswith(".bsc"):
+        Sidecar_Binary = _camera_module("Sidecar_Binary")
+        yield from Sidecar_Binary.iter_rows(Sidecar_Binary.read(path))
+        return
+    with open(path, "r") as f:
         for line in f:
-            if not line.strip(): continue
-            obj = json.loads(line)
-            if obj.get("type") == "header": header = obj
-            elif obj.get("type") == "tick": ticks.append(obj)
-    ticks.sort(key=lambda x: x.get("t_rel", 0.0))
-    return header, ticks
+            if line.strip():
+                yield json.loads(line)
+
+# ---------- sidecar index ----------
+# The per-frame loop only needs t_rel, frame, cx, cy and the state line of each row.
+# Those go into flat NumPy arrays, built once per sidecar and cached next to it as
+# <sidecar>.idx.npz (rebuilt when the sidecar's size or mtime changes). .bsc sidecars
+# are columnar already and are read straight from the mmap.
+INDEX_VERSION = 1
+NO_XY = -(1 << 31)          # cx/cy unknown
+
+def _index_path(sidecar):
+    return sidecar + ".idx.npz"
+
+def _source_key(sidecar):
+    st = os.stat(sidecar)
+    return np.array([INDEX_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+def _index_from_rows(rows):
+    header, t_rel, frame, cx, cy, state = {}, [], [], [], [], []
+    strings = {}
+    for obj in rows:
+        kind = obj.get("type")
+        if kind == "header":
+            header = obj
+        elif kind == "tick":
+            ov = obj.get("overlay") or {}
+            t_rel.append(obj.get("t_rel", 0.0))
+            frame.append(obj.get("frame", -1))
+            cx.append(NO_XY if ov.get("cx") is None else ov["cx"])
+            cy.append(NO_XY if ov.get("cy") is None else ov["cy"])
+            state.append(strings.setdefault(obj.get("state_text", "") or "", len(strings)))
+    return dict(header=header,
+                t_rel=np.array(t_rel, dtype=np.float64), frame=np.array(frame, dtype=np.int32),
+                cx=np.array(cx, dtype=np.int32), cy=np.array(cy, dtype=np.int32),
+                state=np.array(state, dtype=np.int32), strings=list(strings))
+
+def _index_from_bsc(path):
+    Sidecar_Binary = _camera_module("Sidecar_Binary")
+    data = Sidecar_Binary.read(path)
+    c = data.columns
+    n = len(data)
+    return dict(header=data.header,
+                t_rel=c["t_rel"], frame=c["frame"] if "frame" in c else np.full(n, -1, np.int32),
+                cx=c["cx"], cy=c["cy"], state=c["state"].astype(np.int32), strings=list(data.strings))
+
+def _index_from_sei(video, fps):
+    """Same arrays from the SEI messages inside the video (one per frame, no sidecar needed)."""
+    H264_Sei = _camera_module("H264_Sei")
+    c = H264_Sei.scan(video)
+    if not len(c["frame"]):
+        raise RuntimeError(f"No sidecar and no SEI metadata in {video}")
+    order = np.argsort(c["frame"], kind="stable")
+    frame = c["frame"][order]
+    t_rel = frame / fps                       # the muxer's constant frame rate
+    header = {"created_utc": datetime.fromtimestamp(float(c["utc"][order[0]]) - t_rel[0], timezone.utc)
+              .strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'}
+    return dict(header=header, t_rel=t_rel, frame=frame, cx=c["cx"][order], cy=c["cy"][order],
+                state=c["state"][order], strings=c["strings"])
+
+def _load_index(sidecar, use_cache=True):
+    """{header, t_rel, frame, cx, cy, state, strings}, rows in t_rel order."""
+    if sidecar.endswith(".bsc"):
+        idx = _index_from_bsc(sidecar)
+    else:
+        cache, key = _index_path(sidecar), _source_key(sidecar)
+        idx = None
+        if use_cache and os.path.isfile(cache):
+            try:
+                with np.load(cache, allow_pickle=False) as z:
+                    if np.array_equal(z["source"], key):
+                        idx = {k: z[k] for k in ("t_rel", "frame", "cx", "cy", "state")}
+                        idx["header"] = json.loads(str(z["header"]))
+                        idx["strings"] = [str(x) for x in z["strings"]]
+            except Exception:
+                idx = None
+        if idx is None:
+            idx = _index_from_rows(_sidecar_rows(sidecar))
+            if use_cache:
+                try:
+                    tmp = cache + ".tmp"
+                    with open(tmp, "wb") as f:
+                        np.savez(f, source=key, header=json.dumps(idx["header"]),
+                                 strings=np.array(idx["strings"] or [""], dtype=str),
+                                 **{k: idx[k] for k in ("t_rel", "frame", "cx", "cy", "state")})
+                    os.replace(tmp, cache)
+                except OSError as e:
+                    print(f"(index not cached: {e})")
+    t = idx["t_rel"]
+    if len(t) > 1 and np.any(np.diff(t) < 0):
+        order = np.argsort(t, kind="stable")
+        for k in ("t_rel", "frame", "cx", "cy", "state"):
+            idx[k] = idx[k][order]
+    return idx
+
+def _frame_plan(idx, f0, n, fps):
+    """
+    Rows and PTS for video frames f0..f0+n-1 (vectorized). Row -1 = no state for
+    that frame (pre-roll in front of the first tick, or a sidecar without ticks).
+    """
+    f = np.arange(f0, f0 + n)
+    if not len(idx["t_rel"]):
+        return np.full(n, -1, np.int64), f / fps
+    if np.all(idx["frame"] >= 0):
+        # newer sidecars: rows keyed by frame index, t_rel = encoder PTS; the row
+        # in force holds until the next one, frames in between at nominal spacing.
+        # Frames before the first row are pre-roll: nothing was on screen yet
+        row = np.searchsorted(idx["frame"], f, side="right") - 1
+        ref = np.clip(row, 0, None)
+        t = idx["t_rel"][ref] + (f - idx["frame"][ref]) / fps
+    else:
+        t = f / fps
+        row = np.clip(np.searchsorted(idx["t_rel"], t, side="right") - 1, 0, None)
+    return row, t
 
 def _style_from_header(header):
     s = header.get("overlay_style", {}) if header else {}
@@ -61,6 +179,7 @@ def _transforms_from_header(header):
     return mx, my, rot
 
 def _apply_transform(cx, cy, w, h, mirror_x=False, mirror_y=False, rotate=0):
+    # scalars or whole NumPy columns alike
     if cx is None or cy is None:
         return cx, cy
     if mirror_x: cx = (w - 1) - cx
@@ -208,7 +327,7 @@ def _put_text(
                         font_cv, scale_cv, stroke_color_bgr, int(thickness)+1, cv2.LINE_AA)
     cv2.putText(img, text, org, font_cv, scale_cv, color_bgr, int(thickness), cv2.LINE_AA)
 
-# ... keep your existing helpers (_stem_paths, _load_header_and_ticks, etc.) ...
+# ... keep your existing helpers (_stem_paths, _load_index, etc.) ...
 
 def _parse_created_utc(header):
     s = (header or {}).get("created_utc")
@@ -229,14 +348,23 @@ def _parse_created_utc(header):
 def render(stem_or_path, output=None, show_state_text=True, text_pos="top-right",
            mirror_x=None, mirror_y=None, rotate=None,
            show_clock=True, clock_pos="bottom-left", clock_scale=0.8,
-           tz_name="Asia/Tehran"):
+           tz_name="Asia/Tehran", source="auto"):
+    """source: "sidecar", "sei" (metadata embedded in the video) or "auto" (sidecar if there is one)."""
     video_path, jsonl_path, default_out = _stem_paths(stem_or_path)
     if output is None:
         output = default_out
 
-    header, ticks = _load_header_and_ticks(jsonl_path)
-    if not ticks:
-        raise RuntimeError("No tick rows found in metadata.")
+    if source == "sei" or (source == "auto" and jsonl_path is None):
+        cap = cv2.VideoCapture(video_path)
+        idx = _index_from_sei(video_path, cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        cap.release()
+    elif jsonl_path is None:
+        raise FileNotFoundError(f"Metadata not found next to {video_path}")
+    else:
+        idx = _load_index(jsonl_path)
+    header = idx["header"]
+    if not len(idx["t_rel"]):
+        print("(no tick rows in metadata; clock only)")
 
     style = _style_from_header(header)
     color_bgr = style["color"]
@@ -249,13 +377,16 @@ def render(stem_or_path, output=None, show_state_text=True, text_pos="top-right"
 
     # clock base (UTC) and target tz
     start_utc = _parse_created_utc(header)
-    if start_utc is None and ticks and ticks[0].get("utc"):
-        s0 = ticks[0]["utc"].strip()
+    if start_utc is None and header.get("created_local"):
+        s0 = header["created_local"].strip()
         if s0.endswith("Z"): s0 = s0[:-1] + "+00:00"
         try:
             start_utc = datetime.fromisoformat(s0)
         except Exception:
             start_utc = None
+    if start_utc is not None:
+        # pre-recorded seconds sit in front of the moment REC was pressed
+        start_utc -= timedelta(seconds=float(header.get("preroll_s", 0) or 0))
     target_tz = _resolve_tz(tz_name)  # None => system local
 
     cap = cv2.VideoCapture(video_path)
@@ -270,32 +401,36 @@ def render(stem_or_path, output=None, show_state_text=True, text_pos="top-right"
     if not out.isOpened():
         raise RuntimeError(f"Failed to open writer: {output}")
 
-    i = 0
-    current = ticks[0]
-    next_tick = ticks[1] if len(ticks) > 1 else None
+    # reticle position per row, transformed once for the whole file
+    has_xy = (idx["cx"] != NO_XY) & (idx["cy"] != NO_XY)
+    row_cx, row_cy = _apply_transform(idx["cx"].astype(np.int64), idx["cy"].astype(np.int64),
+                                      w, h, mirror_x=mx, mirror_y=my, rotate=rot)
+    strings = idx["strings"]
+
+    # rows/PTS for a block of frames at a time (the frame count of a live fMP4 isn't always known)
+    block = 4096
+    plan_f0, rows, times = 0, np.zeros(0, np.int64), np.zeros(0)
 
     frame_idx = 0
     while True:
         ok, frame = cap.read()
         if not ok: break
-        t_rel = frame_idx / fps
-
-        while next_tick and t_rel >= next_tick.get("t_rel", 0.0):
-            i += 1
-            current = next_tick
-            next_tick = ticks[i+1] if (i + 1) < len(ticks) else None
-
-        ov = current.get("overlay", {})
-        cx = ov.get("cx"); cy = ov.get("cy")
-        cx, cy = _apply_transform(cx, cy, w, h, mirror_x=mx, mirror_y=my, rotate=rot)
+        k = frame_idx - plan_f0
+        if k >= len(rows):
+            plan_f0, k = frame_idx, 0
+            rows, times = _frame_plan(idx, plan_f0, block, fps)
+        r = int(rows[k])
+        t_rel = float(times[k])
+        cx, cy = (int(row_cx[r]), int(row_cy[r])) if r >= 0 and has_xy[r] else (None, None)
 
         _draw_reticle(frame, cx, cy,
                       radius=style["radius"], ring=style["ring"],
                       tick_len=style["tick_len"], tick_w=style["tick_w"],
                       gap=style["gap"], color=color_bgr)
 
-        if show_state_text:
-            _put_text(frame, FONT_PATH, FONT_SIZE, current.get("state_text", ""), color_bgr, at=text_pos)
+        if show_state_text and r >= 0:
+            sid = int(idx["state"][r])
+            _put_text(frame, FONT_PATH, FONT_SIZE, strings[sid] if sid < len(strings) else "", color_bgr, at=text_pos)
 
         if show_clock and start_utc is not None:
             wall = (start_utc + timedelta(seconds=t_rel))
@@ -325,6 +460,8 @@ def main():
                     choices=["top-left","top-right","bottom-left","bottom-right"],
                     help="Where to draw the clock (default bottom-left).")
     ap.add_argument("--clock-scale", type=float, default=1.0, help="Clock font scale (default 0.8).")
+    ap.add_argument("--source", default="auto", choices=["auto", "sidecar", "sei"],
+                    help="Overlay data: sidecar file, SEI inside the video, or auto (sidecar if present).")
     ap.add_argument("--tz", default="Asia/Tehran",
                     help="IANA timezone for the clock (default Asia/Tehran; use 'local' for system local).")
     args = ap.parse_args()
@@ -340,6 +477,7 @@ def main():
         clock_pos=args.clock_pos,
         clock_scale=args.clock_scale,
         tz_name=args.tz,
+        source=args.source,
     )
 
 if __name__ == "__main__":
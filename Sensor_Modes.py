@@ -0,0 +1,159 @@
+# Sensor_Modes.py
+"""
+Zoom-aware sensor mode selection.
+
+Every picamera sensor mode reads a different window of the sensor (FOV) with
+different binning. At 1x a binned full-width mode is plenty; at 4x-8x the ISP is
+upscaling a tiny crop of that binned image, while an unbinned mode would have
+real pixels there. SensorModePlanner picks, per ROI, the mode whose native pixels
+best cover it and only switches when the gain is worth the reconfiguration.
+
+Coordinates: CameraSetup's "sensor-normalized" space is the FOV of the BASE mode
+(the one configured at boot). A ROI in that space is converted to the active
+mode's own normalized space with to_mode_roi() right before camera.zoom.
+
+The planner only needs a mode table, so it can be exercised against any fake
+sensor table without a camera (tests/test_sensor_modes.py).
+"""
+import collections
+
+# index, output size, FOV on the full sensor (normalized x0, y0, w, h), binning, fps range
+SensorMode = collections.namedtuple(
+    "SensorMode", "index width height fov binning min_fps max_fps")
+
+
+def _centered(win_w, win_h, full_w, full_h):
+    return ((full_w - win_w) / 2.0 / full_w, (full_h - win_h) / 2.0 / full_h,
+            win_w / float(full_w), win_h / float(full_h))
+
+
+# Camera Module v2 (picamera sensor_mode numbers; full array 3280x2464)
+IMX219_MODES = (
+    SensorMode(1, 1920, 1080, _centered(1920, 1080, 3280, 2464), 1, 0.1, 30),
+    SensorMode(2, 3280, 2464, (0.0, 0.0, 1.0, 1.0), 1, 0.1, 15),
+    SensorMode(3, 3280, 2464, (0.0, 0.0, 1.0, 1.0), 1, 0.1, 15),
+    SensorMode(4, 1640, 1232, (0.0, 0.0, 1.0, 1.0), 2, 0.1, 40),
+    SensorMode(5, 1640, 922,  _centered(3280, 1844, 3280, 2464), 2, 0.1, 40),
+    SensorMode(6, 1280, 720,  _centered(2560, 1440, 3280, 2464), 2, 40, 90),
+    SensorMode(7, 640,  480,  _centered(1280, 960, 3280, 2464), 2, 40, 200),
+)
+
+# Camera Module v1 (full array 2592x1944)
+OV5647_MODES = (
+    SensorMode(1, 1920, 1080, _centered(1920, 1080, 2592, 1944), 1, 1, 30),
+    SensorMode(2, 2592, 1944, (0.0, 0.0, 1.0, 1.0), 1, 1, 15),
+    SensorMode(3, 2592, 1944, (0.0, 0.0, 1.0, 1.0), 1, 0.1666, 1),
+    SensorMode(4, 1296, 972,  (0.0, 0.0, 1.0, 1.0), 2, 1, 42),
+    SensorMode(5, 1296, 730,  _centered(2592, 1460, 2592, 1944), 2, 1, 49),
+    SensorMode(6, 640,  480,  _centered(2560, 1920, 2592, 1944), 4, 42, 60),
+    SensorMode(7, 640,  480,  _centered(2560, 1920, 2592, 1944), 4, 60, 90),
+)
+
+SENSOR_MODES = {"imx219": IMX219_MODES, "ov5647": OV5647_MODES}
+
+
+class SensorModePlanner:
+    """
+    plan(roi, current) -> mode index to switch to, or None to stay.
+
+    Quality of a mode for a ROI = native mode pixels across the ROI / output
+    pixels, capped at 1 (1 means no upscaling). A switch happens when the
+    current mode can't see the ROI at all, or when the quality gain beats
+    min_gain + cost_weight * expected switch cost (seconds). Switch costs start at
+    default_cost and are replaced by a running average of measured switches.
+    """
+    CACHE_SIZE = 256
+
+    def __init__(self, modes, base_mode, output_size, framerate=30,
+                 min_gain=0.2, cost_weight=0.25, default_cost=0.4):
+        self.modes = {m.index: m for m in modes}
+        if base_mode not in self.modes:
+            raise ValueError(f"base mode {base_mode} not in the sensor table")
+        self.base = self.modes[base_mode]
+        self.out_w, self.out_h = int(output_size[0]), int(output_size[1])
+        self.min_gain = float(min_gain)
+        self.cost_weight = float(cost_weight)
+        self.default_cost = float(default_cost)
+        # usable at this framerate; modes that can't do it never get picked
+        self.candidates = [m for m in modes if m.min_fps <= framerate <= m.max_fps]
+        if self.base not in self.candidates:
+            self.candidates.append(self.base)
+        self._costs = {}     # (from, to) -> seconds (EWMA of measured switches)
+        self._best = {}      # rounded roi -> mode index
+
+    # ---------- geometry ----------
+    def to_sensor(self, roi):
+        """Base-mode-normalized ROI -> full-sensor-normalized ROI."""
+        bx, by, bw, bh = self.base.fov
+        x, y, w, h = roi
+        return (bx + x * bw, by + y * bh, w * bw, h * bh)
+
+    def to_mode_roi(self, roi, mode_index):
+        """Base-mode-normalized ROI -> ROI normalized to mode_index's FOV (clamped)."""
+        if mode_index == self.base.index:
+            return tuple(roi)
+        sx, sy, sw, sh = self.to_sensor(roi)
+        mx, my, mw, mh = self.modes[mode_index].fov
+        w = min(1.0, sw / mw)
+        h = min(1.0, sh / mh)
+        x = min(max(0.0, (sx - mx) / mw), 1.0 - w)
+        y = min(max(0.0, (sy - my) / mh), 1.0 - h)
+        return (x, y, w, h)
+
+    @staticmethod
+    def contains(mode, sensor_roi, eps=1e-6):
+        mx, my, mw, mh = mode.fov
+        x, y, w, h = sensor_roi
+        return (x >= mx - eps and y >= my - eps and
+                x + w <= mx + mw + eps and y + h <= my + mh + eps)
+
+    def quality(self, mode, sensor_roi):
+        _, _, w, h = sensor_roi
+        native_w = w / mode.fov[2] * mode.width
+        native_h = h / mode.fov[3] * mode.height
+        return min(1.0, native_w / self.out_w, native_h / self.out_h)
+
+    # ---------- selection ----------
+    def best_mode(self, roi):
+        """Best mode for this ROI ignoring the current one (cached)."""
+        key = tuple(round(v, 4) for v in roi)
+        hit = self._best.get(key)
+        if hit is not None:
+            return hit
+        s = self.to_sensor(roi)
+        best, best_key = self.base.index, None
+        for m in self.candidates:
+            if not self.contains(m, s):
+                continue
+            # highest quality, then the cheapest readout (fewest pixels, then highest fps)
+            k = (round(self.quality(m, s), 3), -(m.width * m.height), m.max_fps)
+            if best_key is None or k > best_key:
+                best, best_key = m.index, k
+        if len(self._best) >= self.CACHE_SIZE:
+            self._best.clear()
+        self._best[key] = best
+        return best
+
+    def plan(self, roi, current, only_if_needed=False):
+        """only_if_needed: switch only when the current mode can't see the ROI."""
+        target = self.best_mode(roi)
+        if target == current:
+            return None
+        s = self.to_sensor(roi)
+        cur = self.modes.get(current)
+        if cur is None or not self.contains(cur, s):
+            return target                       # must switch: current mode can't see the ROI
+        if only_if_needed:
+            return None
+        gain = self.quality(self.modes[target], s) - self.quality(cur, s)
+        if gain >= self.min_gain + self.cost_weight * self.switch_cost(current, target):
+            return target
+        return None
+
+    # ---------- switch cost ----------
+    def switch_cost(self, a, b):
+        return self._costs.get((a, b), self.default_cost)
+
+    def record_switch(self, a, b, seconds, alpha=0.3):
+        old = self._costs.get((a, b))
+        self._costs[(a, b)] = float(seconds) if old is None else old + alpha * (float(seconds) - old)
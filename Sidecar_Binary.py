@@ -0,0 +1,273 @@
+# Sidecar_Binary.py
+"""
+Binary columnar sidecar (<stem>.bsc), the compact alternative to <stem>.jsonl.
+
+File = magic + blocks. Every block is
+  tag (4s) | payload length (u32) | count (u32) | crc32 of payload (u32) | payload
+with tags
+  HDR   JSON header (same fields as the .jsonl header + "columns")
+  STRS  new entries of the string table (u16 length + utf-8 each), ids continue
+  ROWS  `count` packed rows, numpy dtype from the header's "columns"
+  FOOT  JSON footer (appended by whoever finalizes the recording)
+
+The writer batches rows and writes one STRS+ROWS pair per block_rows rows or
+flush_s seconds: one write() per block instead of one per row, and a crash only
+loses the unflushed block. The reader mmaps the file, checks every CRC (bad
+blocks are skipped and counted) and returns NumPy columns; a single-block file
+is read without copying.
+
+    python Sidecar_Binary.py export VID_x.bsc [out.jsonl]
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import struct
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+MAGIC = b"BSC\x01"
+_BLOCK = struct.Struct("<4sIII")
+TAG_HDR, TAG_STRS, TAG_ROWS, TAG_FOOT = b"HDR ", b"STRS", b"ROWS", b"FOOT"
+
+# row schema; cx/cy use NONE_I32 for "unknown"
+COLUMNS = (
+    ("t_rel", "<f8"),        # PTS in the video file (seconds)
+    ("frame", "<i4"),        # frame index in the video file (-1: wall-clock tick)
+    ("utc", "<f8"),          # unix seconds
+    ("cx", "<i4"),
+    ("cy", "<i4"),
+    ("zx", "<f4"),           # zoom ROI (sensor-normalized x, y, w, h)
+    ("zy", "<f4"),
+    ("zw", "<f4"),
+    ("zh", "<f4"),
+    ("state", "<u2"),        # id into the string table
+)
+NONE_I32 = -(1 << 31)
+
+
+def dtype_of(columns):
+    return np.dtype([(str(n), str(t)) for n, t in columns])
+
+
+def _block(tag, payload, count):
+    return _BLOCK.pack(tag, len(payload), count, zlib.crc32(payload)) + payload
+
+
+def _iso_to_unix(s):
+    try:
+        return datetime.fromisoformat(s.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return float("nan")
+
+
+def _unix_to_iso(t):
+    if t != t:                      # NaN
+        return None
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class BinarySidecarWriter:
+    def __init__(self, path, header, columns=COLUMNS, block_rows=256, flush_s=1.0, hasher=None):
+        self.path = path
+        self.hasher = hasher        # anything with update(bytes), fed everything written (Hash_Manifest)
+        self.columns = tuple(columns)
+        self.dtype = dtype_of(self.columns)
+        self.block_rows = int(block_rows)
+        self.flush_s = float(flush_s)
+        self._lock = threading.Lock()
+        self._strings = {}          # text -> id
+        self._new_strings = []
+        self._rows = []
+        self._last_flush = time.monotonic()
+        self.rows_written = 0
+        self._f = open(path, "wb")
+        hdr = dict(header, columns=[list(c) for c in self.columns])
+        self._write(MAGIC + _block(TAG_HDR, json.dumps(hdr).encode(), 0))
+        self._f.flush()
+
+    def intern(self, text):
+        text = text or ""
+        sid = self._strings.get(text)
+        if sid is None:
+            sid = self._strings[text] = len(self._strings)
+            self._new_strings.append(text)
+        return sid
+
+    def append(self, **row):
+        """Column values by name; 'state' may be given as text ('state_text')."""
+        with self._lock:
+            if "state_text" in row:
+                row["state"] = self.intern(row.pop("state_text"))
+            self._rows.append(tuple(row.get(n, 0) for n, _ in self.columns))
+            if len(self._rows) >= self.block_rows or time.monotonic() - self._last_flush >= self.flush_s:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._rows and not self._new_strings:
+            return
+        out = b""
+        if self._new_strings:
+            payload = b"".join(struct.pack("<H", len(b)) + b
+                               for b in (s.encode("utf-8")[:0xFFFF] for s in self._new_strings))
+            out += _block(TAG_STRS, payload, len(self._new_strings))
+            self._new_strings = []
+        if self._rows:
+            arr = np.array(self._rows, dtype=self.dtype)
+            out += _block(TAG_ROWS, arr.tobytes(), len(arr))
+            self.rows_written += len(arr)
+            self._rows = []
+        self._write(out)
+        self._f.flush()
+
+    def _write(self, data):
+        self._f.write(data)
+        if self.hasher is not None:
+            self.hasher.update(data)
+
+    def close(self):
+        with self._lock:
+            if self._f is None:
+                return
+            self._flush_locked()
+            self._f.close()
+            self._f = None
+
+
+def append_footer(path, footer, hasher=None):
+    data = _block(TAG_FOOT, json.dumps(footer).encode(), 0)
+    with open(path, "ab") as f:
+        f.write(data)
+    if hasher is not None:
+        hasher.update(data)
+
+
+def _walk(buf):
+    """Yield (tag, payload_offset, length, count, crc_ok); stops at a torn tail."""
+    if buf[:4] != MAGIC:
+        raise ValueError("not a binary sidecar")
+    pos = 4
+    while pos + _BLOCK.size <= len(buf):
+        tag, length, count, crc = _BLOCK.unpack_from(buf, pos)
+        start = pos + _BLOCK.size
+        if start + length > len(buf):
+            return
+        yield tag, start, length, count, zlib.crc32(buf[start:start + length]) == crc
+        pos = start + length
+
+
+def has_footer(path):
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return any(tag == TAG_FOOT and ok for tag, _, _, _, ok in _walk(mm))
+    except (OSError, ValueError):
+        return False
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        head = f.read(4 + _BLOCK.size)
+        tag, length, _, _ = _BLOCK.unpack_from(head, 4)
+        if head[:4] != MAGIC or tag != TAG_HDR:
+            raise ValueError("not a binary sidecar")
+        return json.loads(f.read(length))
+
+
+class SidecarData:
+    """header, footer, columns {name: ndarray}, strings [text], bad_blocks"""
+    def __init__(self, header, footer, columns, strings, bad_blocks, mm=None):
+        self.header = header
+        self.footer = footer
+        self.columns = columns
+        self.strings = strings
+        self.bad_blocks = bad_blocks
+        self._mm = mm               # keeps zero-copy columns valid
+
+    def __len__(self):
+        return len(self.columns["t_rel"]) if "t_rel" in self.columns else 0
+
+    def state_text(self, i):
+        sid = int(self.columns["state"][i])
+        return self.strings[sid] if sid < len(self.strings) else ""
+
+
+def read(path):
+    f = open(path, "rb")
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()                   # the mapping outlives the descriptor
+    header, footer, strings, parts, bad = {}, None, [], [], 0
+    dtype = None
+    for tag, off, length, count, ok in _walk(mm):
+        if not ok:
+            bad += 1
+            if tag == TAG_STRS:
+                strings.extend([""] * count)     # keep later ids aligned
+            continue
+        if tag == TAG_HDR:
+            header = json.loads(mm[off:off + length])
+            dtype = dtype_of(header.get("columns", COLUMNS))
+        elif tag == TAG_STRS:
+            p = off
+            for _ in range(count):
+                n, = struct.unpack_from("<H", mm, p)
+                strings.append(bytes(mm[p + 2:p + 2 + n]).decode("utf-8", "replace"))
+                p += 2 + n
+        elif tag == TAG_ROWS and dtype is not None and length == count * dtype.itemsize:
+            parts.append(np.frombuffer(mm, dtype=dtype, count=count, offset=off))
+        elif tag == TAG_FOOT:
+            footer = json.loads(mm[off:off + length])
+    if dtype is None:
+        dtype = dtype_of(COLUMNS)
+    rows = parts[0] if len(parts) == 1 else (np.concatenate(parts) if parts else np.zeros(0, dtype))
+    columns = {name: rows[name] for name in dtype.names}
+    return SidecarData(header, footer, columns, strings, bad, mm if len(parts) == 1 else None)
+
+
+def iter_rows(data):
+    """JSONL-style dicts (header, ticks, footer) for export and old readers."""
+    yield dict(data.header, type="header")
+    c = data.columns
+    for i in range(len(data)):
+        cx, cy = int(c["cx"][i]), int(c["cy"][i])
+        row = {
+            "type": "tick",
+            "utc": _unix_to_iso(float(c["utc"][i])),
+            "t_rel": round(float(c["t_rel"][i]), 4),
+            "overlay": {"cx": None if cx == NONE_I32 else cx, "cy": None if cy == NONE_I32 else cy},
+            "state_text": data.state_text(i),
+        }
+        if "frame" in c and c["frame"][i] >= 0:
+            row["frame"] = int(c["frame"][i])
+        if "zw" in c and c["zw"][i] > 0:
+            row["zoom"] = [round(float(c[k][i]), 6) for k in ("zx", "zy", "zw", "zh")]
+        yield row
+    if data.footer is not None:
+        yield dict(data.footer, type="footer")
+
+
+def export_jsonl(path, out=None):
+    out = out or os.path.splitext(path)[0] + ".jsonl"
+    data = read(path)
+    with open(out, "w") as f:
+        for row in iter_rows(data):
+            row.pop("columns", None)
+            f.write(json.dumps(row) + "\n")
+    return out
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4) and sys.argv[1] == "export":
+        print(export_jsonl(sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None))
+    else:
+        print("usage: Sidecar_Binary.py export <file.bsc> [out.jsonl]")
@@ -0,0 +1,377 @@
+# Sim_Backends.py
+"""
+Headless stand-ins for the Pi-only pieces (DispmanX, PiCamera, gpiozero pins)
+so the whole app can boot on a normal Linux box.
+
+Selected by environment:
+  BORESIGHT_SIM=1                 -> use the fakes below instead of the real hardware
+  BORESIGHT_SIM_DISPLAY=1280x720  -> size reported by FakeDispmanX
+  BORESIGHT_SIM_BUTTONS=path      -> replay a button script (see ButtonScript)
+"""
+import os
+import time
+import random
+import threading
+import collections
+
+import numpy as np
+
+SIM_ENV = "BORESIGHT_SIM"
+
+
+def sim_enabled():
+    return os.environ.get(SIM_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _sim_display_size(default=(1280, 720)):
+    s = os.environ.get("BORESIGHT_SIM_DISPLAY", "")
+    try:
+        w, h = s.lower().split("x")
+        return int(w), int(h)
+    except Exception:
+        return default
+
+
+# ===================
+# DispmanX
+# ===================
+class FakeDispmanX:
+    """Same surface as dispmanx.DispmanX: .size, .buffer (numpy HxWx4), .update()."""
+    layers = {}   # layer -> most recent FakeDispmanX on that layer
+
+    def __init__(self, pixel_format="RGBA", buffer_type="numpy", layer=0, size=None):
+        self.pixel_format = pixel_format
+        self.buffer_type = buffer_type
+        self.layer = layer
+        self.size = tuple(size) if size else _sim_display_size()
+        w, h = self.size
+        self.buffer = np.zeros((h, w, 4), dtype=np.uint8)
+        self.update_count = 0
+        self.last_update = None
+        FakeDispmanX.layers[layer] = self
+
+    def update(self):
+        self.update_count += 1
+        self.last_update = time.monotonic()
+
+    @classmethod
+    def total_updates(cls):
+        return sum(d.update_count for d in cls.layers.values())
+
+    @classmethod
+    def composite(cls):
+        """Alpha-composite all layers in z-order (handy for snapshots)."""
+        if not cls.layers:
+            return None
+        w, h = next(iter(cls.layers.values())).size
+        out = np.zeros((h, w, 3), dtype=np.float32)
+        for layer in sorted(cls.layers):
+            buf = cls.layers[layer].buffer
+            if buf.shape[:2] != (h, w):
+                continue
+            a = buf[..., 3:4].astype(np.float32) / 255.0
+            out = out * (1.0 - a) + buf[..., :3].astype(np.float32) * a
+        return out.astype(np.uint8)
+
+
+# ===================
+# PiCamera
+# ===================
+FakeVideoFrame = collections.namedtuple(
+    "FakeVideoFrame",
+    "index frame_type frame_size video_size split_size timestamp complete")
+
+# picamera.PiVideoFrameType values
+FRAME_TYPE_FRAME = 0
+FRAME_TYPE_KEY_FRAME = 1
+FRAME_TYPE_SPS_HEADER = 2
+
+
+class FakePiCamera:
+    """
+    Records every zoom write and writes a synthetic Annex-B stream while recording
+    (SPS/PPS + IDR every `intra_period` frames, P-slices otherwise).
+    """
+    def __init__(self, resolution=(1280, 720), framerate=30, clock=None):
+        from Sim_Clock import get_clock
+        self.clock = clock or get_clock()   # frames follow virtual time too
+        self.resolution = resolution
+        self.revision = "imx219"
+        self._sensor_mode = 0
+        self.mode_switches = []   # [(monotonic, from, to)]
+        self.iso = 0
+        self.framerate = framerate
+        self.exposure_mode = "auto"
+        self.awb_mode = "auto"
+        self.rotation = 0
+        self.hflip = False
+        self.vflip = False
+        self.closed = False
+        self.preview = None
+        self.intra_period = 30
+        self.frame_bytes = 2000
+
+        self._zoom = (0.0, 0.0, 1.0, 1.0)
+        self.zoom_writes = []     # [(monotonic, roi)]
+
+        self._rec_lock = threading.Lock()
+        self._rec_thread = None
+        self._rec_stop = threading.Event()
+        # splitter port -> {out, split_to (next output, switched at a keyframe), split_done, ...}
+        self._ports = {}
+        self.frame = None
+
+    # --- sensor mode ---
+    MODE_SWITCH_SECONDS = 0.25   # pipeline restart, roughly what picamera costs
+
+    @property
+    def sensor_mode(self):
+        return self._sensor_mode
+
+    @sensor_mode.setter
+    def sensor_mode(self, mode):
+        mode = int(mode)
+        if self.recording:
+            raise RuntimeError("sensor_mode cannot be changed while recording")
+        if self._sensor_mode and mode != self._sensor_mode:
+            self.clock.sleep(self.MODE_SWITCH_SECONDS)
+            self.mode_switches.append((self.clock.monotonic(), self._sensor_mode, mode))
+        self._sensor_mode = mode
+
+    # --- zoom ---
+    @property
+    def zoom(self):
+        return self._zoom
+
+    @zoom.setter
+    def zoom(self, roi):
+        roi = tuple(float(v) for v in roi)
+        self._zoom = roi
+        self.zoom_writes.append((self.clock.monotonic(), roi))
+
+    # --- preview ---
+    def start_preview(self, fullscreen=True, **kw):
+        self.preview = dict(fullscreen=fullscreen, **kw)
+        return self.preview
+
+    def stop_preview(self):
+        self.preview = None
+
+    def close(self):
+        for splitter_port in list(self._ports):
+            self.stop_recording(splitter_port)
+        self.closed = True
+
+    # --- recording ---
+    @property
+    def recording(self):
+        return bool(self._ports)
+
+    def start_recording(self, output, format=None, splitter_port=1, resize=None, bitrate=None, **kw):
+        """Like picamera: one encoder per splitter port (1 = main, 2 = e.g. a resized proxy)."""
+        if splitter_port in self._ports:
+            raise RuntimeError("recording is already running")
+        fmt = format or (os.path.splitext(output)[1][1:] if isinstance(output, str) else "h264")
+        if fmt not in ("h264",):
+            raise ValueError(f"Unsupported format {fmt}")  # mimic picamera (no mp4)
+        # frame sizes follow the (resized) picture area, capped by the port's bitrate
+        w, h = resize or self.resolution
+        frame_bytes = max(64, int(self.frame_bytes * (w * h) / float(self.resolution[0] * self.resolution[1])))
+        if bitrate:
+            frame_bytes = max(64, min(frame_bytes, int(bitrate / 8 / float(self.framerate or 30) / 1.1)))
+        port = {"out": open(output, "wb") if isinstance(output, str) else output,
+                "split_to": None, "split_done": threading.Event(),
+                "index": 0, "pos": 0, "frame_bytes": frame_bytes}
+        with self._rec_lock:
+            self._ports[splitter_port] = port
+            start = self._rec_thread is None
+            if start:
+                self._rec_stop.clear()
+        if start:
+            self._rec_thread = self.clock.start_thread(self._encode_loop)
+
+    def _nal(self, nal_type, payload_len):
+        return b"\x00\x00\x00\x01" + bytes([0x60 | nal_type]) + b"\xaa" * payload_len
+
+    def _encode_loop(self):
+        period = 1.0 / float(self.framerate or 30)
+        t0 = self.clock.monotonic()
+        tick = 0
+        while not self._rec_stop.is_set():
+            with self._rec_lock:
+                for splitter_port, p in self._ports.items():
+                    index = p["index"]
+                    key = (index % self.intra_period) == 0
+                    if key:
+                        chunk = self._nal(7, 8) + self._nal(8, 4) + self._nal(5, p["frame_bytes"] * 4)
+                        ftype = FRAME_TYPE_KEY_FRAME
+                    else:
+                        chunk = self._nal(1, p["frame_bytes"])
+                        ftype = FRAME_TYPE_FRAME
+                    if key and p["split_to"] is not None:
+                        old, p["out"], p["split_to"] = p["out"], p["split_to"], None
+                        if hasattr(old, "close") and hasattr(old, "name"):
+                            old.close()
+                        p["split_done"].set()
+                    p["pos"] += len(chunk)
+                    if splitter_port == 1:
+                        ts = int(round(index * period * 1e6))  # us, like PiVideoFrame.timestamp
+                        # picamera updates .frame before handing the frame's data to the output
+                        self.frame = FakeVideoFrame(index, ftype, len(chunk), p["pos"], p["pos"], ts, True)
+                    p["out"].write(chunk)
+                    p["index"] = index + 1
+            tick += 1
+            self.clock.wait(self._rec_stop, max(0.0, t0 + tick * period - self.clock.monotonic()))
+
+    def split_recording(self, output, timeout=5.0, splitter_port=1, **kw):
+        """Switch to a new output at the next keyframe; blocks until it happened (like picamera)."""
+        p = self._ports.get(splitter_port)
+        if p is None:
+            raise RuntimeError("not recording")
+        out = open(output, "wb") if isinstance(output, str) else output
+        with self._rec_lock:
+            p["split_done"].clear()
+            p["split_to"] = out
+        if not self.clock.wait(p["split_done"], timeout):
+            with self._rec_lock:
+                p["split_to"] = None
+            raise RuntimeError("timed out waiting for a keyframe to split at")
+
+    def wait_recording(self, timeout=0, splitter_port=1):
+        self.clock.sleep(timeout)
+
+    def stop_recording(self, splitter_port=1):
+        with self._rec_lock:
+            p = self._ports.pop(splitter_port, None)
+            last = not self._ports
+            if p is not None:
+                out = p["out"]
+                if out is not None and hasattr(out, "close") and hasattr(out, "name"):
+                    out.close()
+        if p is None or not last:
+            return
+        self._rec_stop.set()
+        if self._rec_thread:
+            self._rec_thread.join(timeout=2.0)
+        self._rec_thread = None
+
+
+# ===================
+# gpiozero buttons
+# ===================
+def install_gpio_mock():
+    """Route every gpiozero device to MockFactory pins (must run before devices are built)."""
+    from gpiozero import Device
+    from gpiozero.pins.mock import MockFactory
+    if not isinstance(Device.pin_factory, MockFactory):
+        Device.pin_factory = MockFactory()
+    return Device.pin_factory
+
+
+class ButtonScript:
+    """
+    Replays a button script onto MockFactory pins. One event per line:
+        <seconds> <button> <press|release>
+    button is 'left_up', 'ok', 'right_down' or a GPIO number; '#' starts a comment.
+    Buttons are wired pull_up=False, so press = drive high.
+    """
+    PINS = {"left_up": 14, "ok": 15, "right_down": 18}
+
+    def __init__(self, events, factory=None, clock=None):
+        self.events = sorted(events, key=lambda e: e[0])
+        self.factory = factory
+        self.clock = clock
+        self._thread = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def parse(cls, text):
+        events = []
+        for line in text.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            t, name, action = line.split()
+            pin = cls.PINS.get(name.lower(), None)
+            pin = int(name) if pin is None else pin
+            events.append((float(t), pin, action.lower() == "press"))
+        return events
+
+    @classmethod
+    def from_file(cls, path, factory=None, clock=None):
+        with open(os.path.expanduser(path), "r") as f:
+            return cls(cls.parse(f.read()), factory=factory, clock=clock)
+
+    @staticmethod
+    def random_script(seed, n_actions=12):
+        """
+        Randomized but reproducible script text: taps, zoom bursts, 3 s holds
+        (H/V adjust, record) and double-taps, always ending with the exit combo.
+        """
+        rng = random.Random(seed)
+        t = 1.0
+        lines = [f"# random script seed={seed}"]
+
+        def press(names, hold):
+            nonlocal t
+            for n in names:
+                lines.append(f"{t:.3f} {n} press")
+            t += hold
+            for n in names:
+                lines.append(f"{t:.3f} {n} release")
+            t += rng.uniform(0.15, 0.6)
+
+        for _ in range(n_actions):
+            kind = rng.choice(("zoom_in", "zoom_in", "zoom_out", "zoom_out", "ok_tap",
+                               "double_tap", "ok_hold", "record", "nudge"))
+            if kind == "zoom_in":
+                press(["left_up"], rng.uniform(0.05, 0.6))
+            elif kind == "zoom_out":
+                press(["right_down"], rng.uniform(0.05, 0.6))
+            elif kind == "ok_tap":
+                press(["ok"], rng.uniform(0.05, 0.3))
+            elif kind == "double_tap":
+                press(["ok"], 0.08)
+                t -= rng.uniform(0.0, 0.1)
+                press(["ok"], 0.08)
+            elif kind == "ok_hold":
+                press(["ok"], rng.uniform(3.1, 3.5))
+            elif kind == "record":
+                press(["left_up", "right_down"], rng.uniform(3.1, 3.4))
+                t += rng.uniform(0.5, 3.0)
+            else:
+                press([rng.choice(("left_up", "right_down"))], rng.uniform(0.2, 1.5))
+        lines.append(f"{t:.3f} ok press")
+        lines.append(f"{t:.3f} left_up press")
+        return "\n".join(lines) + "\n"
+
+    def apply(self, pin, pressed):
+        factory = self.factory or install_gpio_mock()
+        p = factory.pin(pin)
+        if pressed:
+            p.drive_high()
+        else:
+            p.drive_low()
+
+    def _run(self):
+        from Sim_Clock import get_clock
+        clock = self.clock or get_clock()
+        t0 = clock.monotonic()
+        for t, pin, pressed in self.events:
+            if clock.wait(self._stop, max(0.0, t0 + t - clock.monotonic())):
+                return
+            self.apply(pin, pressed)
+
+    def start(self):
+        if self.clock is not None and self.clock.virtual:
+            # discrete-event time: the clock driver applies each edge at its exact time
+            t0 = self.clock.monotonic()
+            for t, pin, pressed in self.events:
+                self.clock.call_at(t0 + t, lambda p=pin, on=pressed: self.apply(p, on))
+            return self
+        from Sim_Clock import get_clock
+        self._thread = (self.clock or get_clock()).start_thread(self._run, name="button-script")
+        return self
+
+    def stop(self):
+        self._stop.set()
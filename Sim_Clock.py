@@ -0,0 +1,217 @@
+# Sim_Clock.py
+"""
+Injectable clock/sleeper for the state thread, gesture timing, Alarm patterns,
+MetadataRecorder and the HUD blink.
+
+  RealClock    -> wall time, real sleeps (default on the device)
+  VirtualClock -> discrete-event time: a sleep never takes real time. A driver
+                  thread jumps straight to the earliest wake-up once every
+                  participating thread is asleep, so a scripted scenario replays
+                  faster than real time and in the same order every run.
+
+Selected with BORESIGHT_SIM_CLOCK=virtual (only honoured together with BORESIGHT_SIM=1).
+
+Threads that sleep on the clock must be started with clock.start_thread() (or
+call clock.register()) so the virtual driver knows to wait for them.
+"""
+import os
+import sys
+import time
+import heapq
+import threading
+import itertools
+import traceback
+
+
+class RealClock:
+    virtual = False
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(max(0.0, seconds))
+
+    def wait(self, event, timeout=None):
+        """Event.wait(timeout) on this clock; returns event.is_set()."""
+        return event.wait(timeout)
+
+    def start_thread(self, target, name=None, daemon=True):
+        t = threading.Thread(target=target, name=name, daemon=daemon)
+        t.start()
+        return t
+
+    def register(self, thread=None):
+        pass
+
+    def call_at(self, t_mono, fn):
+        """Run fn() at monotonic time t_mono (from a timer thread)."""
+        timer = threading.Timer(max(0.0, t_mono - self.monotonic()), fn)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+class VirtualClock:
+    virtual = True
+    EVENT_POLL = 0.005     # real seconds between event checks inside wait()
+    STALL_TIMEOUT = 60.0   # real seconds a participant may stay busy before step() calls it a deadlock
+
+    def __init__(self, start_mono=1000.0, epoch=None):
+        self._now = float(start_mono)
+        self._epoch = (time.time() - self._now) if epoch is None else float(epoch)
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._wakeups = []        # heap of (t, seq, thread|None, fn|None)
+        self._running = {}        # thread -> None (awake) / sleep token (asleep on the clock)
+        self._events = {}         # thread -> Event it is waiting on (wait() only)
+        self._driver = None
+        self._stop = threading.Event()
+
+    # ---------- reading ----------
+    def time(self):
+        return self._epoch + self._now
+
+    def monotonic(self):
+        return self._now
+
+    # ---------- participants ----------
+    def register(self, thread=None):
+        with self._cond:
+            self._running[thread or threading.current_thread()] = None
+
+    def start_thread(self, target, name=None, daemon=True):
+        t = threading.Thread(target=target, name=name, daemon=daemon)
+        self.register(t)          # awake from the driver's point of view before it even runs
+        t.start()
+        return t
+
+    def _all_idle(self):
+        for t, token in list(self._running.items()):
+            if not t.is_alive() and t.ident is not None:
+                del self._running[t]
+            elif token is None:
+                return False
+            elif t in self._events and self._events[t].is_set():
+                return False      # about to wake from wait(); not idle yet
+        return True
+
+    # ---------- sleeping ----------
+    def _sleep_until(self, wake, event=None):
+        me = threading.current_thread()
+        with self._cond:
+            token = next(self._seq)
+            self._running[me] = token
+            if event is not None:
+                self._events[me] = event
+            heapq.heappush(self._wakeups, (wake, token, me, None))
+            self._cond.notify_all()
+            # only the driver wakes us (one thread per step -> deterministic order on ties)
+            while self._running.get(me) == token and not self._stop.is_set():
+                if event is not None and event.is_set():
+                    break
+                self._cond.wait(self.EVENT_POLL if event is not None else None)
+            self._running[me] = None
+            self._events.pop(me, None)
+            self._cond.notify_all()
+        return event.is_set() if event is not None else True
+
+    def sleep(self, seconds):
+        self._sleep_until(self._now + max(0.0, float(seconds)))
+
+    def wait(self, event, timeout=None):
+        if event.is_set():
+            return True
+        if timeout is None:
+            timeout = 1e9
+        return self._sleep_until(self._now + max(0.0, float(timeout)), event)
+
+    def call_at(self, t_mono, fn):
+        with self._cond:
+            heapq.heappush(self._wakeups, (float(t_mono), next(self._seq), None, fn))
+            self._cond.notify_all()
+
+    # ---------- driving ----------
+    def step(self):
+        """
+        Wait until every participant is asleep, then jump to the next wake-up.
+        Returns False when there is nothing scheduled. Never advances past a busy
+        thread (that would make the run depend on host load): one that stays busy
+        for STALL_TIMEOUT real seconds is a bug and raises RuntimeError.
+        """
+        with self._cond:
+            deadline = time.monotonic() + self.STALL_TIMEOUT
+            while not self._all_idle() and not self._stop.is_set():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    busy = sorted(t.name for t, token in self._running.items() if token is None)
+                    raise RuntimeError(f"virtual clock stalled {self.STALL_TIMEOUT:g} s waiting for "
+                                       f"{', '.join(busy) or 'a busy thread'} (never slept on the clock?)")
+                self._cond.wait(min(left, 0.05))
+            # drop wake-ups of sleeps that already ended early (event fired)
+            while self._wakeups:
+                t, token, th, fn = self._wakeups[0]
+                if th is not None and self._running.get(th) != token:
+                    heapq.heappop(self._wakeups)
+                    continue
+                break
+            if not self._wakeups:
+                return False
+            t, token, th, fn = heapq.heappop(self._wakeups)
+            if t > self._now:
+                self._now = t
+            if th is not None:
+                self._running[th] = None   # mark awake now so the next step waits for it
+            self._cond.notify_all()
+        if fn is not None:
+            fn()
+        return True
+
+    def run_until(self, t_mono):
+        """Drive from the calling thread; stops early if nothing is left to wake."""
+        while self._now < t_mono and not self._stop.is_set():
+            if not self.step():
+                break
+
+    def start_driver(self):
+        def _drive():
+            try:
+                while not self._stop.is_set():
+                    if not self.step():
+                        with self._cond:
+                            self._cond.wait(0.01)
+            except Exception:
+                # nothing can sleep past this point; a hung process would only hide it
+                traceback.print_exc()
+                sys.stdout.flush(); sys.stderr.flush()
+                os._exit(1)
+        self._driver = threading.Thread(target=_drive, name="virtual-clock", daemon=True)
+        self._driver.start()
+        return self._driver
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+
+_CLOCK = None
+
+
+def get_clock():
+    """Process-wide default clock (chosen once from the environment)."""
+    global _CLOCK
+    if _CLOCK is None:
+        from Sim_Backends import sim_enabled
+        mode = os.environ.get("BORESIGHT_SIM_CLOCK", "").strip().lower()
+        _CLOCK = VirtualClock() if (sim_enabled() and mode == "virtual") else RealClock()
+    return _CLOCK
+
+
+def set_clock(clock):
+    global _CLOCK
+    _CLOCK = clock
+    return clock
@@ -0,0 +1,95 @@
+# Simulate.py
+"""
+Replay many randomized button scripts through the full app on the simulation
+backends with virtual time (BORESIGHT_SIM=1, BORESIGHT_SIM_CLOCK=virtual).
+
+  python Simulate.py --runs 200 --seed 0 --jobs 4
+
+A run fails if the app does not exit cleanly through the exit combo, prints a
+traceback, or its state-loop tick p99 exceeds --max-tick-p99. Failing scripts are
+kept under --keep so they can be replayed with BORESIGHT_SIM_BUTTONS=<file>.
+"""
+import os, sys, json, shutil, argparse, tempfile, subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from Sim_Backends import ButtonScript
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_one(seed, n_actions, timeout):
+    work = tempfile.mkdtemp(prefix=f"bsim_{seed}_")
+    script = os.path.join(work, "buttons.txt")
+    with open(script, "w") as f:
+        f.write(ButtonScript.random_script(seed, n_actions))
+    env = dict(os.environ,
+               BORESIGHT_SIM="1", BORESIGHT_SIM_CLOCK="virtual",
+               BORESIGHT_SIM_BUTTONS=script,
+               BORESIGHT_VIDEO_DIR=os.path.join(work, "Saved_Videos"),
+               BORESIGHT_METRICS_JSON=os.path.join(work, "metrics.json"),
+               BORESIGHT_METRICS_SOCK="", BORESIGHT_TRACE_DIR=work,
+               HOME=work)
+    result = {"seed": seed, "work": work, "script": script, "ok": False, "reason": ""}
+    try:
+        p = subprocess.run([sys.executable, "Boresight_Camera.py"], cwd=REPO_DIR, env=env,
+                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout)
+        out = p.stdout.decode("utf-8", "replace")
+    except subprocess.TimeoutExpired:
+        result["reason"] = "timeout"
+        return result
+    result["log"] = out
+    if p.returncode != 0:
+        result["reason"] = f"exit code {p.returncode}"
+    elif "Traceback" in out:
+        result["reason"] = "traceback in output"
+    elif "[thread] exit requested" not in out:
+        result["reason"] = "did not reach exit"
+    else:
+        result["ok"] = True
+    try:
+        with open(os.path.join(work, "metrics.json")) as f:
+            m = json.load(f)["metrics"]
+        result["tick_p99"] = m.get("state_tick_seconds", {}).get("p99")
+        result["overruns"] = m.get("state_tick_overruns_total", {}).get("value")
+    except Exception:
+        pass
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Randomized virtual-time runs of the full app.")
+    ap.add_argument("--runs", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=0, help="First seed; run i uses seed+i.")
+    ap.add_argument("--actions", type=int, default=12, help="Random actions per script.")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--timeout", type=float, default=120.0, help="Real seconds per run.")
+    ap.add_argument("--max-tick-p99", type=float, default=None,
+                    help="Fail runs whose state tick p99 (s) is above this.")
+    ap.add_argument("--keep", default="sim_failures", help="Directory for failing scripts/logs.")
+    args = ap.parse_args()
+
+    seeds = [args.seed + i for i in range(args.runs)]
+    failures = 0
+    worst_p99 = 0.0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as ex:
+        for r in ex.map(lambda s: run_one(s, args.actions, args.timeout), seeds):
+            p99 = r.get("tick_p99")
+            if r["ok"] and args.max_tick_p99 is not None and p99 is not None and p99 > args.max_tick_p99:
+                r["ok"], r["reason"] = False, f"tick p99 {p99:.4f}s > {args.max_tick_p99}"
+            if p99:
+                worst_p99 = max(worst_p99, p99)
+            if not r["ok"]:
+                failures += 1
+                os.makedirs(args.keep, exist_ok=True)
+                shutil.copy(r["script"], os.path.join(args.keep, f"seed_{r['seed']}.txt"))
+                with open(os.path.join(args.keep, f"seed_{r['seed']}.log"), "w") as f:
+                    f.write(r.get("log", ""))
+                print(f"FAIL seed={r['seed']}: {r['reason']}", flush=True)
+            shutil.rmtree(r["work"], ignore_errors=True)
+
+    print(f"{args.runs - failures}/{args.runs} runs ok; worst state tick p99 {worst_p99*1e3:.1f} ms")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
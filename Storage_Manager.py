@@ -0,0 +1,195 @@
+# Storage_Manager.py
+"""
+Keeps Saved_Videos from filling the SD card.
+
+  - usage is indexed once at boot, then updated per file/stem as recordings,
+    segments and post jobs finish (note()/note_stem()); no re-walking
+  - preflight() before RecordingManager.start(): free space (statvfs) and the
+    quota must leave at least min_record_s at the projected bitrate, after
+    evicting what may be evicted; otherwise StorageFull
+  - eviction is oldest-first and only touches copies that exist elsewhere:
+    rendered <stem>_overlay.mp4 first, then recordings marked <stem>.exported.
+    A <stem>.pin marker protects a recording from eviction.
+  - hud_text() counts down the recording time left while recording
+  - transfer_list() is the order to pull recordings off the card in: low-res
+    <stem>_proxy.mp4 first, then sidecars/manifests, then full-res video
+
+Projected bitrate is a running average of finished recordings (bytes / seconds),
+seeded with the encoder bitrate.
+"""
+import os
+import shutil
+import threading
+
+from Metrics import REGISTRY as METRICS
+
+_M_USED = METRICS.gauge("storage_used_bytes", "bytes under Saved_Videos (incremental index)")
+_M_FREE = METRICS.gauge("storage_free_bytes", "free bytes on the Saved_Videos filesystem")
+_M_HEADROOM = METRICS.gauge("storage_headroom_seconds", "recording time left at the projected bitrate")
+_M_EVICTED = METRICS.counter("storage_evicted_bytes_total", "bytes removed by retention")
+
+# everything a recording stem can own
+STEM_SUFFIXES = (".mp4", ".h264", ".jsonl", ".bsc", ".sha256", ".manifest.json", "_overlay.mp4",
+                 "_proxy.mp4", ".segments.json", ".exported", ".pin")
+
+# transfer order: (rank, suffix); lower rank goes first, newest stem first within a rank
+_TRANSFER_RANK = (
+    (0, "_proxy.mp4"),
+    (1, ".segments.json"), (1, ".bsc"), (1, ".jsonl"), (1, ".sha256"), (1, ".manifest.json"),
+    (2, "_overlay.mp4"), (2, ".mp4"), (2, ".h264"), (2, ".mp4.part"),
+)
+
+
+def transfer_order(files):
+    """{name: (size, mtime)} -> [(name, size)]: proxies, then sidecars/manifests, then video; newest first."""
+    ranked = []
+    for name, (size, mtime) in files.items():
+        for rank, suffix in _TRANSFER_RANK:
+            if name.endswith(suffix):
+                ranked.append((rank, -mtime, name, size))
+                break
+    return [(name, size) for _, _, name, size in sorted(ranked)]
+
+
+class StorageFull(RuntimeError):
+    pass
+
+
+class StorageManager:
+    def __init__(self, base_dir, quota_mb=0, reserve_mb=256, min_record_s=60,
+                 warn_s=120, bitrate=17_000_000):
+        self.base_dir = os.path.expanduser(base_dir)
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.quota = int(float(quota_mb or 0) * 1e6)       # 0 = only the filesystem limits
+        self.reserve = int(float(reserve_mb or 0) * 1e6)   # never record into the last bit of the card
+        self.min_record_s = float(min_record_s)
+        self.warn_s = float(warn_s)
+        self.rate = float(bitrate) / 8.0                   # bytes/s, refined by observe_recording()
+        self._lock = threading.Lock()
+        self._files = {}                                   # name -> (size, mtime)
+        self.used = 0
+        self._scan()
+
+    # ---------- index ----------
+    def _scan(self):
+        with self._lock:
+            self._files.clear()
+            self.used = 0
+            for e in os.scandir(self.base_dir):
+                if e.is_file(follow_symlinks=False):
+                    st = e.stat()
+                    self._files[e.name] = (st.st_size, st.st_mtime)
+                    self.used += st.st_size
+        _M_USED.set(self.used)
+
+    def note(self, *paths):
+        """Re-stat just these files (created, grown or removed)."""
+        with self._lock:
+            for p in paths:
+                name = os.path.basename(p)
+                old = self._files.pop(name, None)
+                if old:
+                    self.used -= old[0]
+                try:
+                    st = os.stat(os.path.join(self.base_dir, name))
+                except OSError:
+                    continue
+                self._files[name] = (st.st_size, st.st_mtime)
+                self.used += st.st_size
+        _M_USED.set(self.used)
+
+    def note_stem(self, stem):
+        self.note(*(stem + s for s in STEM_SUFFIXES))
+
+    def observe_recording(self, nbytes, seconds, alpha=0.3):
+        if nbytes > 0 and seconds > 1.0:
+            self.rate += alpha * (nbytes / seconds - self.rate)
+
+    # ---------- space ----------
+    def free_bytes(self):
+        free = shutil.disk_usage(self.base_dir).free
+        _M_FREE.set(free)
+        return free
+
+    def available(self, in_flight=0):
+        """Bytes a recording may still use: filesystem minus reserve, and the quota."""
+        avail = self.free_bytes() - self.reserve
+        if self.quota:
+            avail = min(avail, self.quota - self.used - in_flight)
+        return max(0, avail)
+
+    def headroom_s(self, in_flight=0):
+        s = self.available(in_flight) / max(1.0, self.rate)
+        _M_HEADROOM.set(s)
+        return s
+
+    def preflight(self, seconds=None):
+        """Make room for `seconds` (default min_record_s) of recording or raise StorageFull."""
+        need = (self.min_record_s if seconds is None else float(seconds)) * self.rate
+        short = need - self.available()
+        if short > 0:
+            self.evict(short)
+            short = need - self.available()
+        if short > 0:
+            raise StorageFull(f"storage full: {self.headroom_s():.0f} s left, need {need / 1e6:.0f} MB")
+        return self.headroom_s()
+
+    # ---------- retention ----------
+    def _stem_mtime(self, stem):
+        return max((self._files[stem + s][1] for s in STEM_SUFFIXES if stem + s in self._files), default=0)
+
+    def candidates(self):
+        """[(mtime, [names])] in eviction order: rendered copies, then exported recordings."""
+        with self._lock:
+            names = set(self._files)
+            pinned = {n[:-4] for n in names if n.endswith(".pin")}
+            rendered, exported = [], []
+            for n in names:
+                if n.endswith("_overlay.mp4"):
+                    stem = n[:-len("_overlay.mp4")]
+                    if stem not in pinned:
+                        rendered.append((self._files[n][1], [n]))
+                elif n.endswith(".exported"):
+                    stem = n[:-len(".exported")]
+                    if stem not in pinned:
+                        exported.append((self._stem_mtime(stem),
+                                         [stem + s for s in STEM_SUFFIXES if stem + s in names]))
+        return sorted(rendered) + sorted(exported)
+
+    def evict(self, nbytes, busy=()):
+        """Remove oldest evictable files until nbytes are freed; returns bytes freed."""
+        freed = 0
+        for _, group in self.candidates():
+            if freed >= nbytes:
+                break
+            if any(n.startswith(b) for n in group for b in busy):
+                continue
+            for n in group:
+                size = self._files.get(n, (0, 0))[0]
+                try:
+                    os.remove(os.path.join(self.base_dir, n))
+                except OSError:
+                    continue
+                freed += size
+                print(f"[storage] evicted {n} ({size / 1e6:.1f} MB)", flush=True)
+            self.note(*group)
+        if freed:
+            _M_EVICTED.inc(freed)
+        return freed
+
+    # ---------- export ----------
+    def transfer_list(self):
+        """[(name, size)] of everything worth pulling off the card, in transfer order."""
+        with self._lock:
+            files = dict(self._files)
+        return transfer_order(files)
+
+    # ---------- HUD ----------
+    def hud_text(self, recording=False, in_flight=0):
+        """'' when fine; a warning when the recording (or the next one) is about to run out."""
+        left = self.headroom_s(in_flight)
+        if recording and left < self.warn_s:
+            return f"DISK {int(left) // 60}:{int(left) % 60:02d} LEFT"
+        if not recording and left < self.min_record_s:
+            return "DISK FULL"
+        return ""
@@ -0,0 +1,149 @@
+# Trace.py
+"""
+Input-to-photon tracing: spans go into a fixed-size ring buffer and are dumped
+as Chrome trace-event JSON (open in chrome://tracing or https://ui.perfetto.dev).
+
+A GPIO edge starts a "flow"; every span recorded in the next FLOW_WINDOW seconds
+is tagged with it, so one button press shows up as:
+  gpio edge -> state handling -> camera zoom -> overlay refresh -> disp.update
+linked by flow arrows.
+
+  t0 = TRACER.begin(); ...; TRACER.end("overlay.refresh", t0)
+  with TRACER.span("state.zoom_in"): ...
+  TRACER.dump()                    # or: kill -USR1 <pid>
+
+BORESIGHT_TRACE=0 turns recording off (begin/end become near no-ops).
+"""
+import os
+import json
+import time
+import signal
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+FLOW_WINDOW = 2.0   # seconds a GPIO edge keeps tagging spans
+
+
+class Tracer:
+    def __init__(self, capacity=4096, enabled=True):
+        self.capacity = int(capacity)
+        self.enabled = bool(enabled)
+        self._buf = [None] * self.capacity
+        self._idx = 0                  # next write slot (monotonic counter)
+        self._lock = threading.Lock()
+        self._t0_ns = time.perf_counter_ns()
+        self._flow_id = 0
+        self._flow_deadline_ns = 0
+        self._pid = os.getpid()
+
+    # ---------- flows ----------
+    def start_flow(self):
+        """Called on a user input edge; returns the new flow id."""
+        with self._lock:
+            self._flow_id += 1
+            self._flow_deadline_ns = time.perf_counter_ns() + int(FLOW_WINDOW * 1e9)
+            return self._flow_id
+
+    def _current_flow(self, now_ns):
+        return self._flow_id if now_ns <= self._flow_deadline_ns else 0
+
+    # ---------- recording ----------
+    def _put(self, ev):
+        with self._lock:
+            self._buf[self._idx % self.capacity] = ev
+            self._idx += 1
+
+    def begin(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def end(self, name, t0_ns, args=None):
+        if not self.enabled or not t0_ns:
+            return
+        now = time.perf_counter_ns()
+        self._put(("X", name, t0_ns, now - t0_ns, threading.get_ident(),
+                   self._current_flow(t0_ns), args))
+
+    def instant(self, name, args=None, new_flow=False):
+        if not self.enabled:
+            return 0
+        flow = self.start_flow() if new_flow else 0
+        now = time.perf_counter_ns()
+        self._put(("i", name, now, 0, threading.get_ident(), flow or self._current_flow(now), args))
+        return flow
+
+    @contextmanager
+    def span(self, name, args=None):
+        t0 = self.begin()
+        try:
+            yield
+        finally:
+            self.end(name, t0, args)
+
+    # ---------- export ----------
+    def events(self):
+        """Buffered events, oldest first."""
+        with self._lock:
+            n = min(self._idx, self.capacity)
+            start = self._idx - n
+            return [self._buf[i % self.capacity] for i in range(start, self._idx)]
+
+    def chrome_trace(self):
+        out = []
+        tids = {}
+        flows_started = set()
+        for ph, name, ts_ns, dur_ns, tid, flow, args in self.events():
+            ltid = tids.setdefault(tid, len(tids) + 1)
+            ts = (ts_ns - self._t0_ns) / 1000.0
+            ev = {"name": name, "cat": name.split(".", 1)[0], "ph": ph,
+                  "ts": ts, "pid": self._pid, "tid": ltid}
+            if ph == "X":
+                ev["dur"] = dur_ns / 1000.0
+            else:
+                ev["s"] = "t"
+            a = dict(args) if args else {}
+            if flow:
+                a["flow"] = flow
+            if a:
+                ev["args"] = a
+            out.append(ev)
+            if flow:
+                # flow arrows: first event starts it, later ones continue it
+                fph = "t" if flow in flows_started else "s"
+                flows_started.add(flow)
+                out.append({"name": "input", "cat": "flow", "ph": fph, "id": flow,
+                            "ts": ts, "pid": self._pid, "tid": ltid, "bp": "e"})
+        for tid, ltid in tids.items():
+            out.append({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": ltid,
+                        "args": {"name": _thread_name(tid)}})
+        return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+    def dump(self, path=None):
+        if path is None:
+            d = os.environ.get("BORESIGHT_TRACE_DIR", "/tmp")
+            path = os.path.join(d, "boresight_trace_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        print("[trace] wrote", path, flush=True)
+        return path
+
+    def install_signal(self, signum=signal.SIGUSR1):
+        """Dump on `kill -USR1 <pid>` (main thread only)."""
+        def _handler(_sig, _frm):
+            threading.Thread(target=self.dump, daemon=True).start()
+        try:
+            signal.signal(signum, _handler)
+        except (ValueError, AttributeError, OSError):
+            pass
+
+
+def _thread_name(ident):
+    for t in threading.enumerate():
+        if t.ident == ident:
+            return t.name
+    return str(ident)
+
+
+TRACER = Tracer(capacity=int(os.environ.get("BORESIGHT_TRACE_CAPACITY", "4096")),
+                enabled=os.environ.get("BORESIGHT_TRACE", "1").strip() not in ("0", "false", "off"))
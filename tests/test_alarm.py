@@ -0,0 +1,229 @@
+import sys
+import time
+import types
+from collections import namedtuple
+
+import pytest
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory
+
+import Alarm
+from Alarm import LEDControl, BuzzerControl, _PWMPattern
+from Sim_Clock import VirtualClock
+
+
+class FakePi:
+    """Records what Alarm asks of a pigpio.pi on a connected PiGPIOFactory."""
+    connected = True
+
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.pwm = []               # (t, pin, freq, duty)
+        self.waves = {}             # wid -> pulses
+        self.sent = []              # ("repeat", wid) / ("chain", [...])
+        self.tx_busy = False
+        self._wid = 0
+        self._pulses = []
+
+    def _now(self):
+        return self.clock.monotonic() if self.clock is not None else time.monotonic()
+
+    def hardware_PWM(self, pin, freq, duty):
+        self.pwm.append((self._now(), pin, freq, duty))
+
+    def write(self, pin, level):
+        pass
+
+    def set_mode(self, pin, mode):
+        pass
+
+    def wave_add_new(self):
+        self._pulses = []
+
+    def wave_add_generic(self, pulses):
+        self._pulses += pulses
+
+    def wave_create(self):
+        self._wid += 1
+        self.waves[self._wid] = self._pulses
+        return self._wid
+
+    def wave_send_repeat(self, wid):
+        self.sent.append(("repeat", wid))
+        self.tx_busy = True
+
+    def wave_chain(self, data):
+        self.sent.append(("chain", data))
+        self.tx_busy = True
+
+    def wave_tx_busy(self):
+        return self.tx_busy
+
+    def wave_tx_stop(self):
+        self.tx_busy = False
+
+    def wave_delete(self, wid):
+        del self.waves[wid]
+
+
+@pytest.fixture
+def pins(monkeypatch):
+    Device.pin_factory = MockFactory()
+    monkeypatch.setattr(Alarm, "_wave_owner", None)
+    yield Device.pin_factory
+    Device.pin_factory.close()
+    Device.pin_factory = None
+
+
+@pytest.fixture
+def pigpio(monkeypatch):
+    mod = types.SimpleNamespace(OUTPUT=1, pulse=namedtuple("pulse", "gpio_on gpio_off delay"))
+    monkeypatch.setitem(sys.modules, "pigpio", mod)
+    return mod
+
+
+def edges(pin):
+    """Times of the OFF->ON edges; MockPin timestamps are seconds since the previous change."""
+    states, t = [], 0.0
+    for s in pin.states:
+        t += s.timestamp
+        states.append((t, s.state))
+    return [t for (t, v), (_, prev) in zip(states[1:], states) if v and not prev]
+
+
+# ---------- hardware PWM ----------
+@pytest.mark.parametrize("on, off, ok", [
+    (0.25, 0.25, True), (0.5, 0.5, True), (0.05, 0.05, True),
+    (0.3, 0.4, False),      # 1.43 Hz can't be done in whole Hz
+    (1.0, 1.0, False),      # < 1 Hz
+    (0.2, 0.0, False),
+])
+def test_pwm_supports_whole_hz_only(on, off, ok):
+    assert _PWMPattern(FakePi(), 12).supports(on, off, None) is ok
+
+
+def test_pwm_needs_a_pwm_pin():
+    assert not _PWMPattern(FakePi(), 17).supports(0.25, 0.25, None)
+
+
+def test_pwm_finite_pattern_ends_mid_off_on_the_clock():
+    clock = VirtualClock()
+    pi = FakePi(clock)
+    pwm = _PWMPattern(pi, 12, clock=clock)
+    pwm.play(0.05, 0.05, 3)
+    t0, _, freq, duty = next(c for c in pi.pwm if c[2])     # play() cancels (0 Hz) first
+    assert (freq, duty) == (10, 500000)
+    assert pwm.busy()
+    clock.run_until(t0 + 1.0)
+    t_end, _, freq, _ = pi.pwm[-1]
+    assert freq == 0
+    assert t_end - t0 == pytest.approx(0.275)
+    assert not pwm.busy()
+
+
+def test_pwm_end_clears_the_active_backend(pins):
+    clock = VirtualClock()
+    pins.connection = FakePi(clock)
+    led = LEDControl(12, backend="pwm", clock=clock)
+    led.start_toggle(0.25, 0.25, repeat_count=2)
+    assert led.backend == "pwm"
+    clock.run_until(clock.monotonic() + 2.0)
+    assert led._hw_active is None
+    assert led.backend == "thread"
+
+
+def test_pwm_replay_outlives_the_old_end(pins):
+    clock = VirtualClock()
+    pi = pins.connection = FakePi(clock)
+    led = LEDControl(12, backend="pwm", clock=clock)
+    led.start_toggle(0.25, 0.25, repeat_count=2)
+    led.start_toggle(0.5, 0.5)                      # forever, replaces the finite one
+    clock.run_until(clock.monotonic() + 5.0)
+    assert led.backend == "pwm"
+    assert pi.pwm[-1][2] == 1                       # the stale end callback didn't switch it off
+    led.stop()
+    assert pi.pwm[-1][2] == 0
+
+
+def test_auto_prefers_pwm_then_falls_back(pins):
+    pins.connection = FakePi()
+    led = LEDControl(12, backend="auto")
+    led.start_toggle(0.25, 0.25)
+    assert led.backend == "pwm"
+    led.start_toggle(0.03, 0.04, repeat_count=3)   # no pigpio module here -> thread
+    assert led.backend == "thread"
+    led.stop()
+
+
+# ---------- pigpio waveforms ----------
+def test_wave_plays_pattern_as_chain(pins, pigpio):
+    pi = pins.connection = FakePi()
+    led = LEDControl(17, backend="wave")
+    led.start_toggle(0.1, 0.2, repeat_count=300)
+    assert led.backend == "wave"
+    (kind, data), = pi.sent
+    assert kind == "chain" and data[-2:] == [300 & 0xFF, 300 >> 8]
+    on, off = pi.waves[data[2]]
+    assert (on.gpio_on, on.delay, off.gpio_off, off.delay) == (1 << 17, 100000, 1 << 17, 200000)
+    led.stop()
+    assert not pi.tx_busy and not pi.waves
+
+
+def test_wave_forever_uses_send_repeat(pins, pigpio):
+    pi = pins.connection = FakePi()
+    led = LEDControl(17, backend="wave")
+    led.start_toggle(0.1, 0.1)
+    assert pi.sent[-1][0] == "repeat"
+    led.stop()
+
+
+def test_wave_busy_owner_blocks_the_other_device(pins, pigpio):
+    pi = pins.connection = FakePi()
+    led = LEDControl(17, backend="wave")
+    buzzer = BuzzerControl(27, backend="wave")
+    led.start_toggle(0.1, 0.1, repeat_count=5)
+    buzzer.start_toggle(0.02, 0.02)
+    assert buzzer.backend == "thread"
+    assert Alarm._wave_owner is led._hw_backends[0]
+    # play() itself re-checks under the lock instead of taking the wave over
+    assert buzzer._hw_backends[0].play(0.02, 0.02, None) is False
+    assert Alarm._wave_owner is led._hw_backends[0]
+    buzzer.stop()
+    led.stop()
+
+
+def test_finished_chain_frees_the_wave(pins, pigpio):
+    pi = pins.connection = FakePi()
+    led = LEDControl(17, backend="wave")
+    buzzer = BuzzerControl(27, backend="wave")
+    led.start_toggle(0.1, 0.1, repeat_count=5)
+    led_wid = pi.sent[-1][1][2]
+    pi.tx_busy = False                              # the chain ran out on its own
+    buzzer.start_toggle(0.02, 0.02)
+    assert buzzer.backend == "wave"
+    assert Alarm._wave_owner is buzzer._hw_backends[0]
+    assert led_wid not in pi.waves                  # the old owner's wave id was freed
+    buzzer.stop()
+    led.stop()
+
+
+# ---------- thread fallback (MockFactory pins) ----------
+def test_thread_pattern_repeats_and_ends_off(pins):
+    led = LEDControl(12, backend="thread")
+    led.start_toggle(0.03, 0.04, repeat_count=3)
+    assert led.backend == "thread"
+    time.sleep(0.35)
+    led.stop()
+    pin = pins.pin(12)
+    ons = edges(pin)
+    assert len(ons) == 3
+    assert all(abs((b - a) - 0.07) < 0.03 for a, b in zip(ons, ons[1:]))
+    assert not pin.state
+
+
+def test_buzzer_thread_stops_off(pins):
+    buzzer = BuzzerControl(13, backend="thread")
+    buzzer.start_toggle(0.02, 0.02)
+    time.sleep(0.1)
+    buzzer.stop()
+    assert not pins.pin(13).state
@@ -0,0 +1,66 @@
+import pytest
+
+from Sensor_Modes import SENSOR_MODES, IMX219_MODES, SensorModePlanner
+
+
+def centered_roi(z):
+    """Base-normalized ROI of a centered zoom z (output aspect = base mode aspect)."""
+    return (0.5 - 0.5 / z, 0.5 - 0.5 / z, 1.0 / z, 1.0 / z)
+
+
+def planner(model="imx219"):
+    # boot config: base mode 5, 1280x720 @ 30 fps -> candidates 1, 4, 5
+    return SensorModePlanner(SENSOR_MODES[model], 5, (1280, 720), framerate=30)
+
+
+# (sensor, zoom, current mode, only_if_needed, expected best_mode, expected plan())
+PLAN_CASES = [
+    ("imx219", 1,   5, False, 5, None),     # full FOV, no upscaling: stay binned
+    ("imx219", 1.5, 5, False, 5, None),     # 4 and 5 tie on quality; 5 reads fewer pixels
+    ("imx219", 2,   5, False, 1, 1),        # gain 0.36 >= 0.2 + 0.25 * 0.4
+    ("imx219", 4,   5, False, 1, 1),        # gain 0.32
+    ("imx219", 8,   5, False, 1, None),     # gain 0.16: not worth a switch (hysteresis)
+    ("imx219", 4,   5, True,  1, None),     # 5 still sees the ROI
+    ("imx219", 1,   1, False, 5, 5),        # 1x from the cropped mode: must switch
+    ("imx219", 1,   1, True,  5, 5),
+    ("imx219", 2,   1, False, 1, None),     # already best
+    ("ov5647", 1.5, 5, False, 1, 1),        # gain 0.325
+    ("ov5647", 4,   5, False, 1, None),     # gain 0.253 < 0.3
+    ("ov5647", 1,   1, True,  5, 5),
+]
+
+
+@pytest.mark.parametrize("model", sorted(SENSOR_MODES))
+def test_candidates_at_30fps(model):
+    assert sorted(m.index for m in planner(model).candidates) == [1, 4, 5]
+
+
+@pytest.mark.parametrize("model", sorted(SENSOR_MODES))
+def test_base_roi_passes_through(model):
+    assert planner(model).to_mode_roi((0.1, 0.2, 0.3, 0.4), 5) == (0.1, 0.2, 0.3, 0.4)
+
+
+@pytest.mark.parametrize("model, z, current, only_if_needed, best, plan", PLAN_CASES)
+def test_best_mode_and_plan(model, z, current, only_if_needed, best, plan):
+    p = planner(model)
+    roi = centered_roi(z)
+    assert p.best_mode(roi) == best
+    assert p.plan(roi, current, only_if_needed=only_if_needed) == plan
+
+
+def test_switch_cost_ewma():
+    p = SensorModePlanner(IMX219_MODES, 5, (1280, 720), framerate=30)
+    roi = centered_roi(2)
+    p.record_switch(5, 1, 2.0)
+    assert p.plan(roi, 5) is None                  # a slow switch raises the bar
+    for _ in range(6):
+        p.record_switch(5, 1, 0.1)
+    assert p.plan(roi, 5) == 1                     # fast ones bring it back down
+    assert p.switch_cost(1, 5) == p.default_cost   # per direction
+
+
+def test_2x_roi_in_cropped_mode():
+    x, y, w, h = planner().to_mode_roi(centered_roi(2), 1)
+    # half the sensor width, seen through mode 1's 1920-px-wide window
+    assert w == pytest.approx(0.5 * 3280 / 1920, abs=1e-3)
+    assert x + w / 2 == pytest.approx(0.5, abs=1e-9)